@@ -5,8 +5,6 @@ import streamlit as st
 import streamlit.components.v1 as components
 from streamlit_calendar import calendar
 import pandas as pd
-import csv
-from io import StringIO
 import os
 import json
 import base64
@@ -15,6 +13,10 @@ import requests
 import random
 import re
 import io
+import threading
+import atexit
+import logging
+import sqlite3
 from gtts import gTTS
 import time
 from google.api_core import exceptions
@@ -90,7 +92,29 @@ import io
 
 # --- Google Sheets 認證 ---
 from google.oauth2.service_account import Credentials
+from google.auth.exceptions import RefreshError
 import gspread
+from sheets_sync import (
+    SHEET_HEADERS, RateLimiter, RefIndex, batch_append_rows, build_sheet_rows,
+    bulk_append, chunk_record_rows, sync_sheets, unsynced_record_rows
+)
+from local_store import (
+    AppDatabase, SentenceJournal, SentenceStore, StaleWriteError, WriteBehind, atomic_write_bytes,
+    scan_records, sentence_meta
+)
+from sheets_fake import FakeSheetsClient
+import serializer
+from record_schema import TABLE_COLUMNS, rows_to_text, table_rows, text_to_rows
+from record_history import apply_delta, changed_fields, make_delta, record_digest, unified_diff
+from search_index import SearchIndex, snippet
+from bible_ref import ReferenceIndex, format_reference
+from verse_table import VerseTable
+from record_query import RecordFrame
+from concordance import Concordance
+from record_index import rebuild_all
+from grammar_template import resolve_grammar, strip_default_grammar
+
+logger = logging.getLogger(__name__)
 
 # ===================================================================
 # 0.1 語音播放功能 (gTTS)
@@ -281,124 +305,105 @@ def flip_card():
     st.session_state.flashcard_flipped = not st.session_state.flashcard_flipped
 
 # ===================================================================
-# 0.5 資料儲存函數（統一使用 bible_data.json）
+# 0.5 資料儲存函數（SQLite：待辦、收藏、自訂金句、AI 分析）
 # ===================================================================
-DATA_FILE = "bible_data.json"
+DATA_FILE = "bible_data.json"      # 舊版整檔 JSON，首次啟動時匯入
+DB_FILE = "bible_data.db"
+WRITE_BEHIND_DELAY = 0.3           # 秒；st.rerun() 會跳過腳本結尾，由計時器補寫
+ANALYSIS_KEEP = 500                # AI 分析紀錄最多保留筆數
+ANALYSIS_MAX_DAYS = 365            # AI 分析紀錄保留天數
+ANALYSIS_PAGE_SIZE = 20
+HISTORY_BYTES_PER_REF = 64 * 1024      # 每筆紀錄的版本歷史上限，超過時從最舊的刪
+HISTORY_BYTES_TOTAL = 20 * 1024 * 1024
+HISTORY_COALESCE_SECONDS = 120         # 同一筆紀錄在此時間內連續儲存只留一個版本
+
+@st.cache_resource(show_spinner=False)
+def get_write_behind():
+    """所有本地儲存共用的延遲寫入佇列：一次互動只寫一次"""
+    write_behind = WriteBehind(WRITE_BEHIND_DELAY)
+    atexit.register(write_behind.flush)
+    return write_behind
+
+def flush_pending_writes():
+    """腳本結尾呼叫：把這次互動排隊的變更寫到磁碟"""
+    try:
+        get_write_behind().flush()
+    except Exception as e:
+        st.error(f"儲存本地資料庫失敗：{e}")
+
+@st.cache_resource(show_spinner=False)
+def get_app_db():
+    """整個 process 共用的 SQLite 連線"""
+    db = AppDatabase(DB_FILE, write_behind=get_write_behind(),
+                     analysis_keep=ANALYSIS_KEEP, analysis_max_days=ANALYSIS_MAX_DAYS,
+                     history_bytes_per_ref=HISTORY_BYTES_PER_REF, history_bytes_total=HISTORY_BYTES_TOTAL)
+    db.migrate_json(DATA_FILE)
+    return db
 
 def load_custom_verses():
     """載入自訂金句"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("custom_verses", [""] * 7)
-        except:
-            return [""] * 7
-    return [""] * 7
+    try:
+        return get_app_db().load_custom_verses()
+    except Exception:
+        return [""] * AppDatabase.CUSTOM_VERSE_SLOTS
 
-def save_custom_verses(verses):
-    """儲存自訂金句"""
-    data = {}
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            pass
-    data["custom_verses"] = verses
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def save_custom_verses(verses, base=None):
+    """儲存自訂金句：只寫入相對 base 有變動的欄位，不會蓋掉其他 session 改的欄位"""
+    get_app_db().save_custom_verses(verses, base)
 
 def load_todos():
-    """載入待辦事項"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("todos", {})
-        except:
-            return {}
-    return {}
+    """載入待辦事項：{日期: [{"id", "title", "time"}]}"""
+    try:
+        return get_app_db().load_todos()
+    except Exception:
+        return {}
 
-def save_todos():
-    """儲存待辦事項"""
-    data = {}
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            pass
-    data["todos"] = st.session_state.todo
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def add_todo(date_key, title, time_str):
+    """新增一筆待辦並回傳 id"""
+    return get_app_db().add_todo(date_key, title, time_str)
+
+def delete_todo(item):
+    """刪除一筆待辦"""
+    if isinstance(item, dict) and item.get("id") is not None:
+        get_app_db().delete_todo(item["id"])
+
+def find_verses(ref_input, sentences):
+    """出處（單節或範圍，中英文書卷名皆可）→ 依經文順序的 [{'ref', 'en', 'cn', 'record'}]"""
+    verses = []
+    verse_table = get_verse_table()
+    for key, ref, row in get_reference_index().lookup(ref_input):
+        if ref not in sentences:
+            continue        # 索引尚未跟上刪除
+        record_verses = verse_table.get(ref, sentences)
+        verse = next((v for v in record_verses if v['row'] == row), record_verses[0] if record_verses else None)
+        en, cn = (verse['en'], verse['cn']) if verse else ("", "")
+        verses.append({'ref': format_reference(key), 'en': en, 'cn': cn, 'record': ref})
+    return verses
 
 def fetch_verse_by_reference(ref_input, sentences):
-    """根據出處取得經文"""
+    """根據出處取得經文：先比對紀錄 ref，再以標準化出處查索引（「來6:3」即「Heb 6:3」，不會誤中 Heb 6:30）"""
     try:
         if ref_input in sentences:
-            data = sentences[ref_input]
-            content = data.get('v1_content', '')
-            return extract_english(content), extract_chinese(content), ref_input
+            en, cn = first_verse(ref_input, sentences)
+            return en, cn, ref_input
         
-        ref_lower = ref_input.lower().replace(' ', '')
-        for key in sentences.keys():
-            if ref_lower in key.lower().replace(' ', ''):
-                data = sentences[key]
-                content = data.get('v1_content', '')
-                return extract_english(content), extract_chinese(content), key
+        for verse in find_verses(ref_input, sentences):
+            return verse['en'], verse['cn'], verse['record']
         
         return None, None, None
     except:
         return None, None, None
 
-def extract_english(content):
-    """從 Google Sheet 內容提取英文"""
-    try:
-        lines = content.strip().split('\n')
-        if len(lines) < 2:
-            return content
-        headers = lines[0].split('\t')
-        for i, h in enumerate(headers):
-            if 'english' in h.lower() or 'esv' in h.lower():
-                data_lines = [l for l in lines[1:] if l.strip()]
-                if data_lines:
-                    cells = data_lines[0].split('\t')
-                    if i < len(cells):
-                        return cells[i]
-        return content
-    except:
-        return content
-
-def extract_chinese(content):
-    """從 Google Sheet 內容提取中文"""
-    try:
-        lines = content.strip().split('\n')
-        if len(lines) < 2:
-            return ""
-        headers = lines[0].split('\t')
-        for i, h in enumerate(headers):
-            if 'chinese' in h.lower() or '中文' in h:
-                data_lines = [l for l in lines[1:] if l.strip()]
-                if data_lines:
-                    cells = data_lines[0].split('\t')
-                    if i < len(cells):
-                        return cells[i]
-        return ""
-    except:
-        return ""
+def first_verse(ref, sentences):
+    """紀錄 V1 第一列的 (英文, 中文)"""
+    verses = get_verse_table().get(ref, sentences)
+    if not verses:
+        return "", ""
+    return verses[0]['en'], verses[0]['cn']
 
 def save_analysis_to_database(result):
     """儲存分析結果到資料庫"""
     try:
-        data = {}
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        
-        if 'ai_analysis' not in data:
-            data['ai_analysis'] = []
-        
         analysis_entry = {
             'reference': result.get('reference', ''),
             'timestamp': datetime.datetime.now().isoformat(),
@@ -407,17 +412,20 @@ def save_analysis_to_database(result):
             'flashcards': result.get('flashcards', []),
             'podcast_script': result.get('podcast_script', [])
         }
-        
-        data['ai_analysis'].append(analysis_entry)
-        
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
+        get_app_db().add_analysis(analysis_entry)
         return True
     except Exception as e:
         st.error(f"儲存失敗: {e}")
         return False
 
+def load_analysis_page(page=0, reference=None, page_size=ANALYSIS_PAGE_SIZE):
+    """分頁讀取 AI 分析紀錄，回傳 (該頁紀錄, 總筆數)"""
+    try:
+        db = get_app_db()
+        return db.load_analyses(reference, page_size, page * page_size), db.count_analyses(reference)
+    except Exception:
+        return [], 0
+
 def send_to_tab3(result):
     """傳送到 TAB3（挑戰測驗）"""
     if 'tab3_flashcards' not in st.session_state:
@@ -432,41 +440,39 @@ def send_to_tab3(result):
 
 def load_favorites():
     """載入收藏"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("favorites", [])
-        except:
-            return []
-    return []
+    try:
+        return get_app_db().load_favorites()
+    except Exception:
+        return []
 
-def save_favorites():
-    """儲存收藏"""
-    data = {}
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            pass
-    data["favorites"] = st.session_state.favorite_sentences
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def save_sentences(data):
-    """儲存 sentences 到本地 JSON 檔案"""
-    if not isinstance(data, dict):
-        st.error("儲存失敗：資料必須是字典格式")
-        return False
+def add_favorite(text):
+    """加入收藏（已收藏則略過）"""
+    if text not in st.session_state.favorite_sentences:
+        st.session_state.favorite_sentences.append(text)
+        get_app_db().add_favorite(text)
+
+def remove_favorite(index):
+    """依清單位置移除收藏"""
+    text = st.session_state.favorite_sentences.pop(index)
+    get_app_db().remove_favorite(text)
+
+APP_STATE_LOADERS = {
+    "todo": ("todos", load_todos),
+    "favorite_sentences": ("favorites", load_favorites),
+    "custom_verses": ("custom_verses", load_custom_verses),
+}
+
+def bind_shared_app_state():
+    """每次重跑時比對資料表版本，其他 session 寫入過的清單才重新載入"""
     try:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        with open(SENTENCES_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        st.error(f"儲存本地資料庫失敗：{e}")
-        return False
+        versions = dict(get_app_db().versions)
+    except Exception:
+        versions = {}
+    seen = st.session_state.setdefault('app_state_versions', {})
+    for key, (table, loader) in APP_STATE_LOADERS.items():
+        if key not in st.session_state or seen.get(table) != versions.get(table):
+            st.session_state[key] = loader()
+            seen[table] = versions.get(table)
 
 # ===================================================================
 # 頁面設定（必須是第一個 st. 指令！）
@@ -476,9 +482,20 @@ st.set_page_config(layout="wide", page_title="Bible Study AI App 2026")
 # ===================================================================
 # 診斷：檢查 secrets
 # ===================================================================
-if "gcp_service_account" not in st.secrets:
-    st.error("❌ 找不到 gcp_service_account secrets！")
-    st.info("""
+def sheets_backend():
+    """目前使用的 Sheets 後端："google" 或 "fake"（本地替身，離線測試用）"""
+    backend = os.environ.get("SHEETS_BACKEND")
+    if backend:
+        return backend
+    try:
+        return st.secrets.get("sheets", {}).get("backend", "google")
+    except Exception:
+        return "google"
+
+if sheets_backend() != "fake":
+    if "gcp_service_account" not in st.secrets:
+        st.error("❌ 找不到 gcp_service_account secrets！")
+        st.info("""
     **請在 Streamlit Community Cloud 設定 Secrets：**
     
     1. 前往 https://share.streamlit.io/  
@@ -489,284 +506,492 @@ if "gcp_service_account" not in st.secrets:
     type = "service_account"
     ...
     """)
-    st.stop()
+        st.stop()
 
-if "sheets" not in st.secrets or "spreadsheet_id" not in st.secrets["sheets"]:
-    st.error("❌ 找不到 sheets.spreadsheet_id！")
-    st.stop()
+    if "sheets" not in st.secrets or "spreadsheet_id" not in st.secrets["sheets"]:
+        st.error("❌ 找不到 sheets.spreadsheet_id！")
+        st.stop()
 
 # ===================================================================
 # Google Sheets 連線
 # ===================================================================
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SHEETS_WRITES_PER_MINUTE = 60     # Sheets API 每位使用者每分鐘寫入配額
+BULK_SYNC_MAX_ROWS = 2000         # 大量同步時每次 batch_update 的列數上限
+
+@st.cache_resource(show_spinner=False)
+def _sheets_registry():
+    """跨 session 共用的連線登記表：client 與 Spreadsheet handle 只建立一次"""
+    return {"lock": threading.Lock(), "gc": None, "spreadsheets": {}, "sheet_ids": {}, "ref_indexes": {}, "fake": None,
+            "write_limiter": RateLimiter(SHEETS_WRITES_PER_MINUTE)}
+
+def _fake_sheets_client():
+    """本地 Sheets 替身，設定來自環境變數（FAKE_SHEETS_DB 留空表示存在記憶體）"""
+    return FakeSheetsClient(
+        path=os.environ.get("FAKE_SHEETS_DB") or None,
+        latency=float(os.environ.get("FAKE_SHEETS_LATENCY", "0")),
+        quota_per_minute=int(os.environ["FAKE_SHEETS_QUOTA"]) if os.environ.get("FAKE_SHEETS_QUOTA") else None,
+        fail_rate=float(os.environ.get("FAKE_SHEETS_FAIL_RATE", "0"))
+    )
+
+def sheets_settings():
+    """在腳本執行緒讀取連線設定（st.secrets）；未設定時回傳 None
+
+    回傳 {"backend", "sheet_id", "credentials"}，背景執行緒只用這份設定連線，不碰 st.secrets。
+    """
+    if sheets_backend() == "fake":
+        return {"backend": "fake", "sheet_id": os.environ.get("FAKE_SHEETS_ID", "local"), "credentials": None}
+    if "gcp_service_account" not in st.secrets:
+        return None
+    if "sheets" not in st.secrets or "spreadsheet_id" not in st.secrets["sheets"]:
+        return None
+    return {"backend": "google", "sheet_id": st.secrets["sheets"]["spreadsheet_id"],
+            "credentials": dict(st.secrets["gcp_service_account"])}
+
+def connect_sheets(settings, registry):
+    """依 settings 取得共用連線 (client, sheet_id)；不呼叫 st.*，失敗時丟出例外"""
+    with registry["lock"]:
+        if settings["backend"] == "fake":
+            # 替身本身保留資料，重建連線時沿用同一個
+            if registry["fake"] is None:
+                registry["fake"] = _fake_sheets_client()
+            registry["gc"] = registry["fake"]
+        elif registry["gc"] is None:
+            creds = Credentials.from_service_account_info(settings["credentials"], scopes=SHEETS_SCOPES)
+            registry["gc"] = gspread.authorize(creds)
+        return registry["gc"], settings["sheet_id"]
+
 def get_google_sheets_client():
-    """重新建立 Google Sheets 連線"""
+    """取得共用 Google Sheets 連線（token 由 google-auth 在過期時自動更新）"""
     try:
-        if "gcp_service_account" not in st.secrets:
-            return None, None
-        if "sheets" not in st.secrets or "spreadsheet_id" not in st.secrets["sheets"]:
+        settings = sheets_settings()
+        if settings is None:
             return None, None
-            
-        gcp_sa = st.secrets["gcp_service_account"]
-        sheet_id = st.secrets["sheets"]["spreadsheet_id"]
-        
-        creds = Credentials.from_service_account_info(
-            gcp_sa,
-            scopes=["https://www.googleapis.com/auth/spreadsheets"]
-        )
-        gc = gspread.authorize(creds)
-        return gc, sheet_id
-        
+        return connect_sheets(settings, _sheets_registry())
     except Exception as e:
         st.sidebar.error(f"Google Sheets 連線失敗: {e}")
         return None, None
 
+def open_spreadsheet(gc, sheet_id, registry=None):
+    """取得共用 Spreadsheet handle，同一個 sheet_id 只 open 一次"""
+    registry = registry or _sheets_registry()
+    with registry["lock"]:
+        sh = registry["spreadsheets"].get(sheet_id)
+        if sh is None:
+            sh = gc.open_by_key(sheet_id)
+            registry["spreadsheets"][sheet_id] = sh
+        return sh
+
+def reset_google_sheets_client(registry=None):
+    """丟棄共用連線，下次呼叫時重新認證"""
+    registry = registry or _sheets_registry()
+    with registry["lock"]:
+        registry["gc"] = None
+        registry["spreadsheets"].clear()
+        registry["sheet_ids"].clear()
+        registry["ref_indexes"].clear()
+
+def is_auth_error(e):
+    """判斷是否為認證失敗（token 無法更新或被撤銷）"""
+    if isinstance(e, RefreshError):
+        return True
+    if isinstance(e, gspread.exceptions.APIError):
+        return getattr(e.response, "status_code", None) == 401
+    return False
+
+def with_sheets_retry(fn, settings=None, registry=None):
+    """執行 fn(gc, sh)；認證失敗時重建連線並重試一次
+
+    settings / registry 由呼叫端在腳本執行緒取得時，整個過程不呼叫 st.*（可在背景執行緒執行），
+    連線失敗直接丟出例外；未傳入時使用 get_google_sheets_client()，未連線回傳 None。
+    """
+    for attempt in range(2):
+        if settings is not None:
+            gc, sheet_id = connect_sheets(settings, registry)
+        else:
+            gc, sheet_id = get_google_sheets_client()
+            if not gc or not sheet_id:
+                return None
+        try:
+            return fn(gc, open_spreadsheet(gc, sheet_id, registry))
+        except Exception as e:
+            if attempt == 0 and is_auth_error(e):
+                reset_google_sheets_client(registry)
+                continue
+            raise
+
 # ===================================================================
 # 資料庫設定
 # ===================================================================
 DATA_DIR = "data"
-SENTENCES_FILE = os.path.join(DATA_DIR, "sentences.json")
-TODO_FILE = os.path.join(DATA_DIR, "todos.json")
-FAVORITE_FILE = os.path.join(DATA_DIR, "favorite_sentences.json")
+SENTENCES_DIR = os.path.join(DATA_DIR, "sentences")               # manifest + 分片
+SENTENCES_FILE = os.path.join(DATA_DIR, "sentences.json")           # 舊版單檔，首次啟動時轉換
+SENTENCES_JOURNAL_FILE = os.path.join(DATA_DIR, "sentences.journal")
+SYNC_CURSOR_FILE = os.path.join(DATA_DIR, "sheets_cursor.json")
+SENTENCES_COMPRESSION = None        # manifest 快照壓縮：None / "gzip" / "zstd"（讀取時自動判斷）
+SEARCH_INDEX_FILE = os.path.join(DATA_DIR, "search_index.db")     # 可刪除，下次啟動重建
+SEARCH_PAGE_SIZE = 20
+SHEET_LABELS = ["V1 Sheet", "V2 Sheet", "W Sheet", "P Sheet", "Grammar List"]     # saved_sheets 的標籤
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # ===================================================================
 # 本地檔案操作
 # ===================================================================
-def load_sentences():
-    """載入資料：優先從 Google Sheets，失敗時讀本地檔案"""
-    google_data = load_sentences_from_google_sheets()
-    
-    if google_data:
-        try:
-            with open(SENTENCES_FILE, "w", encoding="utf-8") as f:
-                json.dump(google_data, f, ensure_ascii=False, indent=2)
-            st.sidebar.caption("💾 已同步更新本地快取")
-        except Exception as e:
-            st.sidebar.warning(f"本地快取更新失敗：{e}")
-        
-        return google_data
-    
-    st.sidebar.info("📁 從本地檔案載入...")
-    
-    if not os.path.exists(SENTENCES_FILE):
-        return {}
-    
+@st.cache_resource(show_spinner=False)
+def get_sentence_journal():
+    """sentences 本地儲存：manifest（快照 + 變更日誌）+ 每筆紀錄一個分片"""
+    return SentenceJournal(SENTENCES_DIR, legacy_snapshot=SENTENCES_FILE, legacy_journal=SENTENCES_JOURNAL_FILE,
+                           compression=SENTENCES_COMPRESSION)
+
+# 以下索引隨日誌寫入增量更新；啟動時的全量建立由 start_record_scan() 一次掃描完成
+@st.cache_resource(show_spinner=False)
+def get_reference_index():
+    """經文出處排序索引：V1 各列的出處 → 紀錄"""
+    index = ReferenceIndex(lambda record: table_rows(record, 'v1_content'))
+    get_sentence_journal().listeners.append(index.apply)
+    return index
+
+@st.cache_resource(show_spinner=False)
+def get_verse_table():
+    """V1 經文表（尚未掃描到的紀錄在第一次查詢時解析）"""
+    table = VerseTable()
+    get_sentence_journal().listeners.append(table.apply)
+    return table
+
+@st.cache_resource(show_spinner=False)
+def get_concordance():
+    """單字索引（V1 Syn/Ant、W Sheet 單字欄、TAB1 vocabulary / phrases）"""
+    concordance = Concordance()
+    get_sentence_journal().listeners.append(concordance.apply)
+    return concordance
+
+@st.cache_resource(show_spinner=False)
+def get_record_frame():
+    """紀錄中繼資料的 DataFrame 索引（只讀 manifest），隨日誌寫入增量更新"""
+    journal = get_sentence_journal()
+    frame = RecordFrame(sentence_meta)
+    journal.listeners.append(frame.apply)
+    frame.rebuild(journal.data)
+    return frame
+
+def rebuild_search_index(index, data):
+    """在背景執行緒重建搜尋索引（逐筆讀分片，不佔用共用快取）"""
+    threading.Thread(target=index.rebuild, args=(scan_records(data), len(data)), daemon=True).start()
+
+@st.cache_resource(show_spinner=False)
+def get_search_index():
+    """sentences 全文索引（存在 SQLite 檔）；斷詞版本不符或筆數對不上時由 start_record_scan() 重建"""
+    index = SearchIndex(SEARCH_INDEX_FILE)
+    get_sentence_journal().listeners.append(index.apply)
+    return index
+
+def start_record_scan(store):
+    """啟動時唯一一次讀遍所有分片：各索引共用同一次背景掃描
+
+    舊版模板副本的一次性清理（strip_default_grammar）也搭這次掃描。
+    在腳本執行緒取得所有 cache_resource，背景執行緒不呼叫 st.*。
+    """
+    journal, write_behind, db = get_sentence_journal(), get_write_behind(), get_app_db()
+    indexes = [get_reference_index(), get_verse_table(), get_concordance()]
     try:
-        with open(SENTENCES_FILE, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            data = json.loads(content)
-            if not isinstance(data, dict):
-                return {}
-            return data
-    except json.JSONDecodeError:
-        return {}
+        search_index = get_search_index()
+        if search_index.needs_rebuild() or len(search_index) != len(journal.data):
+            indexes.append(search_index)
     except Exception as e:
-        st.error(f"載入本地資料庫失敗：{e}")
-        return {}
+        st.warning(f"搜尋索引無法開啟：{e}")
 
-def save_sentences(data):
-    """儲存本地快取"""
-    if not isinstance(data, dict):
-        st.error("儲存失敗：資料必須是字典格式")
-        return False
-    
+    data, _, revisions = store.snapshot()
+    strip = not db.get_meta('default_grammar_stripped')
+    stripped = {}
+
+    def visit(ref, record):
+        new = strip_default_grammar(record)
+        if new is not record:
+            stripped[ref] = (revisions.get(ref, 0), record, new)
+
+    def run():
+        rebuild_all(indexes, scan_records(data), len(data), visit if strip else None)
+        if strip:
+            try:
+                finish_default_grammar_strip(store, stripped, journal, write_behind, db)
+            except Exception:
+                # 清理失敗不影響使用，下次啟動再試；背景執行緒不能碰 session_state，寫進 log
+                logger.exception("舊版 grammar 模板副本清理失敗（%d 筆），下次啟動重試", len(stripped))
+
+    threading.Thread(target=run, daemon=True).start()
+
+def load_local_sentences():
+    """讀取本地快取：只載入 manifest，紀錄內容用到時才讀分片"""
     try:
-        with open(SENTENCES_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
+        return get_sentence_journal().load()
+    except serializer.CodecUnavailableError as e:
+        # 不能用空資料繼續：之後的寫入與壓縮會蓋掉讀不到的 manifest
+        st.error(f"本地資料庫需要 zstandard 套件才能讀取（pip install zstandard）：{e}")
+        st.stop()
     except Exception as e:
-        st.error(f"儲存本地資料庫失敗：{e}")
-        return False
+        st.error(f"載入本地資料庫失敗：{e}")
+        return {}
 
-def load_todos_local():
-    if os.path.exists(TODO_FILE):
+def load_sync_cursor():
+    """讀取各工作表的同步 cursor"""
+    if os.path.exists(SYNC_CURSOR_FILE):
         try:
-            with open(TODO_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return serializer.read_file(SYNC_CURSOR_FILE)
         except:
             pass
     return {}
 
-def save_todos_local():
-    with open(TODO_FILE, "w", encoding="utf-8") as f:
-        json.dump(st.session_state.todo, f, ensure_ascii=False, indent=2)
+def save_sync_cursor(cursor):
+    """儲存同步 cursor（必須在本地快取寫入成功之後）"""
+    atomic_write_bytes(SYNC_CURSOR_FILE, serializer.dumps(cursor))
 
-def load_favorites_local():
-    if os.path.exists(FAVORITE_FILE):
-        try:
-            with open(FAVORITE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
-    return []
+def export_sentences_json(data):
+    """匯出給人看的 JSON（縮排、中文不跳脫）；逐筆讀分片，不留在快取"""
+    return serializer.export_json({ref: record for ref, record in scan_records(data)})
 
-def save_favorites_local():
-    with open(FAVORITE_FILE, "w", encoding="utf-8") as f:
-        json.dump(st.session_state.favorite_sentences, f, ensure_ascii=False, indent=2)
+def queue_sentence_writes(store, refs, journal=None, write_behind=None):
+    """排入 sentences 日誌寫入；flush 時才取共用快照的最新內容，寫入順序由 write-behind 保證
 
-# ===================================================================
-# 解析內容
-# ===================================================================
-def parse_content_to_rows(content, expected_cols=None):
-    """解析 CSV 或 Markdown 表格為二維列表"""
-    if not content:
-        return []
-    
-    rows = []
-    lines = content.strip().split('\n')
-    
-    if '|' in content:
-        for line in lines:
-            line = line.strip()
-            if line.startswith('|') and '---' not in line and line.replace('|', '').strip():
-                cells = [re.sub(r'\*\*(.*?)\*\*', r'\1', c.strip()) for c in line.split('|')[1:-1]]
-                if any(cells):
-                    rows.append(cells)
-    else:
-        reader = csv.reader(StringIO(content), delimiter='\t')
-        for row in reader:
-            if any(row):
-                row = [re.sub(r'\*\*(.*?)\*\*', r'\1', c) for c in row]
-                rows.append(row)
-    
-    if rows and any(k in str(rows[0]) for k in ['Ref', 'No', 'Word', 'Paragraph', 'English', 'Chinese', '口語訳']):
-        rows = rows[1:]
-    
-    if expected_cols and rows:
-        normalized = []
-        for row in rows:
-            if len(row) < expected_cols:
-                row = row + [''] * (expected_cols - len(row))
-            elif len(row) > expected_cols:
-                row = row[:expected_cols]
-            normalized.append(row)
-        rows = normalized
-    
-    return rows
+    背景同步執行緒不可呼叫 cache_resource，由呼叫端傳入 journal / write_behind。
+    """
+    journal = journal or get_sentence_journal()
+    write_behind = write_behind or get_write_behind()
+
+    def persist(queued):
+        data = store.snapshot()[0]
+        journal.write(data, queued)
+        store.release_persisted(data, queued)       # 寫出後不再常駐記憶體，改由分片快取讀取
+
+    write_behind.add("sentences", persist, list(refs))
+
+SENTENCES_TTL_SECONDS = 600
+
+@st.cache_resource(show_spinner=False)
+def get_sentence_store():
+    """整個 process 共用的 sentences 快照（所有 session 共享一份）"""
+    journal = get_sentence_journal()
+    write_behind = get_write_behind()
+    settings, registry = sheets_settings(), _sheets_registry()
+
+    def sync_from_sheets(base_data, skip_refs):
+        """背景同步（在背景執行緒執行，不可呼叫 st.*）；連線設定已在腳本執行緒取得，錯誤記在 store.error"""
+        if settings is None:
+            raise RuntimeError("Google Sheets 未設定")
+        return load_sentences_from_google_sheets(base_data, load_sync_cursor(), skip_refs, settings, registry)
+
+    def persist_sync_result(refs, cursor):
+        """同步改動的 ref 以最新快照寫回日誌（同步期間的本地儲存不會被蓋掉），成功後才更新 cursor"""
+        if refs:
+            queue_sentence_writes(store, refs, journal, write_behind)
+        write_behind.flush("sentences")
+        save_sync_cursor(cursor)
+
+    store = SentenceStore(
+        load_local_sentences(),
+        ttl=SENTENCES_TTL_SECONDS,
+        sync_fn=sync_from_sheets,
+        persist_fn=persist_sync_result,
+        history_fn=record_sentence_history
+    )
+    get_record_frame()
+    start_record_scan(store)
+    return store
 
-# ===================================================================
-# Google Sheets 儲存函式
-# ===================================================================
-def save_v1_sheet(ref, content, gc, sheet_id):
-    """儲存到 V1_Sheet"""
-    if not content or not content.strip() or not gc or not sheet_id:
-        return True
-    
-    try:
-        sh = gc.open_by_key(sheet_id)
-        try:
-            ws = sh.worksheet("V1_Sheet")
-        except gspread.WorksheetNotFound:
-            ws = sh.add_worksheet("V1_Sheet", rows=1000, cols=6)
-            ws.append_row(["檔名_批次", "Ref. 經文出處", "English（ESV經文）", "Chinese經文", "Syn/Ant", "Grammar"])
-        
-        rows = parse_content_to_rows(content, expected_cols=5)
-        if rows:
-            rows_with_group = [[ref] + row for row in rows]
-            ws.append_rows(rows_with_group)
-            st.sidebar.caption(f"  V1_Sheet：寫入 {len(rows_with_group)} 行")
-        return True
-    except Exception as e:
-        st.sidebar.error(f"  V1_Sheet 失敗：{e}")
-        return False
+def record_sentence_history(changes):
+    """共用快照寫入後記錄版本歷史：更新存反向差異，刪除存完整紀錄，新增只記一筆標記
 
-def save_v2_sheet(ref, content, gc, sheet_id):
-    """儲存到 V2_Sheet"""
-    if not content or not content.strip() or not gc or not sheet_id:
-        return True
-    
-    try:
-        sh = gc.open_by_key(sheet_id)
+    同一筆紀錄在 HISTORY_COALESCE_SECONDS 內連續修改時，改寫上一筆修改歷史而不是再加一筆。
+    資料庫錯誤不影響儲存本身：寫進 log，並在側邊欄的同步狀態下方提示（history_error）。
+    """
+    now = datetime.datetime.now()
+    st.session_state.pop('history_error', None)
+    for ref, old, new in changes:
+        if old == new:
+            continue
         try:
-            ws = sh.worksheet("V2_Sheet")
-        except gspread.WorksheetNotFound:
-            ws = sh.add_worksheet("V2_Sheet", rows=1000, cols=8)
-            ws.append_row(["檔名_批次", "Ref.經文出處", "口語訳", "Grammar", "Note", "KRF", "Korean Syn/Ant", "THSV11 泰文重要片語"])
-        
-        rows = parse_content_to_rows(content, expected_cols=7)
-        if rows:
-            rows_with_group = [[ref] + row for row in rows]
-            ws.append_rows(rows_with_group)
-            st.sidebar.caption(f"  V2_Sheet：寫入 {len(rows_with_group)} 行")
-        return True
-    except Exception as e:
-        st.sidebar.error(f"  V2_Sheet 失敗：{e}")
-        return False
+            db = get_app_db()
+            op, body, replace_id = "update", None, None
+            if old is None:
+                op = "create"
+            elif new is None:
+                op, body = "delete", old
+            else:
+                body = make_delta(new, old)
+                last = (db.load_history(ref, limit=1) or [None])[0]
+                if last and last['op'] == "update" and last['digest'] == record_digest(old) \
+                        and (now - datetime.datetime.fromisoformat(last['timestamp'])).total_seconds() < HISTORY_COALESCE_SECONDS:
+                    replace_id = last['id']
+                    body = make_delta(new, apply_delta(old, last['body']))
+            db.add_history(ref, now.isoformat(timespec="seconds"), op, record_digest(new), body, replace_id)
+        except sqlite3.Error as e:
+            logger.warning("版本歷史寫入失敗 %s: %s", ref, e)
+            st.session_state.history_error = f"{ref}：{e}"
+
+def sentence_versions(ref, current):
+    """由目前紀錄往回套用反向差異，回傳各次變更前的版本（新的在前）
+
+    [{"id", "timestamp", "op", "record"}]；record 為 None 表示當時尚未建立。
+    遇到雜湊對不上（中間有未記錄的變更，例如 Sheets 同步）時停止，更早的版本無法還原。
+    """
+    versions = []
+    record = current
+    for entry in get_app_db().load_history(ref):
+        if entry['digest'] != record_digest(record):
+            break
+        if entry['op'] == "delete":
+            record = entry['body']
+        elif entry['op'] == "create":
+            record = None
+        else:
+            record = apply_delta(record, entry['body'])
+        versions.append({'id': entry['id'], 'timestamp': entry['timestamp'], 'op': entry['op'], 'record': record})
+        if record is None:
+            break
+    return versions
 
-def save_w_sheet(ref, content, gc, sheet_id):
-    """儲存到 W_Sheet"""
-    if not content or not content.strip() or not gc or not sheet_id:
-        return True
-    
-    try:
-        sh = gc.open_by_key(sheet_id)
-        try:
-            ws = sh.worksheet("W_Sheet")
-        except gspread.WorksheetNotFound:
-            ws = sh.add_worksheet("W_Sheet", rows=1000, cols=6)
-            ws.append_row(["檔名_批次", "No經卷範圍", "Word/Phrase+Chinese", "Synonym+中文對照", "Antonym+中文對照", "全句聖經中英對照例句"])
-        
-        rows = parse_content_to_rows(content, expected_cols=5)
-        if rows:
-            rows_with_group = [[ref] + row for row in rows]
-            ws.append_rows(rows_with_group)
-            st.sidebar.caption(f"  W_Sheet：寫入 {len(rows_with_group)} 行")
-        return True
-    except Exception as e:
-        st.sidebar.error(f"  W_Sheet 失敗：{e}")
-        return False
+def _bind_snapshot(data, version, revisions):
+    st.session_state.sentences = data
+    st.session_state.sentences_version = version
+    st.session_state.sentence_revisions = revisions
 
-def save_p_sheet(ref, content, gc, sheet_id):
-    """儲存到 P_Sheet"""
-    if not content or not content.strip() or not gc or not sheet_id:
-        return True
+def load_sentences():
+    """取得共用快照：立即回傳本地資料，過期時在背景向 Google Sheets 同步"""
+    store = get_sentence_store()
+    store.refresh_if_stale()
+    data, version, revisions = store.snapshot()
+    _bind_snapshot(data, version, revisions)
+    return data
+
+def bind_shared_sentences():
+    """每次重跑時確認 session 綁定的是最新版本的共用快照（只換參照，不複製）"""
+    store = get_sentence_store()
+    store.refresh_if_stale()
+    data, version, revisions = store.snapshot()
+    if st.session_state.get('sentences_version') != version or 'sentences' not in st.session_state:
+        _bind_snapshot(data, version, revisions)
+
+# 編輯區 current_entry 的鍵 → 紀錄的表格欄位
+ENTRY_TABLE_FIELDS = {
+    'v1': 'v1_content', 'v2': 'v2_content',
+    'w_sheet': 'w_sheet', 'p_sheet': 'p_sheet', 'grammar_list': 'grammar_list'
+}
+
+def record_field_text(record, field):
+    """欄位的顯示文字：表格欄位轉成含標題列的 TSV，其他非字串欄位轉成 JSON"""
+    if field in TABLE_COLUMNS:
+        rows = table_rows(record, field)
+        return rows_to_text(field, rows) if rows else ""
+    value = record.get(field, "")
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=1)
+
+def record_to_entry(record):
+    """紀錄 → 編輯區內容（表格欄位轉成含標題列的 TSV 文字）"""
+    entry = {key: rows_to_text(field, table_rows(record, field)) for key, field in ENTRY_TABLE_FIELDS.items()}
+    entry['other'] = record.get('other', '')
+    return entry
+
+def sentence_base(ref):
+    """session 目前看到的 (revision, 紀錄)，寫入時用來檢查是否依據過期資料"""
+    revisions = st.session_state.get('sentence_revisions', {})
+    return revisions.get(ref, 0), st.session_state.get('sentences', {}).get(ref)
+
+def render_sync_status():
+    """側邊欄小字：雲端同步狀態"""
+    store = get_sentence_store()
+    if store.status == "syncing":
+        st.caption("🔄 雲端同步中…（先顯示本地資料）")
+    elif store.status == "synced":
+        st.caption(f"✅ 已同步 {store.synced_at.strftime('%H:%M')}　{store.note}")
+    elif store.status == "failed":
+        st.caption(f"⚠️ 同步失敗，使用本地資料：{store.error}")
+    history_error = st.session_state.get('history_error') or store.history_error
+    if history_error:
+        st.caption(f"⚠️ 已儲存，但版本歷史未記錄（{history_error}）")
+
+CONCORDANCE_FIELD_LABELS = {"v1_content": "V1 Syn/Ant", "w_sheet": "W Sheet", "vocabulary": "單字", "phrases": "片語"}
+
+def concordance_button(container, word, exclude_ref, key):
+    """單字方塊旁的「其他出處」按鈕；沒有其他出處時不顯示"""
+    hits = get_concordance().lookup(word, exclude_ref=exclude_ref) if word else []
+    if hits and container.button(f"🔎 {len(hits)}", key=key, help="這個字還出現在哪裡"):
+        st.session_state.concordance_word = word
+        st.session_state.concordance_ref = exclude_ref
+
+def render_concordance_panel(exclude_ref):
+    """TAB1 單字區下方：選取的單字／片語在其他紀錄的出現位置（換到別筆紀錄時收起）"""
+    word = st.session_state.get('concordance_word')
+    if word and st.session_state.get('concordance_ref') != exclude_ref:
+        st.session_state.concordance_word = word = None
+    if not word:
+        return
+    concordance = get_concordance()
+    hits = concordance.lookup(word, exclude_ref=exclude_ref)
+    head = st.columns([8, 1])
+    head[0].markdown(f"**🔎 「{word}」的其他出處（{len(hits)}）**")
+    if head[1].button("✖", key="concordance_close"):
+        st.session_state.concordance_word = None
+        st.rerun()
+    if concordance.building:
+        st.caption("⏳ 單字索引建立中，結果可能不完整")
+    for hit in hits:
+        st.caption(f"📖 {hit['ref']} · {CONCORDANCE_FIELD_LABELS[hit['field']]} 第 {hit['row'] + 1} 列：{hit['text']}")
+
+def save_sentence(ref, record, base=None):
+    """寫入一筆紀錄（record 為 None 表示刪除），成功回傳 True
     
+    所有 session 的寫入都經過共用快照序列化；base 是 sentence_base() 取得的讀取版本，
+    期間被其他 session 改過時自動合併不同欄位，同一欄位衝突則拒絕寫入。
+    磁碟寫入排入延遲寫入，一次互動只寫一次日誌。
+    """
+    store = get_sentence_store()
     try:
-        sh = gc.open_by_key(sheet_id)
-        try:
-            ws = sh.worksheet("P_Sheet")
-        except gspread.WorksheetNotFound:
-            ws = sh.add_worksheet("P_Sheet", rows=1000, cols=4)
-            ws.append_row(["檔名_批次", "Paragraph", "English Refinement", "中英夾雜講章"])
-        
-        rows = parse_content_to_rows(content, expected_cols=3)
-        if rows:
-            rows_with_group = [[ref] + row for row in rows]
-            ws.append_rows(rows_with_group)
-            st.sidebar.caption(f"  P_Sheet：寫入 {len(rows_with_group)} 行")
-        return True
+        data, version, revisions = store.write({ref: record}, {ref: base} if base is not None else None)
+    except StaleWriteError as e:
+        st.error(f"⚠️ {e} 已被其他使用者修改，請重新載入後再儲存")
+        return False
     except Exception as e:
-        st.sidebar.error(f"  P_Sheet 失敗：{e}")
+        st.error(f"儲存本地資料庫失敗：{e}")
         return False
-
-def save_grammar_sheet(ref, content, gc, sheet_id):
-    """儲存到 Grammar_List"""
-    if not content or not content.strip() or not gc or not sheet_id:
-        return True
     
+    _bind_snapshot(data, version, revisions)
+    queue_sentence_writes(store, [ref])
+    return True
+
+def delete_sentence(ref, base=None):
+    """刪除一筆紀錄"""
+    return save_sentence(ref, None, base)
+
+# ===================================================================
+# Google Sheets 儲存函式
+# ===================================================================
+def _sheet_ids(sh):
+    """共用登記表中此試算表的 {工作表: sheetId} 快取"""
+    registry = _sheets_registry()
+    with registry["lock"]:
+        return registry["sheet_ids"].setdefault(sh.id, {})
+
+def append_record_rows(sh, rows_by_sheet):
+    """一次 batch_update 寫入一筆紀錄的所有工作表；sheetId 快取在共用登記表"""
+    sheet_ids = _sheet_ids(sh)
     try:
-        sh = gc.open_by_key(sheet_id)
-        try:
-            ws = sh.worksheet("Grammar_List")
-        except gspread.WorksheetNotFound:
-            ws = sh.add_worksheet("Grammar_List", rows=1000, cols=5)
-            ws.append_row(["檔名_批次", "No經卷範圍", "Original Sentence＋中文翻譯", "Grammar Rule", "Analysis & Example"])
-        
-        rows = parse_content_to_rows(content, expected_cols=4)
-        if rows:
-            rows_with_group = [[ref] + row for row in rows]
-            ws.append_rows(rows_with_group)
-            st.sidebar.caption(f"  Grammar_List：寫入 {len(rows_with_group)} 行")
-        return True
-    except Exception as e:
-        st.sidebar.error(f"  Grammar_List 失敗：{e}")
-        return False
+        return batch_append_rows(sh, rows_by_sheet, sheet_ids)
+    except Exception:
+        # 工作表可能被刪除或重建，下次重新讀取 sheetId
+        sheet_ids.clear()
+        raise
+
+def get_ref_index(sh, sheet_name):
+    """取得共用的 A 欄 ref 索引（每個試算表的每個工作表一份）"""
+    registry = _sheets_registry()
+    with registry["lock"]:
+        key = (sh.id, sheet_name)
+        if key not in registry["ref_indexes"]:
+            registry["ref_indexes"][key] = RefIndex(sheet_name, max_age=SENTENCES_TTL_SECONDS)
+        return registry["ref_indexes"][key]
 
 def save_to_google_sheets(data_dict):
-    """將資料分別存入對應的 5 個工作表"""
+    """將資料存入對應的工作表（所有工作表合併成一次 batch_update）"""
     gc, sheet_id = get_google_sheets_client()
     
     if not gc or not sheet_id:
@@ -777,18 +1002,16 @@ def save_to_google_sheets(data_dict):
         ref = data_dict.get('ref', 'N/A')
         mode = data_dict.get('mode', 'A')
         
-        sh = gc.open_by_key(sheet_id)
-        existing_refs = set()
-        
         check_sheet = "V1_Sheet" if mode == 'A' else "W_Sheet"
-        try:
-            ws = sh.worksheet(check_sheet)
-            all_values = ws.get_all_values()
-            for row in all_values[1:]:
-                if row and len(row) > 0:
-                    existing_refs.add(row[0].strip())
-        except gspread.WorksheetNotFound:
-            pass
+        
+        def read_existing_refs(gc, sh):
+            index = get_ref_index(sh, check_sheet)
+            index.refresh(sh)
+            return index
+        
+        existing_refs = with_sheets_retry(read_existing_refs)
+        if existing_refs is None:
+            return False, "Google Sheets 未連線"
         
         if ref in existing_refs:
             st.sidebar.warning(f"⚠️ {ref} 已存在，跳過重複儲存")
@@ -796,25 +1019,17 @@ def save_to_google_sheets(data_dict):
         
         st.sidebar.info(f"📝 開始儲存：{ref}（模式 {mode}）")
         
-        if mode == 'A':
-            success_v1 = save_v1_sheet(ref, data_dict.get('v1_content', ''), gc, sheet_id)
-            success_v2 = save_v2_sheet(ref, data_dict.get('v2_content', ''), gc, sheet_id)
-            
-            if success_v1 and success_v2:
-                st.sidebar.success(f"✅ 模式A儲存完成：{ref}")
-                return True, "Mode A saved"
-            else:
-                return False, f"V1={success_v1}, V2={success_v2}"
-        else:
-            success_w = save_w_sheet(ref, data_dict.get('w_sheet', ''), gc, sheet_id)
-            success_p = save_p_sheet(ref, data_dict.get('p_sheet', ''), gc, sheet_id)
-            success_g = save_grammar_sheet(ref, data_dict.get('grammar_list', ''), gc, sheet_id)
-            
-            if success_w and success_p and success_g:
-                st.sidebar.success(f"✅ 模式B儲存完成：{ref}")
-                return True, "Mode B saved"
-            else:
-                return False, f"W={success_w}, P={success_p}, G={success_g}"
+        rows_by_sheet = build_sheet_rows(data_dict)
+        written = with_sheets_retry(lambda gc, sh: append_record_rows(sh, rows_by_sheet))
+        if written is None:
+            return False, "Google Sheets 未連線"
+        
+        existing_refs.record_append(rows_by_sheet.get(check_sheet, []))
+        if written:
+            st.sidebar.caption("  " + "、".join(f"{name}：寫入 {count} 行" for name, count in written.items()))
+        get_sentence_store().invalidate(pushed_refs=[ref])
+        st.sidebar.success(f"✅ 模式{mode}儲存完成：{ref}")
+        return True, f"Mode {mode} saved"
             
     except Exception as e:
         st.sidebar.error(f"❌ 儲存失敗：{str(e)}")
@@ -822,146 +1037,84 @@ def save_to_google_sheets(data_dict):
         st.sidebar.code(traceback.format_exc())
         return False, str(e)
 
-def load_sentences_from_google_sheets():
-    """從 Google Sheets 載入所有資料"""
-    gc, sheet_id = get_google_sheets_client()
+def bulk_sync_to_google_sheets(records, to_payload, on_progress=None):
+    """將尚未在雲端的紀錄合併成少數幾次 batch_update 上傳
     
-    if not gc or not sheet_id:
-        st.sidebar.error("❌ 無法連線到 Google Sheets")
-        return {}
-    
-    all_data = {}
-    sh = gc.open_by_key(sheet_id)
+    records：{ref: 紀錄}；to_payload(紀錄) 轉成 save_to_google_sheets 的資料格式
+    on_progress(完成批數, 總批數, 已同步筆數)：每批寫入後呼叫
+    回傳 (已同步的 ref 清單, 錯誤訊息或 None)；中途失敗時已寫入的部分仍會回傳
+    """
+    synced = []
     
-    # V1_Sheet
-    try:
-        ws = sh.worksheet("V1_Sheet")
-        rows = ws.get_all_values()
-        st.sidebar.caption(f"📊 V1_Sheet：讀取 {len(rows)} 行")
+    def run(gc, sh):
+        indexes = {"A": get_ref_index(sh, "V1_Sheet"), "B": get_ref_index(sh, "W_Sheet")}
+        for index in indexes.values():
+            index.refresh(sh)
         
-        if len(rows) > 1:
-            for row in rows[1:]:
-                if len(row) >= 6:
-                    group_ref = row[0].strip()
-                    
-                    if group_ref not in all_data:
-                        all_data[group_ref] = {
-                            "ref": group_ref,
-                            "mode": "A",
-                            "type": "Scripture",
-                            "v1_content": "Ref.\tEnglish（ESV經文）\tChinese經文\tSyn/Ant\tGrammar\n",
-                            "v2_content": "",
-                            "w_sheet": "",
-                            "p_sheet": "",
-                            "grammar_list": "",
-                            "other": "",
-                            "saved_sheets": ["V1 Sheet"],
-                            "date_added": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                        }
-                    row_data = row[1:6] if len(row) >= 6 else row[1:] + [''] * (6 - len(row))
-                    all_data[group_ref]["v1_content"] += "\t".join(row_data) + "\n"
-    except gspread.WorksheetNotFound:
-        st.sidebar.caption("ℹ️ V1_Sheet 不存在")
-    except Exception as e:
-        st.sidebar.error(f"V1_Sheet 讀取錯誤：{e}")
-    
-    # V2_Sheet
-    try:
-        ws = sh.worksheet("V2_Sheet")
-        rows = ws.get_all_values()
-        st.sidebar.caption(f"📊 V2_Sheet：讀取 {len(rows)} 行")
+        pending = unsynced_record_rows(records, indexes, to_payload,
+                                       lambda ref: sentence_meta(records, ref).get('mode', 'A'))
         
-        if len(rows) > 1:
-            for row in rows[1:]:
-                if len(row) >= 8:
-                    group_ref = row[0].strip()
-                    
-                    if group_ref in all_data:
-                        row_data = row[1:8] if len(row) >= 8 else row[1:] + [''] * (8 - len(row))
-                        all_data[group_ref]["v2_content"] += "\t".join(row_data) + "\n"
-                        if "V2 Sheet" not in all_data[group_ref]["saved_sheets"]:
-                            all_data[group_ref]["saved_sheets"].append("V2 Sheet")
-    except gspread.WorksheetNotFound:
-        st.sidebar.caption("ℹ️ V2_Sheet 不存在")
-    except Exception as e:
-        st.sidebar.error(f"V2_Sheet 讀取錯誤：{e}")
-    
-    # W_Sheet
-    try:
-        ws = sh.worksheet("W_Sheet")
-        rows = ws.get_all_values()
-        st.sidebar.caption(f"📊 W_Sheet：讀取 {len(rows)} 行")
+        def on_batch(done, total, refs, rows_by_sheet):
+            indexes["A"].record_append(rows_by_sheet.get("V1_Sheet", []))
+            indexes["B"].record_append(rows_by_sheet.get("W_Sheet", []))
+            synced.extend(refs)
+            if on_progress:
+                on_progress(done, total, len(synced))
         
-        if len(rows) > 1:
-            for row in rows[1:]:
-                if len(row) >= 6:
-                    group_ref = row[0].strip()
-                    
-                    if group_ref not in all_data:
-                        all_data[group_ref] = {
-                            "ref": group_ref,
-                            "mode": "B",
-                            "type": "Document",
-                            "v1_content": "",
-                            "v2_content": "",
-                            "w_sheet": "No經卷範圍\tWord/Phrase+Chinese\tSynonym+中文對照\tAntonym+中文對照\t全句聖經中英對照例句\n",
-                            "p_sheet": "",
-                            "grammar_list": "No經卷範圍\tOriginal Sentence＋中文翻譯\tGrammar Rule\tAnalysis & Example\n",
-                            "other": "",
-                            "saved_sheets": ["W Sheet"],
-                            "date_added": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                        }
-                    row_data = row[1:6] if len(row) >= 6 else row[1:] + [''] * (6 - len(row))
-                    all_data[group_ref]["w_sheet"] += "\t".join(row_data) + "\n"
-    except gspread.WorksheetNotFound:
-        st.sidebar.caption("ℹ️ W_Sheet 不存在")
-    except Exception as e:
-        st.sidebar.error(f"W_Sheet 讀取錯誤：{e}")
+        sheet_ids = _sheet_ids(sh)
+        try:
+            bulk_append(sh, chunk_record_rows(pending, BULK_SYNC_MAX_ROWS), sheet_ids,
+                        _sheets_registry()["write_limiter"], on_batch)
+        except Exception:
+            sheet_ids.clear()
+            raise
+        return True
     
-    # P_Sheet
     try:
-        ws = sh.worksheet("P_Sheet")
-        rows = ws.get_all_values()
-        st.sidebar.caption(f"📊 P_Sheet：讀取 {len(rows)} 行")
-        
-        if len(rows) > 1:
-            for row in rows[1:]:
-                if len(row) >= 4:
-                    group_ref = row[0].strip()
-                    
-                    if group_ref in all_data and all_data[group_ref]["mode"] == "B":
-                        row_data = row[1:4] if len(row) >= 4 else row[1:] + [''] * (4 - len(row))
-                        all_data[group_ref]["p_sheet"] += "\t".join(row_data) + "\n"
-                        if "P Sheet" not in all_data[group_ref]["saved_sheets"]:
-                            all_data[group_ref]["saved_sheets"].append("P Sheet")
-    except gspread.WorksheetNotFound:
-        st.sidebar.caption("ℹ️ P_Sheet 不存在")
+        if with_sheets_retry(run) is None:
+            return synced, "Google Sheets 未連線"
     except Exception as e:
-        st.sidebar.error(f"P_Sheet 讀取錯誤：{e}")
+        return synced, str(e)
+    finally:
+        if synced:
+            get_sentence_store().invalidate(pushed_refs=synced)
+    return synced, None
+
+def load_sentences_from_google_sheets(local_data, cursor, skip_refs, settings, registry):
+    """從 Google Sheets 同步資料：cursor 吻合時只讀新增列，否則整份批次讀取
     
-    # Grammar_List
-    try:
-        ws = sh.worksheet("Grammar_List")
-        rows = ws.get_all_values()
-        st.sidebar.caption(f"📊 Grammar_List：讀取 {len(rows)} 行")
-        
-        if len(rows) > 1:
-            for row in rows[1:]:
-                if len(row) >= 5:
-                    group_ref = row[0].strip()
-                    
-                    if group_ref in all_data and all_data[group_ref]["mode"] == "B":
-                        row_data = row[1:5] if len(row) >= 5 else row[1:] + [''] * (5 - len(row))
-                        all_data[group_ref]["grammar_list"] += "\t".join(row_data) + "\n"
-                        if "Grammar List" not in all_data[group_ref]["saved_sheets"]:
-                            all_data[group_ref]["saved_sheets"].append("Grammar List")
-    except gspread.WorksheetNotFound:
-        st.sidebar.caption("ℹ️ Grammar_List 不存在")
-    except Exception as e:
-        st.sidebar.error(f"Grammar_List 讀取錯誤：{e}")
+    settings（sheets_settings()）與 registry（_sheets_registry()）由腳本執行緒傳入，
+    這裡不呼叫 st.* 介面，可在背景執行緒執行。
+    回傳 (sentences, 新 cursor, 是否有變動, 說明文字)；連線或讀取失敗時丟出例外
+    """
+    result = with_sheets_retry(lambda gc, sh: sync_sheets(sh, local_data or {}, cursor or {}, skip_refs),
+                               settings, registry)
+    
+    all_data, new_cursor, mode, new_rows, changed = result
+    if mode == "full":
+        note = f"整份讀取 {len(all_data)} 筆，{len(changed)} 筆有變動"
+    else:
+        note = f"新增 {new_rows} 行"
     
-    st.sidebar.success(f"✅ 共載入 {len(all_data)} 筆資料")
-    return all_data
+    # 整份重讀或有新增列時才需要改寫本地快取與 cursor
+    return all_data, new_cursor, mode == "full" or new_rows > 0, note
+
+# ===================================================================
+# TAB1 多語言結構模板（模板與 strip_default_grammar 在 grammar_template.py）
+# ===================================================================
+def finish_default_grammar_strip(store, stripped, journal, write_behind, db):
+    """一次性清理：舊版把模板副本存進每筆紀錄，移除後寫回（完成後記在資料庫）
+
+    stripped：啟動掃描收集的 {ref: (掃描時的 revision, 原紀錄, 清理後紀錄)}；
+    掃描期間被改過的紀錄走三方合併，無法合併時整批不寫，下次啟動再試。
+    """
+    if stripped:
+        store.write({ref: new for ref, (_, _, new) in stripped.items()},
+                    {ref: (revision, old) for ref, (revision, old, _) in stripped.items()}, history=False)
+        queue_sentence_writes(store, stripped, journal, write_behind)
+        write_behind.flush("sentences")
+    db.set_meta('default_grammar_stripped', str(len(stripped)))
+    return len(stripped)
 
 # ===================================================================
 # 全域工具函式
@@ -999,10 +1152,7 @@ def to_excel(result: dict) -> bytes:
 # ===================================================================
 # Session State 初始化
 # ===================================================================
-if 'todo' not in st.session_state:
-    st.session_state.todo = load_todos()
-if 'favorite_sentences' not in st.session_state:
-    st.session_state.favorite_sentences = load_favorites()
+bind_shared_app_state()
 if 'sel_date' not in st.session_state:
     st.session_state.sel_date = str(datetime.date.today())
 if 'cal_key' not in st.session_state:
@@ -1013,8 +1163,7 @@ if 'active_fav_del' not in st.session_state:
     st.session_state.active_fav_del = None
 if 'notes' not in st.session_state:
     st.session_state.notes = {}
-if 'sentences' not in st.session_state:
-    st.session_state.sentences = load_sentences()
+bind_shared_sentences()
 
 # ===================================================================
 # 1. 側邊欄（簡化版 + 書桌導航控制）
@@ -1129,12 +1278,25 @@ with st.sidebar:
     
     st.divider()
     
+    # ===== 雲端同步狀態 =====
+    sentence_store = get_sentence_store()
+    if hasattr(st, "fragment") and sentence_store.status == "syncing":
+        # 同步進行中：每 2 秒檢查一次，完成後整頁重跑以換入新資料
+        @st.fragment(run_every=2)
+        def sync_status_fragment():
+            render_sync_status()
+            if sentence_store.status != "syncing":
+                st.rerun()
+        sync_status_fragment()
+    else:
+        render_sync_status()
+    
     # ===== 檢查雲端工作表（最底部）=====
     if st.button("🔎 檢查雲端工作表", use_container_width=True):
         gc, sheet_id = get_google_sheets_client()
         if gc and sheet_id:
             try:
-                sh = gc.open_by_key(sheet_id)
+                sh = open_spreadsheet(gc, sheet_id)
                 all_worksheets = sh.worksheets()
                 st.write(f"找到 {len(all_worksheets)} 個工作表：")
                 for ws in all_worksheets:
@@ -1251,60 +1413,6 @@ with tabs[0]:
 
     sentences = st.session_state.get('sentences', {})
 
-    # ========== 多語言預設資料庫（結構模板）==========
-    default_multilang_data = {
-        "來6:3": {
-            "ref": "Heb 6:3",
-            "chinese": "神若許我們、我們必如此行。",
-            "english": "And this we will do if God permits.",
-            "japanese": "神が許して下さるなら、わたしたちはこのようにします。",
-            "korean": "하나님이 허락하시면 우리가 이것을 하리라",
-            "thai": "ถ้าพระเจ้าทรงอนุญาต เราก็จะได้เดินหน้าต่อไป",
-            "grammar": {
-                "english": {
-                    "full": "And this we will do if God permits.",
-                    "upper": {"title": "①", "content": "when + God + desired + to show...", "breakdown": "當 + 神 + 想要 + 顯明..."},
-                    "lower": {"title": "②", "content": "he + guaranteed + it + with an oath", "breakdown": "祂 + 保證 + 這事 + 用 + 起誓"},
-                    "points": [
-                        {"label": "A", "rule": "when-clause（時間副詞子句）", "pattern": "when + S + V 👉 當…時", "example": "when God speaks", "trans": "當神說話時"},
-                        {"label": "B", "rule": "to show（不定詞表目的）", "pattern": "verb + to + V 👉 為了…", "example": "desired to show", "trans": "想要顯明"},
-                        {"label": "C", "rule": "with an oath（方式介系詞）", "pattern": "with + N 👉 用…方式", "example": "with an oath", "trans": "用起誓"}
-                    ]
-                },
-                "thai": {
-                    "full": "ถ้าพระเจ้าทรงอนุญาต เราก็จะได้เดินหน้าต่อไป",
-                    "upper": {"title": "①", "content": "ถ้า + พระเจ้า + ทรงอนุญาต", "breakdown": "if + God + permits"},
-                    "lower": {"title": "②", "content": "เรา + ก็ + จะ + ได้ + เดินหน้า + ต่อไป", "breakdown": "we + then + will + be able to + move forward"},
-                    "points": [
-                        {"label": "A", "rule": "Clause + จึง + Result", "pattern": "👉 因此，所以", "example": "เหนื่อยมาก จึงไปนอน", "trans": "很累，所以去睡覺"},
-                        {"label": "B", "rule": "N＋อัน＋描述詞", "pattern": "👉 which/that", "example": "พระประสงค์อันไม่เปลี่ยนแปลง", "trans": "不改變的旨意"},
-                        {"label": "C", "rule": "ทรง（Royal Verb Marker）", "pattern": "พระเจ้า + ทรง + V", "example": "พระเจ้าทรงรัก", "trans": "神愛"}
-                    ]
-                },
-                "japanese": {
-                    "full": "神が許して下さるなら、わたしたちはこのようにします。",
-                    "upper": {"title": "①", "content": "約束の相続人たちに...望んで", "breakdown": "promise + heirs + to | desiring"},
-                    "lower": {"title": "②", "content": "誓いによって保証された", "breakdown": "oath + by + guaranteed"},
-                    "points": [
-                        {"label": "A", "rule": "N1のN2（名詞修飾）", "pattern": "", "example": "約束の相続人", "trans": "應許的繼承人"},
-                        {"label": "B", "rule": "こと（名詞化）", "pattern": "V + こと", "example": "変わらないこと", "trans": "不改變這件事"},
-                        {"label": "C", "rule": "N＋によって（方式）", "pattern": "", "example": "誓いによって", "trans": "藉著誓言"}
-                    ]
-                },
-                "korean": {
-                    "full": "하나님이 허락하시면 우리가 이것을 하리라",
-                    "upper": {"title": "①", "content": "약속의 상속자들에게...나타내시려고", "breakdown": "應許的 + 繼承人 + 對 | 為了顯明"},
-                    "lower": {"title": "②", "content": "맹세로 보증하셨느니라", "breakdown": "藉著 + 起誓 + 保證"},
-                    "points": [
-                        {"label": "A", "rule": "Verb+려고（目的）", "pattern": "", "example": "나타내시려고", "trans": "為了顯明"},
-                        {"label": "B", "rule": "Verb+함（名詞化）", "pattern": "", "example": "변하지 아니함", "trans": "不改變這件事"},
-                        {"label": "C", "rule": "N＋로（方式）", "pattern": "N + 로", "example": "맹세로", "trans": "用誓言"}
-                    ]
-                }
-            }
-        }
-    }
-
     # ========== 資料轉換函數（Sheets 專用，與 TAB1 顯示邏輯分離）==========
     def build_sheet_payload(clean_data: dict) -> dict:
         """將乾淨資料組裝成 Google Sheets 所需的 v1/v2 格式"""
@@ -1316,21 +1424,15 @@ with tabs[0]:
         thai = clean_data.get('thai', '')
         grammar = clean_data.get('grammar', {})
 
-        header_v1 = "Ref.\tEnglish（ESV經文）\tChinese經文\tSyn/Ant\tGrammar"
-        v1_content = header_v1 + f"\n{ref}\t{english}\t{chinese}\t\t"
-
-        header_v2 = "Ref.\t口語訳\tGrammar\tNote\tKRF\tKorean Syn/Ant\tTHSV11 泰文重要片語"
-        v2_content = header_v2 + f"\n{ref}\t{japanese}\t\t\t{korean}\t\t{thai}"
-
         return {
             "ref": ref,
             "type": "Scripture",
             "mode": "A",
-            "v1_content": v1_content,
-            "v2_content": v2_content,
-            "w_sheet": "",
-            "p_sheet": "",
-            "grammar_list": "",
+            "v1_content": [[ref, english, chinese, "", ""]],
+            "v2_content": [[ref, japanese, "", "", korean, "", thai]],
+            "w_sheet": [],
+            "p_sheet": [],
+            "grammar_list": [],
             "other": json.dumps(grammar, ensure_ascii=False),
             "saved_sheets": ["V1 Sheet", "V2 Sheet"],
             "date_added": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
@@ -1433,14 +1535,11 @@ with tabs[0]:
         if st.button("📞 叫出", key="call_btn", use_container_width=True):
             selected = st.session_state.get('saved_verse_selector', '')
             if selected and selected in sentences:
-                data = sentences[selected].copy()
+                data = sentences[selected]
                 call_mode = st.session_state.get('call_mode', 'en-th')
 
-                # 確保 grammar 結構完整
-                grammar = data.get('grammar', {})
-                for lang in ['english', 'thai', 'japanese', 'korean']:
-                    if lang not in grammar:
-                        grammar[lang] = default_multilang_data["來6:3"]['grammar'][lang]
+                # 只帶紀錄本身的 grammar；缺少的語言在顯示時才以模板補上
+                grammar = data.get('grammar') or {}
 
                 if call_mode == "en-th":
                     st.session_state.tab1_current_data = {
@@ -1450,12 +1549,7 @@ with tabs[0]:
                         'japanese': '',
                         'korean': '',
                         'thai': data.get('thai', ''),
-                        'grammar': {
-                            'english': grammar.get('english', {}),
-                            'thai': grammar.get('thai', {}),
-                            'japanese': default_multilang_data["來6:3"]['grammar']['japanese'],
-                            'korean': default_multilang_data["來6:3"]['grammar']['korean']
-                        },
+                        'grammar': {lang: grammar[lang] for lang in ('english', 'thai') if grammar.get(lang)},
                         'vocabulary': data.get('vocabulary', []),
                         'phrases': data.get('phrases', []),
                         'segments': data.get('segments', [])
@@ -1468,12 +1562,7 @@ with tabs[0]:
                         'japanese': data.get('japanese', ''),
                         'korean': data.get('korean', ''),
                         'thai': '',
-                        'grammar': {
-                            'english': grammar.get('english', {}),
-                            'thai': default_multilang_data["來6:3"]['grammar']['thai'],
-                            'japanese': grammar.get('japanese', {}),
-                            'korean': grammar.get('korean', {})
-                        },
+                        'grammar': {lang: grammar[lang] for lang in ('english', 'japanese', 'korean') if grammar.get(lang)},
                         'vocabulary': data.get('vocabulary', []),
                         'phrases': data.get('phrases', []),
                         'segments': data.get('segments', [])
@@ -1523,14 +1612,12 @@ with tabs[0]:
                     korean = data.get('korean', '')
                     thai = data.get('thai', '')
 
-                    # 建立完整 grammar（五語全存）
-                    grammar_data = data.get('grammar', {})
-                    for lang in ['english', 'thai', 'japanese', 'korean']:
-                        if lang not in grammar_data:
-                            grammar_data[lang] = default_multilang_data["來6:3"]['grammar'][lang]
+                    # 只存貼上的 grammar；缺少的語言顯示時以模板補上，不再複製進紀錄
+                    grammar_data = strip_default_grammar({'grammar': data.get('grammar') or {}})['grammar']
 
                     # 合併既有資料（若已存在）
-                    existing = sentences.get(ref_input, {})
+                    base = sentence_base(ref_input)
+                    existing = base[1] or {}
                     if save_en_th:
                         verse_data = {
                             "ref": ref_input,
@@ -1558,14 +1645,10 @@ with tabs[0]:
                             "segments": data.get('segments', existing.get('segments', []))
                         }
 
-                    if 'sentences' not in st.session_state:
-                        st.session_state.sentences = {}
-                    st.session_state.sentences[ref_input] = verse_data
-                    save_sentences(st.session_state.sentences)
-
-                    st.success(f"✅ 已存檔：{ref_input}（純本地，未同步 Sheets）")
-                    st.balloons()
-                    st.rerun()
+                    if save_sentence(ref_input, verse_data, base):
+                        st.success(f"✅ 已存檔：{ref_input}（純本地，未同步 Sheets）")
+                        st.balloons()
+                        st.rerun()
 
                 except json.JSONDecodeError:
                     st.error("❌ JSON 格式錯誤")
@@ -1595,6 +1678,28 @@ with tabs[0]:
                 else:
                     st.warning("請先選擇經文")
 
+        # --- 批次同步：找出雲端還沒有的經文，合併成少數幾次寫入 ---
+        if st.button("📤 同步全部未上傳", use_container_width=True, key="bulk_sync_btn", disabled=not has_saved):
+            progress = st.progress(0.0, text="檢查雲端已有的經文...")
+
+            def show_progress(done, total, count):
+                progress.progress(done / total, text=f"已上傳 {count} 筆（第 {done}/{total} 批）")
+
+            def to_payload(record):
+                # 從 Sheets 同步下來或 TAB5 存的紀錄已是工作表格式
+                if 'v1_content' in record or 'w_sheet' in record:
+                    return record
+                return build_sheet_payload(record)
+
+            synced, error = bulk_sync_to_google_sheets(sentences, to_payload, show_progress)
+            progress.empty()
+            if error:
+                st.error(f"❌ 同步中斷（已上傳 {len(synced)} 筆）：{error}")
+            elif synced:
+                st.success(f"✅ 已同步 {len(synced)} 筆至 Google Sheets")
+            else:
+                st.info("雲端已是最新，沒有需要上傳的經文")
+
     st.markdown("<hr style='margin: 15px 0; border-color: #e0e0e0;'>", unsafe_allow_html=True)
 
     # ========== 經文顯示區域 ==========
@@ -1605,6 +1710,8 @@ with tabs[0]:
         st.markdown("<div style='color:#999; font-size:13px; text-align:center; padding:20px;'>請選擇經文後點擊 📞 叫出</div>", unsafe_allow_html=True)
 
     else:
+        grammar_view = resolve_grammar(current.get('grammar'))
+
         # --- 經文標題 ---
         ref_short = current.get('ref', '').replace(" ", "")
         chinese_text = current.get('chinese', '')
@@ -1619,17 +1726,24 @@ with tabs[0]:
             with st.expander("📚 單字 / 片語 / 分段", expanded=True):
                 if vocab:
                     st.markdown("<div style='font-weight:bold; font-size:14px; margin-bottom:6px;'>📝 單字 Vocabulary</div>", unsafe_allow_html=True)
-                    for item in vocab:
+                    for i, item in enumerate(vocab):
                         word = item.get('word', '') if isinstance(item, dict) else str(item)
                         meaning = item.get('meaning', '') if isinstance(item, dict) else ''
-                        st.markdown(f'<div class="analysis-box"><b>{word}</b> {meaning}</div>', unsafe_allow_html=True)
+                        box_cols = st.columns([8, 1])
+                        box_cols[0].markdown(f'<div class="analysis-box"><b>{word}</b> {meaning}</div>', unsafe_allow_html=True)
+                        concordance_button(box_cols[1], word, current.get('ref'), f"concord_vocab_{i}")
 
                 if phrases:
                     st.markdown("<div style='font-weight:bold; font-size:14px; margin:10px 0 6px;'>🔑 片語 Phrases</div>", unsafe_allow_html=True)
-                    for item in phrases:
+                    for i, item in enumerate(phrases):
                         phr = item.get('phrase', '') if isinstance(item, dict) else str(item)
                         note = item.get('note', '') if isinstance(item, dict) else ''
-                        st.markdown(f'<div class="analysis-box"><b>{phr}</b> {note}</div>', unsafe_allow_html=True)
+                        box_cols = st.columns([8, 1])
+                        box_cols[0].markdown(f'<div class="analysis-box"><b>{phr}</b> {note}</div>', unsafe_allow_html=True)
+                        concordance_button(box_cols[1], phr, current.get('ref'), f"concord_phrase_{i}")
+
+                if vocab or phrases:
+                    render_concordance_panel(current.get('ref'))
 
                 if segments:
                     st.markdown("<div style='font-weight:bold; font-size:14px; margin:10px 0 6px;'>✂️ 分段 Segments</div>", unsafe_allow_html=True)
@@ -1646,7 +1760,7 @@ with tabs[0]:
             col_left, col_right = st.columns(2)
             with col_left:
                 if current.get('english'):
-                    eng = current['grammar']['english']
+                    eng = grammar_view['english']
                     st.markdown(f"<div style='font-size: 17px; margin-bottom: 12px;'>🇬🇧 {eng['full']}</div>", unsafe_allow_html=True)
                     st.markdown(f"""
                     <div class="snoopy-box">
@@ -1672,7 +1786,7 @@ with tabs[0]:
 
             with col_right:
                 if current.get('thai'):
-                    th = current['grammar']['thai']
+                    th = grammar_view['thai']
                     st.markdown(f"<div style='font-size: 17px; margin-bottom: 12px;'>🇹🇭 {th['full']}</div>", unsafe_allow_html=True)
                     st.markdown(f"""
                     <div class="snoopy-box">
@@ -1700,7 +1814,7 @@ with tabs[0]:
             col_left, col_right = st.columns(2)
             with col_left:
                 if current.get('japanese'):
-                    jp = current['grammar']['japanese']
+                    jp = grammar_view['japanese']
                     st.markdown(f"<div style='font-size: 17px; margin-bottom: 12px;'>🇯🇵 {jp['full']}</div>", unsafe_allow_html=True)
                     st.markdown(f"""
                     <div class="snoopy-box">
@@ -1726,7 +1840,7 @@ with tabs[0]:
 
             with col_right:
                 if current.get('korean'):
-                    kr = current['grammar']['korean']
+                    kr = grammar_view['korean']
                     st.markdown(f"<div style='font-size: 17px; margin-bottom: 12px;'>🇰🇷 {kr['full']}</div>", unsafe_allow_html=True)
                     st.markdown(f"""
                     <div class="snoopy-box">
@@ -1775,12 +1889,6 @@ with tabs[1]:
     """, unsafe_allow_html=True)
 
     # Session State
-    if "todo" not in st.session_state:
-        st.session_state.todo = load_todos()
-    if "favorite_sentences" not in st.session_state:
-        st.session_state.favorite_sentences = load_favorites()
-    if "custom_verses" not in st.session_state:
-        st.session_state.custom_verses = load_custom_verses()
     if "sel_date" not in st.session_state:
         st.session_state.sel_date = str(datetime.date.today())
     if "cal_key" not in st.session_state:
@@ -1862,17 +1970,16 @@ with tabs[1]:
                     if st.button("⭐", key=f"fav_{item_id}"):
                         fav_text = f"{selected_date} {time_str} {title}"
                         if fav_text not in st.session_state.favorite_sentences:
-                            st.session_state.favorite_sentences.append(fav_text)
-                            save_favorites()
+                            add_favorite(fav_text)
                             st.toast("已加入收藏！")
                 
                 with c2:
                     # 刪除按鈕 - 直接刪除無確認
                     if st.button("🗑️", key=f"del_{item_id}"):
-                        st.session_state.todo[selected_date].pop(idx)
+                        removed = st.session_state.todo[selected_date].pop(idx)
                         if not st.session_state.todo[selected_date]:
                             del st.session_state.todo[selected_date]
-                        save_todos()
+                        delete_todo(removed)
                         st.session_state.cal_key += 1
                         st.rerun()
                 
@@ -1911,16 +2018,15 @@ with tabs[1]:
                 if st.button("⭐", key=f"fav_long_{item_id}"):
                     fav_text = f"{date_str} {time_str} {title}"
                     if fav_text not in st.session_state.favorite_sentences:
-                        st.session_state.favorite_sentences.append(fav_text)
-                        save_favorites()
+                        add_favorite(fav_text)
                         st.toast("已加入收藏！")
             
             with c2:
                 if st.button("🗑️", key=f"del_long_{item_id}"):
-                    st.session_state.todo[date_str].pop(idx)
+                    removed = st.session_state.todo[date_str].pop(idx)
                     if not st.session_state.todo[date_str]:
                         del st.session_state.todo[date_str]
-                    save_todos()
+                    delete_todo(removed)
                     st.session_state.cal_key += 1
                     st.rerun()
             
@@ -1951,8 +2057,8 @@ with tabs[1]:
                     k = str(in_date)
                     if k not in st.session_state.todo:
                         st.session_state.todo[k] = []
-                    st.session_state.todo[k].append({"title": in_title, "time": str(in_time)})
-                    save_todos()
+                    todo_id = add_todo(k, in_title, str(in_time))
+                    st.session_state.todo[k].append({"id": todo_id, "title": in_title, "time": str(in_time)})
                     st.session_state.cal_key += 1
                     st.session_state.sel_date = k
                     st.rerun()
@@ -1965,33 +2071,8 @@ with tabs[1]:
                unsafe_allow_html=True)
 
     sentences = st.session_state.get('sentences', {})
-    sheet_verses = []
-
-    for ref, data in sentences.items():
-        v1_content = data.get('v1_content', '') or ''
-        if not v1_content:
-            continue
-        try:
-            lines = v1_content.strip().split('\n')
-            if len(lines) < 2:
-                continue
-            headers = [h.strip() for h in lines[0].split('\t')]
-            for line in lines[1:]:
-                if not line.strip():
-                    continue
-                cells = [c.strip() for c in line.split('\t')]
-                while len(cells) < len(headers):
-                    cells.append('')
-                row = {headers[i]: cells[i] for i in range(len(headers))}
-                verse_ref = row.get('Ref.', row.get('Ref. 經文出處', ref))
-                en = row.get('English（ESV經文）', row.get('English (ESV)', ''))
-                cn = row.get('Chinese經文', row.get('Chinese', ''))
-                if en and cn:
-                    sheet_verses.append({'ref': verse_ref, 'en': en, 'cn': cn})
-        except:
-            pass
-
-    sheet_verses = sheet_verses[:8]
+    # 只顯示 8 節：依紀錄順序從經文表取，其餘紀錄不必讀取
+    sheet_verses = get_verse_table().head(sentences, sentences, 8)
 
     if len(sheet_verses) >= 2:
         if 'sheet_verse_idx' not in st.session_state:
@@ -2020,8 +2101,7 @@ with tabs[1]:
             if st.button("⭐ 收藏", key=f"fav_s1_{idx}"):
                 fav = f"{v1['ref']} {v1['en']}"
                 if fav not in st.session_state.favorite_sentences:
-                    st.session_state.favorite_sentences.append(fav)
-                    save_favorites()
+                    add_favorite(fav)
                     st.toast("已收藏！")
         with col3:
             if st.button("》", key="sheet_next"):
@@ -2044,8 +2124,7 @@ with tabs[1]:
                 if st.button("⭐ 收藏", key=f"fav_s2_{idx}"):
                     fav = f"{v2['ref']} {v2['en']}"
                     if fav not in st.session_state.favorite_sentences:
-                        st.session_state.favorite_sentences.append(fav)
-                        save_favorites()
+                        add_favorite(fav)
                         st.toast("已收藏！")
             with col3:
                 st.empty()
@@ -2086,8 +2165,7 @@ with tabs[1]:
             """, unsafe_allow_html=True)
             if st.button("⭐ 收藏", key=f"fav_c1_{start}"):
                 if c1_data[1] not in st.session_state.favorite_sentences:
-                    st.session_state.favorite_sentences.append(c1_data[1])
-                    save_favorites()
+                    add_favorite(c1_data[1])
                     st.toast("已收藏！")
         with col3:
             if st.button("》", key="custom_next"):
@@ -2107,8 +2185,7 @@ with tabs[1]:
                 """, unsafe_allow_html=True)
                 if st.button("⭐ 收藏", key=f"fav_c2_{start}"):
                     if c2_data[1] not in st.session_state.favorite_sentences:
-                        st.session_state.favorite_sentences.append(c2_data[1])
-                        save_favorites()
+                        add_favorite(c2_data[1])
                         st.toast("已收藏！")
             with col3:
                 st.empty()
@@ -2123,8 +2200,8 @@ with tabs[1]:
                          key=f"custom_{i}")
         if st.button("💾 儲存", key="save_custom"):
             updated = [st.session_state[f"custom_{i}"] for i in range(7)]
+            save_custom_verses(updated, base=st.session_state.custom_verses)
             st.session_state.custom_verses = updated
-            save_custom_verses(updated)
             st.success("已儲存！")
             st.rerun()
 
@@ -2141,8 +2218,7 @@ with tabs[1]:
                            unsafe_allow_html=True)
             with c2:
                 if st.button("🗑️", key=f"del_fav_{i}"):
-                    st.session_state.favorite_sentences.pop(i)
-                    save_favorites()
+                    remove_favorite(i)
                     st.rerun()
     else:
         st.caption("尚無收藏，點擊待辦事項的 ⭐ 加入")
@@ -2160,35 +2236,15 @@ with tabs[2]:
     if not sentences:
         st.warning("資料庫為空")
     else:
-        sorted_refs = sorted(sentences.keys(), key=lambda x: sentences[x].get('date_added', ''), reverse=True)
-        total = len(sorted_refs)
-
-        new_refs = sorted_refs[:int(total*0.6)] if total >= 5 else sorted_refs
-        mid_refs = sorted_refs[int(total*0.6):int(total*0.9)] if total >= 10 else []
-        old_refs = sorted_refs[int(total*0.9):] if total >= 10 else []
-        weighted_pool = (new_refs * 6) + (mid_refs * 3) + (old_refs * 1)
-        if not weighted_pool:
-            weighted_pool = sorted_refs
+        # 依日期分新（60%）、中（30%）、舊（10%）加權，題目只從加權池的前 15 筆出：
+        # 前 15 筆一定落在「新」的區段，所以只需取最新的 min(新區段筆數, 15) 筆
+        total = len(sentences)
+        new_count = int(total*0.6) if total >= 5 else total
+        weighted_pool = (get_record_frame().newest(min(new_count, 15)) * 6)[:15]
 
         random.seed(st.session_state.tab3_seed)
 
-        all_verses = []
-        for ref in weighted_pool[:15]:
-            data = sentences[ref]
-            v1 = data.get('v1_content', '')
-            if v1:
-                try:
-                    lines = v1.strip().split('\n')
-                    if lines:
-                        reader = csv.DictReader(lines, delimiter='\t')
-                        for row in reader:
-                            all_verses.append({
-                                'ref': row.get('Ref. 經文出處', row.get('Ref.', '')),
-                                'en': row.get('English（ESV經文）', row.get('English (ESV)', '')),
-                                'cn': row.get('Chinese經文', row.get('Chinese', ''))
-                            })
-                except:
-                    pass
+        all_verses = get_verse_table().for_records(weighted_pool, sentences)
 
         if len(all_verses) < 6:
             st.warning("經文資料不足")
@@ -2358,6 +2414,12 @@ with tabs[3]:
                     st.session_state.tab4_data = json_data
                     st.session_state.card_idx = 0
                     st.session_state.flipped = False
+                    save_analysis_to_database({
+                        'reference': verse_input.strip(),
+                        'flashcards': json_data.get('cards', []),
+                        'podcast_script': json_data.get('script', [])
+                    })
+                    st.session_state.analysis_page = 0
                     st.rerun()
                 else:
                     st.error("❌ 無法從 AI 回應中提取 JSON 格式資料")
@@ -2447,6 +2509,42 @@ with tabs[3]:
                 with st.chat_message(speaker):
                     st.write(f"**{speaker}**: {text}")
 
+    # 4. 已存的解析（分頁讀取，新的在前）
+    with st.expander("📜 已存的解析紀錄"):
+        only_current = st.checkbox("只看目前輸入的經文", key="analysis_only_current",
+                                   disabled=not verse_input.strip())
+        reference = verse_input.strip() if only_current and verse_input.strip() else None
+        page = st.session_state.get('analysis_page', 0)
+        entries, total_entries = load_analysis_page(page, reference)
+        pages = max((total_entries - 1) // ANALYSIS_PAGE_SIZE + 1, 1)
+        if page >= pages:
+            # 刪除或篩選後頁數變少
+            page = st.session_state.analysis_page = pages - 1
+            entries, total_entries = load_analysis_page(page, reference)
+        if not total_entries:
+            st.info("尚無已存的解析")
+        for entry in entries:
+            row = st.columns([6, 1, 1])
+            row[0].caption(f"{entry.get('timestamp', '')[:16].replace('T', ' ')} · {entry.get('reference') or '（未填經文）'}"
+                           f" · {len(entry.get('flashcards', []))} 張卡")
+            if row[1].button("📂", key=f"analysis_load_{entry['id']}", help="載入到上方閃卡與對話"):
+                st.session_state.tab4_data = {"cards": entry.get('flashcards', []), "script": entry.get('podcast_script', [])}
+                st.session_state.card_idx = 0
+                st.session_state.flipped = False
+                st.rerun()
+            if row[2].button("🗑️", key=f"analysis_del_{entry['id']}", help="刪除這筆解析"):
+                get_app_db().delete_analysis(entry['id'])
+                st.rerun()
+        if pages > 1:
+            nav = st.columns([1, 2, 1])
+            if nav[0].button("⬅️ 上一頁", disabled=page == 0, key="analysis_prev"):
+                st.session_state.analysis_page = page - 1
+                st.rerun()
+            nav[1].caption(f"第 {page + 1} / {pages} 頁（共 {total_entries} 筆）")
+            if nav[2].button("下一頁 ➡️", disabled=page >= pages - 1, key="analysis_next"):
+                st.session_state.analysis_page = page + 1
+                st.rerun()
+
 # ===================================================================
 # 7. TAB5 ─ AI控制台-資料庫管理 (原 TAB4 功能)
 # ===================================================================
@@ -2674,11 +2772,11 @@ its part of speech and meaning in this sentence must be clearly identified...等
                     blank_structure = {
                         "ref": blank_ref,
                         "original": "[空白資料-待填入經文]",
-                        "v1_content": "Ref. 經文出處\tEnglish（ESV經文）\tChinese經文\tSyn/Ant\tGrammar\n",
-                        "v2_content": "Ref.經文出處\t口語訳\tGrammar\tNote\tKRF\tKorean Syn/Ant\tTHSV11 泰文重要片語\n",
-                        "w_sheet": "",
-                        "p_sheet": "",
-                        "grammar_list": "",
+                        "v1_content": [],
+                        "v2_content": [],
+                        "w_sheet": [],
+                        "p_sheet": [],
+                        "grammar_list": [],
                         "other": "",
                         "saved_sheets": ["V1 Sheet", "V2 Sheet"],
                         "type": "Scripture",
@@ -2690,11 +2788,11 @@ its part of speech and meaning in this sentence must be clearly identified...等
                     blank_structure = {
                         "ref": blank_ref,
                         "original": "[空白資料-待填入文稿]",
-                        "v1_content": "",
-                        "v2_content": "",
-                        "w_sheet": "No\tWord/Phrase＋Chinese\tSynonym+中文對照\tAntonym+中文對照\t全句聖經中英對照例句\n",
-                        "p_sheet": "Paragraph\tEnglish Refinement\t中英夾雜講章\n",
-                        "grammar_list": "No\tOriginal Sentence＋中文翻譯\tGrammar Rule＋Analysis\n",
+                        "v1_content": [],
+                        "v2_content": [],
+                        "w_sheet": [],
+                        "p_sheet": [],
+                        "grammar_list": [],
                         "other": "",
                         "saved_sheets": ["W Sheet", "P Sheet", "Grammar List"],
                         "type": "Document",
@@ -2703,19 +2801,12 @@ its part of speech and meaning in this sentence must be clearly identified...等
                         "blank_template": True
                     }
                 
-                st.session_state.sentences[blank_ref] = blank_structure
-                save_sentences(st.session_state.sentences)
+                save_sentence(blank_ref, blank_structure)
                 
                 st.session_state.edit_mode = True
                 st.session_state.edit_ref = blank_ref
-                st.session_state.current_entry = {
-                    'v1': blank_structure['v1_content'],
-                    'v2': blank_structure['v2_content'],
-                    'w_sheet': blank_structure['w_sheet'],
-                    'p_sheet': blank_structure['p_sheet'],
-                    'grammar_list': blank_structure['grammar_list'],
-                    'other': ''
-                }
+                st.session_state.edit_base = sentence_base(blank_ref)
+                st.session_state.current_entry = record_to_entry(blank_structure)
                 st.session_state.saved_entries = blank_structure['saved_sheets']
                 st.success(f"✅ 已建立空白資料：{blank_ref}")
                 st.rerun()
@@ -2723,10 +2814,12 @@ its part of speech and meaning in this sentence must be clearly identified...等
     with quick_cols[1]:
         with st.expander("✏️ 編輯現有資料", expanded=False):
             if st.session_state.sentences:
+                edit_refs = [ref for ref in get_record_frame().refs(sort=None) if ref in st.session_state.sentences]
+                edit_types = get_record_frame().labels(edit_refs, 'type')
                 edit_select = st.selectbox(
                     "選擇要編輯的資料",
-                    list(st.session_state.sentences.keys()),
-                    format_func=lambda x: f"{x} ({st.session_state.sentences[x].get('type', 'Unknown')})",
+                    edit_refs,
+                    format_func=lambda x: f"{x} ({edit_types.get(x) or 'Unknown'})",
                     key="edit_select"
                 )
                 
@@ -2734,14 +2827,8 @@ its part of speech and meaning in this sentence must be clearly identified...等
                     item = st.session_state.sentences[edit_select]
                     st.session_state.edit_mode = True
                     st.session_state.edit_ref = edit_select
-                    st.session_state.current_entry = {
-                        'v1': item.get('v1_content', ''),
-                        'v2': item.get('v2_content', ''),
-                        'w_sheet': item.get('w_sheet', ''),
-                        'p_sheet': item.get('p_sheet', ''),
-                        'grammar_list': item.get('grammar_list', ''),
-                        'other': item.get('other', '')
-                    }
+                    st.session_state.edit_base = sentence_base(edit_select)
+                    st.session_state.current_entry = record_to_entry(item)
                     st.session_state.saved_entries = item.get('saved_sheets', [])
                     st.rerun()
             else:
@@ -2814,32 +2901,40 @@ its part of speech and meaning in this sentence must be clearly identified...等
                 
                 with save_cols[0]:
                     if st.button("💾 存到本地", use_container_width=True, key="save_local_a"):
-                        st.session_state.sentences[st.session_state.edit_ref].update({
-                            'v1_content': st.session_state.current_entry['v1'],
-                            'v2_content': st.session_state.current_entry['v2'],
+                        record = dict(st.session_state.sentences[st.session_state.edit_ref])
+                        # 編輯區固定有標題列，以解析後的資料列判斷 V1 是否有內容
+                        v1_rows = text_to_rows('v1_content', st.session_state.current_entry['v1'])
+                        record.update({
+                            'v1_content': v1_rows,
+                            'v2_content': text_to_rows('v2_content', st.session_state.current_entry['v2']),
                             'other': st.session_state.current_entry['other'],
-                            'saved_sheets': ['V1 Sheet', 'V2 Sheet'] if st.session_state.current_entry['v1'] else [],
+                            'saved_sheets': ['V1 Sheet', 'V2 Sheet'] if v1_rows else [],
                             'date_added': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
                         })
-                        save_sentences(st.session_state.sentences)
-                        st.success("✅ 已更新本地資料！")
+                        if save_sentence(st.session_state.edit_ref, record, st.session_state.get('edit_base')):
+                            st.session_state.edit_base = sentence_base(st.session_state.edit_ref)
+                            st.success("✅ 已更新本地資料！")
                 
                 with save_cols[1]:
                     if st.button("💾 存到本地+雲端", use_container_width=True, key="save_both_a"):
-                        st.session_state.sentences[st.session_state.edit_ref].update({
-                            'v1_content': st.session_state.current_entry['v1'],
-                            'v2_content': st.session_state.current_entry['v2'],
+                        record = dict(st.session_state.sentences[st.session_state.edit_ref])
+                        # 編輯區固定有標題列，以解析後的資料列判斷 V1 是否有內容
+                        v1_rows = text_to_rows('v1_content', st.session_state.current_entry['v1'])
+                        record.update({
+                            'v1_content': v1_rows,
+                            'v2_content': text_to_rows('v2_content', st.session_state.current_entry['v2']),
                             'other': st.session_state.current_entry['other'],
-                            'saved_sheets': ['V1 Sheet', 'V2 Sheet'] if st.session_state.current_entry['v1'] else [],
+                            'saved_sheets': ['V1 Sheet', 'V2 Sheet'] if v1_rows else [],
                             'date_added': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
                         })
-                        save_sentences(st.session_state.sentences)
-                        # 同步到 Google Sheets
-                        success, msg = save_to_google_sheets(st.session_state.sentences[st.session_state.edit_ref])
-                        if success:
-                            st.success("✅ 已更新本地與 Google Sheets！")
-                        else:
-                            st.error(f"❌ Google Sheets 失敗：{msg}")
+                        if save_sentence(st.session_state.edit_ref, record, st.session_state.get('edit_base')):
+                            st.session_state.edit_base = sentence_base(st.session_state.edit_ref)
+                            # 同步到 Google Sheets
+                            success, msg = save_to_google_sheets(record)
+                            if success:
+                                st.success("✅ 已更新本地與 Google Sheets！")
+                            else:
+                                st.error(f"❌ Google Sheets 失敗：{msg}")
         
         else:  # Mode B
             edit_tabs = st.tabs(["W Sheet", "P Sheet", "Grammar List", "其他補充", "儲存"])
@@ -2886,33 +2981,37 @@ its part of speech and meaning in this sentence must be clearly identified...等
                 
                 with save_cols[0]:
                     if st.button("💾 存到本地", use_container_width=True, key="save_local_b"):
-                        st.session_state.sentences[st.session_state.edit_ref].update({
-                            'w_sheet': st.session_state.current_entry['w_sheet'],
-                            'p_sheet': st.session_state.current_entry['p_sheet'],
-                            'grammar_list': st.session_state.current_entry['grammar_list'],
+                        record = dict(st.session_state.sentences[st.session_state.edit_ref])
+                        record.update({
+                            'w_sheet': text_to_rows('w_sheet', st.session_state.current_entry['w_sheet']),
+                            'p_sheet': text_to_rows('p_sheet', st.session_state.current_entry['p_sheet']),
+                            'grammar_list': text_to_rows('grammar_list', st.session_state.current_entry['grammar_list']),
                             'other': st.session_state.current_entry['other'],
                             'saved_sheets': ['W Sheet', 'P Sheet', 'Grammar List'],
                             'date_added': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
                         })
-                        save_sentences(st.session_state.sentences)
-                        st.success("✅ 已更新本地資料！")
+                        if save_sentence(st.session_state.edit_ref, record, st.session_state.get('edit_base')):
+                            st.session_state.edit_base = sentence_base(st.session_state.edit_ref)
+                            st.success("✅ 已更新本地資料！")
                 
                 with save_cols[1]:
                     if st.button("💾 存到本地+雲端", use_container_width=True, key="save_both_b"):
-                        st.session_state.sentences[st.session_state.edit_ref].update({
-                            'w_sheet': st.session_state.current_entry['w_sheet'],
-                            'p_sheet': st.session_state.current_entry['p_sheet'],
-                            'grammar_list': st.session_state.current_entry['grammar_list'],
+                        record = dict(st.session_state.sentences[st.session_state.edit_ref])
+                        record.update({
+                            'w_sheet': text_to_rows('w_sheet', st.session_state.current_entry['w_sheet']),
+                            'p_sheet': text_to_rows('p_sheet', st.session_state.current_entry['p_sheet']),
+                            'grammar_list': text_to_rows('grammar_list', st.session_state.current_entry['grammar_list']),
                             'other': st.session_state.current_entry['other'],
                             'saved_sheets': ['W Sheet', 'P Sheet', 'Grammar List'],
                             'date_added': datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
                         })
-                        save_sentences(st.session_state.sentences)
-                        success, msg = save_to_google_sheets(st.session_state.sentences[st.session_state.edit_ref])
-                        if success:
-                            st.success("✅ 已更新本地與 Google Sheets！")
-                        else:
-                            st.error(f"❌ Google Sheets 失敗：{msg}")
+                        if save_sentence(st.session_state.edit_ref, record, st.session_state.get('edit_base')):
+                            st.session_state.edit_base = sentence_base(st.session_state.edit_ref)
+                            success, msg = save_to_google_sheets(record)
+                            if success:
+                                st.success("✅ 已更新本地與 Google Sheets！")
+                            else:
+                                st.error(f"❌ Google Sheets 失敗：{msg}")
         
         st.divider()
 
@@ -3134,21 +3233,20 @@ its part of speech and meaning in this sentence must be clearly identified...等
                                 "ref": ref,
                                 "original": st.session_state.original_text,
                                 "prompt": st.session_state.main_input_value,
-                                "v1_content": st.session_state.current_entry['v1'],
-                                "v2_content": st.session_state.current_entry['v2'],
-                                "w_sheet": st.session_state.current_entry['w_sheet'],
-                                "p_sheet": st.session_state.current_entry['p_sheet'],
-                                "grammar_list": st.session_state.current_entry['grammar_list'],
+                                "v1_content": text_to_rows('v1_content', st.session_state.current_entry['v1']),
+                                "v2_content": text_to_rows('v2_content', st.session_state.current_entry['v2']),
+                                "w_sheet": text_to_rows('w_sheet', st.session_state.current_entry['w_sheet']),
+                                "p_sheet": text_to_rows('p_sheet', st.session_state.current_entry['p_sheet']),
+                                "grammar_list": text_to_rows('grammar_list', st.session_state.current_entry['grammar_list']),
                                 "other": st.session_state.current_entry['other'],
                                 "saved_sheets": st.session_state.saved_entries,
                                 "type": type_select,
                                 "mode": st.session_state.content_mode,
                                 "date_added": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
                             }
-                            st.session_state.sentences[ref] = full_data
-                            save_sentences(st.session_state.sentences)
-                            st.success(f"✅ 已存本地：{ref}")
-                            st.balloons()
+                            if save_sentence(ref, full_data):
+                                st.success(f"✅ 已存本地：{ref}")
+                                st.balloons()
                         except Exception as e:
                             st.error(f"❌ 儲存失敗：{str(e)}")
             
@@ -3163,11 +3261,11 @@ its part of speech and meaning in this sentence must be clearly identified...等
                                 full_data = {
                                     "ref": ref_input,
                                     "original": st.session_state.original_text,
-                                    "v1_content": st.session_state.current_entry['v1'],
-                                    "v2_content": st.session_state.current_entry['v2'],
-                                    "w_sheet": st.session_state.current_entry['w_sheet'],
-                                    "p_sheet": st.session_state.current_entry['p_sheet'],
-                                    "grammar_list": st.session_state.current_entry['grammar_list'],
+                                    "v1_content": text_to_rows('v1_content', st.session_state.current_entry['v1']),
+                                    "v2_content": text_to_rows('v2_content', st.session_state.current_entry['v2']),
+                                    "w_sheet": text_to_rows('w_sheet', st.session_state.current_entry['w_sheet']),
+                                    "p_sheet": text_to_rows('p_sheet', st.session_state.current_entry['p_sheet']),
+                                    "grammar_list": text_to_rows('grammar_list', st.session_state.current_entry['grammar_list']),
                                     "other": st.session_state.current_entry['other'],
                                     "saved_sheets": st.session_state.saved_entries,
                                     "type": type_select,
@@ -3176,8 +3274,7 @@ its part of speech and meaning in this sentence must be clearly identified...等
                                 }
                                 success, msg = save_to_google_sheets(full_data)
                                 if success:
-                                    st.session_state.sentences[ref_input] = full_data
-                                    save_sentences(st.session_state.sentences)
+                                    save_sentence(ref_input, full_data)
                                     st.session_state.uploaded_to_sheets = True  # 🔥 鎖定重複上傳
                                     st.success(f"✅ 已存 Google Sheets：{ref_input}")
                                     st.balloons()
@@ -3220,9 +3317,10 @@ its part of speech and meaning in this sentence must be clearly identified...等
     
     with status_cols[2]:
         if st.session_state.get('sentences'):
-            recent = list(st.session_state.sentences.values())[-3:]
+            recent = [sentence_meta(st.session_state.sentences, ref) for ref in get_record_frame().recent(3)
+                      if ref in st.session_state.sentences]
             st.markdown(f"<p style='font-size: 12px; margin: 0; color: #666;'>🕐 最近儲存：</p>", unsafe_allow_html=True)
-            for item in reversed(recent):
+            for item in recent:
                 sheets = item.get('saved_sheets', ['未知'])
                 st.caption(f"• {item.get('ref', 'N/A')} ({', '.join(sheets)})")
 
@@ -3231,11 +3329,19 @@ its part of speech and meaning in this sentence must be clearly identified...等
         if not st.session_state.get('sentences'):
             st.info("資料庫是空的，請先儲存資料")
         else:
-            ref_list = list(st.session_state.sentences.keys())
+            record_frame = get_record_frame()
+            filter_cols = st.columns(2)
+            type_filter = filter_cols[0].selectbox("類型", ["全部"] + record_frame.values('type'), key="browse_type")
+            sheet_filter = filter_cols[1].selectbox("工作表", ["全部"] + SHEET_LABELS, key="browse_sheet")
+            ref_list = [ref for ref in record_frame.refs(
+                type=None if type_filter == "全部" else type_filter,
+                sheet=None if sheet_filter == "全部" else sheet_filter
+            ) if ref in st.session_state.sentences]
+            dates = record_frame.labels(ref_list, 'date_added')
             selected_ref = st.selectbox(
                 "選擇資料項目", 
                 ref_list,
-                format_func=lambda x: f"{x} - {st.session_state.sentences[x].get('date_added', '無日期')}"
+                format_func=lambda x: f"{x} - {dates.get(x) or '無日期'}"
             )
             
             if selected_ref:
@@ -3264,7 +3370,7 @@ its part of speech and meaning in this sentence must be clearly identified...等
                                 "W Sheet": "w_sheet", "P Sheet": "p_sheet",
                                 "Grammar List": "grammar_list", "其他補充": "other"
                             }
-                            content = item.get(key_map.get(sheet, 'other'), '')
+                            content = record_field_text(item, key_map.get(sheet, 'other'))
                             if content:
                                 st.text_area("內容", value=content, height=250, disabled=True)
                             else:
@@ -3276,11 +3382,7 @@ its part of speech and meaning in this sentence must be clearly identified...等
                 with btn_cols[0]:
                     if st.button("✏️ 載入編輯", key=f"edit_{selected_ref}"):
                         st.session_state.raw_input_value = item.get('original', '')
-                        st.session_state.current_entry = {
-                            'v1': item.get('v1_content', ''), 'v2': item.get('v2_content', ''),
-                            'w_sheet': item.get('w_sheet', ''), 'p_sheet': item.get('p_sheet', ''),
-                            'grammar_list': item.get('grammar_list', ''), 'other': item.get('other', '')
-                        }
+                        st.session_state.current_entry = record_to_entry(item)
                         st.session_state.saved_entries = saved_sheets
                         st.session_state.ref_number = selected_ref
                         st.session_state.is_prompt_generated = True
@@ -3291,24 +3393,106 @@ its part of speech and meaning in this sentence must be clearly identified...等
                 
                 with btn_cols[1]:
                     if st.button("🗑️ 刪除", key=f"del_{selected_ref}"):
-                        del st.session_state.sentences[selected_ref]
-                        save_sentences(st.session_state.sentences)
+                        if delete_sentence(selected_ref, sentence_base(selected_ref)):
+                            st.rerun()
+
+                with st.expander("🕘 版本紀錄", expanded=False):
+                    versions = sentence_versions(selected_ref, item)
+                    restorable = [v for v in versions if v['record'] is not None]
+                    if not restorable:
+                        st.caption("尚無可還原的舊版本")
+                    else:
+                        op_labels = {"update": "修改前", "create": "建立前", "delete": "刪除前"}
+                        version = st.selectbox(
+                            "選擇版本", restorable,
+                            format_func=lambda v: f"{v['timestamp'].replace('T', ' ')}（{op_labels.get(v['op'], v['op'])}）",
+                            key=f"history_{selected_ref}"
+                        )
+                        fields = changed_fields(version['record'], item)
+                        if not fields:
+                            st.info("與目前內容相同")
+                        for field in fields:
+                            st.markdown(f"**{field}**")
+                            st.code(unified_diff(record_field_text(version['record'], field),
+                                                 record_field_text(item, field)) or "（無差異）", language="diff")
+                        if st.button("↩️ 還原此版本", key=f"restore_{selected_ref}"):
+                            if save_sentence(selected_ref, dict(version['record']), sentence_base(selected_ref)):
+                                st.success(f"✅ 已還原到 {version['timestamp'].replace('T', ' ')} 的版本")
+                                st.rerun()
+
+    # 最近刪除（刪除前的完整內容保留在版本紀錄中）
+    with st.expander("🗑️ 最近刪除", expanded=False):
+        deleted = [(ref, ts) for ref, ts in get_app_db().deleted_refs() if ref not in st.session_state.sentences]
+        if not deleted:
+            st.caption("沒有可復原的刪除紀錄")
+        for ref, ts in deleted[:20]:
+            del_cols = st.columns([3, 1])
+            del_cols[0].write(f"**{ref}**（{ts.replace('T', ' ')} 刪除）")
+            if del_cols[1].button("↩️ 復原", key=f"undelete_{ref}"):
+                versions = sentence_versions(ref, None)
+                if versions and versions[0]['record'] is not None:
+                    if save_sentence(ref, dict(versions[0]['record'])):
+                        st.success(f"✅ 已復原：{ref}")
                         st.rerun()
+                else:
+                    st.error("找不到刪除前的內容")
+
+    # 匯出（本地檔為緊湊編碼，匯出成可閱讀的 JSON）
+    with st.expander("⬇️ 匯出資料", expanded=False):
+        if st.button("📦 產生 JSON 匯出檔", key="export_sentences"):
+            st.session_state.sentences_export = export_sentences_json(st.session_state.sentences)
+        if st.session_state.get('sentences_export'):
+            st.download_button(
+                "⬇️ 下載 sentences.json",
+                data=st.session_state.sentences_export,
+                file_name=f"sentences_{datetime.date.today()}.json",
+                mime="application/json",
+                key="download_sentences"
+            )
 
-    # 簡易搜尋
+    # 全文搜尋（倒排索引：中日韓 bigram、泰文字元群、英文詞幹）
     with st.expander("🔍 搜尋資料", expanded=False):
-        search_kw = st.text_input("輸入關鍵字", placeholder="搜尋 Ref_No 或內容...")
+        search_index = get_search_index()
+        search_cols = st.columns([4, 1])
+        search_kw = search_cols[0].text_input("輸入關鍵字", placeholder="搜尋 Ref_No 或任何欄位內容（中／英／日／韓／泰）...")
+        if search_cols[1].button("🔄 重建索引", disabled=search_index.building):
+            rebuild_search_index(search_index, st.session_state.sentences)
+            st.rerun()
+        if search_index.building:
+            done, total = search_index.progress
+            st.caption(f"⏳ 索引建立中（{done}/{total}），結果可能不完整")
         if search_kw:
-            results = []
-            for ref, item in st.session_state.sentences.items():
-                if (search_kw.lower() in ref.lower() or 
-                    search_kw.lower() in item.get('original', '').lower()):
-                    results.append(f"• **{ref}** ({item.get('date_added', '')})")
-            if results:
-                st.write(f"找到 {len(results)} 筆：")
-                for r in results:
-                    st.markdown(r)
-            else:
+            if st.session_state.get('search_kw') != search_kw:
+                st.session_state.search_kw = search_kw
+                st.session_state.search_page = 0
+            page = st.session_state.get('search_page', 0)
+            hits, total_hits = search_index.search(search_kw, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+            if not total_hits:
                 st.info("無符合資料")
+            else:
+                st.write(f"找到 {total_hits} 筆：")
+                for ref, _ in hits:
+                    item = st.session_state.sentences.get(ref)
+                    if item is None:
+                        continue        # 索引尚未跟上刪除
+                    field, text = snippet(item, search_kw)
+                    st.markdown(f"• **{ref}** ({item.get('date_added', '')})")
+                    if text:
+                        st.caption(f"{field}：{text}")
+                pages = (total_hits - 1) // SEARCH_PAGE_SIZE + 1
+                if pages > 1:
+                    nav = st.columns([1, 2, 1])
+                    if nav[0].button("⬅️ 上一頁", disabled=page == 0, key="search_prev"):
+                        st.session_state.search_page = page - 1
+                        st.rerun()
+                    nav[1].caption(f"第 {page + 1} / {pages} 頁")
+                    if nav[2].button("下一頁 ➡️", disabled=page >= pages - 1, key="search_next"):
+                        st.session_state.search_page = page + 1
+                        st.rerun()
+
 
 
+# ===================================================================
+# 腳本結尾：寫出本次互動排隊的變更
+# ===================================================================
+flush_pending_writes()
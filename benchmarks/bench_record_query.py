@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# bench_record_query.py  ──  TAB3 / TAB5 的中繼資料查詢：每次重跑排序 vs. DataFrame 索引
+#
+# 用法：python benchmarks/bench_record_query.py [--sizes 1000 10000 50000]
+# 舊做法每次重跑都依 date_added 排序全部 ref、list(...)[-3:] 取最近儲存；
+# 新做法查 RecordFrame（建一次，之後每次寫入只併入變動的列）。
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_query import RecordFrame  # noqa: E402
+
+
+def make_meta(n):
+    types = ["Scripture", "Document", "Vocabulary", "Grammar", "Sermon"]
+    return {f"batch_{i}": {"ref": f"batch_{i}", "type": types[i % 5], "mode": "AB"[i % 2],
+                           "date_added": f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d} {i % 24:02d}:00",
+                           "saved_sheets": ["V1 Sheet", "V2 Sheet"] if i % 2 == 0 else ["W Sheet"]}
+            for i in range(n)}
+
+
+def legacy_rerun(data):
+    sorted_refs = sorted(data, key=lambda ref: data[ref].get("date_added", ""), reverse=True)
+    total = len(sorted_refs)
+    new_refs = sorted_refs[:int(total * 0.6)]
+    mid_refs = sorted_refs[int(total * 0.6):int(total * 0.9)]
+    old_refs = sorted_refs[int(total * 0.9):]
+    pool = (new_refs * 6) + (mid_refs * 3) + old_refs
+    recent = list(data)[-3:]
+    return pool[:15], recent
+
+
+def frame_rerun(frame, total):
+    return (frame.newest(min(int(total * 0.6), 15)) * 6)[:15], frame.recent(3)
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    meta_fn = lambda data, ref: data[ref]  # noqa: E731
+    print(f"{'records':>8} {'build ms':>9} {'legacy ms':>10} {'frame ms':>9} {'write+query ms':>15}")
+    for n in args.sizes:
+        data = make_meta(n)
+        frame = RecordFrame(meta_fn)
+        t_build = best_of(lambda: frame.rebuild(data), 1)
+        t_legacy = best_of(lambda: legacy_rerun(data), args.repeat)
+        t_frame = best_of(lambda: frame_rerun(frame, n), args.repeat)
+
+        def write_then_query():
+            data["batch_0"] = dict(data["batch_0"], date_added="2027-01-01 00:00")
+            frame.apply(data, ["batch_0"])
+            frame_rerun(frame, n)
+
+        t_write = best_of(write_then_query, args.repeat)
+        print(f"{n:8d} {t_build * 1000:9.1f} {t_legacy * 1000:10.2f} {t_frame * 1000:9.2f} {t_write * 1000:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# bench_record_schema.py  ──  紀錄格式：含標題列的 TSV 字串 vs. 資料列清單
+#
+# 用法：python benchmarks/bench_record_schema.py [--records 2000] [--rows 3]
+# 比較 sentences.json 大小、json 載入時間，以及 TAB2/TAB3 取經文（每次重跑都做）的解析時間。
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_schema import migrate_sentences_file, normalize_record, verse_rows  # noqa: E402
+
+V1_HEADER = "Ref.\tEnglish（ESV經文）\tChinese經文\tSyn/Ant\tGrammar\n"
+V2_HEADER = "Ref.經文出處\t口語訳\tGrammar\tNote\tKRF\tKorean Syn/Ant\tTHSV11 泰文重要片語\n"
+
+
+def make_legacy(n_records, n_rows):
+    data = {}
+    for i in range(n_records):
+        v1 = V1_HEADER + "".join(
+            f"Heb 6:{r}\tAnd this we will do if God permits.\t神若許我們、我們必如此行。\t\t\n" for r in range(n_rows))
+        v2 = V2_HEADER + "".join(
+            f"Heb 6:{r}\t神が許して下さるなら\t\t\t하나님이 허락하시면\t\tถ้าพระเจ้า\n" for r in range(n_rows))
+        data[f"R{i}"] = {
+            "ref": f"R{i}", "mode": "A", "type": "Scripture", "v1_content": v1, "v2_content": v2,
+            "w_sheet": "", "p_sheet": "", "grammar_list": "", "other": "",
+            "saved_sheets": ["V1 Sheet", "V2 Sheet"], "date_added": "2026-01-01 00:00",
+        }
+    return data
+
+
+def legacy_verses(record):
+    """改版前 TAB3 的寫法：每次重跑都以 csv.DictReader 重新解析 TSV"""
+    lines = record.get("v1_content", "").strip().split("\n")
+    return [{"ref": row.get("Ref. 經文出處", row.get("Ref.", "")),
+             "en": row.get("English（ESV經文）", ""), "cn": row.get("Chinese經文", "")}
+            for row in csv.DictReader(lines, delimiter="\t")]
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=3, help="每筆紀錄的 V1/V2 列數")
+    args = parser.parse_args()
+
+    legacy = make_legacy(args.records, args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path, new_path = os.path.join(tmp, "old.json"), os.path.join(tmp, "new.json")
+        with open(old_path, "w", encoding="utf-8") as f:
+            json.dump(legacy, f, ensure_ascii=False)
+        t_migrate = best_of(lambda: migrate_sentences_file(old_path, new_path), repeat=1)
+        old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+        with open(new_path, encoding="utf-8") as f:
+            rows = json.load(f)
+
+    assert rows == {ref: normalize_record(r) for ref, r in legacy.items()}
+    assert all(legacy_verses(legacy[ref]) == verse_rows(rows[ref]) for ref in legacy)
+
+    t_old = best_of(lambda: [legacy_verses(r) for r in legacy.values()])
+    t_new = best_of(lambda: [verse_rows(r) for r in rows.values()])
+    print(f"file size   TSV {old_size / 1024:8.1f} KiB   rows {new_size / 1024:8.1f} KiB "
+          f"({new_size / old_size:.0%})")
+    print(f"verse parse TSV {t_old * 1000:8.1f} ms    rows {t_new * 1000:8.1f} ms  "
+          f"({args.records} 筆；TAB2/TAB3 每次重跑)")
+    print(f"migration   {t_migrate * 1000:.1f} ms（串流）")
+
+
+if __name__ == "__main__":
+    main()
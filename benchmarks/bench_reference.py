@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# bench_reference.py  ──  出處查詢：逐筆子字串比對 vs. 排序索引（bisect）
+#
+# 用法：python benchmarks/bench_reference.py [--sizes 1000 10000 50000]
+# 每筆紀錄有 5 列 V1 經文；量測建索引時間與單節、範圍查詢時間。
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bible_ref import BOOKS, ReferenceIndex  # noqa: E402
+
+QUERIES = ["Heb 6:3", "來6:3", "Hebrews 6:1-12", "Rev 22"]
+
+
+def make_records(n):
+    data = {}
+    for i in range(n):
+        book = BOOKS[i % len(BOOKS)][0]
+        chapter = i // len(BOOKS) % 50 + 1
+        rows = [[f"{book} {chapter}:{v}", "English text", "中文經文", "", ""] for v in range(1, 6)]
+        data[f"batch_{i}"] = {"v1_content": rows}
+    return data
+
+
+def linear_lookup(data, ref_input):
+    """舊版 fetch_verse_by_reference 的比對方式（去空白小寫後子字串比對）"""
+    ref_lower = ref_input.lower().replace(' ', '')
+    return [ref for ref, record in data.items()
+            if any(ref_lower in row[0].lower().replace(' ', '') for row in record["v1_content"])]
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        data = make_records(n)
+        index = ReferenceIndex(lambda record: record["v1_content"])
+        t_build = best_of(lambda: index.rebuild(iter(data.items())), 1)
+        print(f"{n} records ({len(index)} verses): build {t_build * 1000:.0f} ms")
+        print(f"  {'query':<16} {'linear ms':>10} {'index ms':>10} {'hits':>6} {'linear hits':>12}")
+        for query in QUERIES:
+            t_linear = best_of(lambda: linear_lookup(data, query), args.repeat)
+            t_index = best_of(lambda: index.lookup(query), args.repeat)
+            print(f"  {query:<16} {t_linear * 1000:10.2f} {t_index * 1000:10.3f} "
+                  f"{len(index.lookup(query)):6d} {len(linear_lookup(data, query)):12d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# bench_search.py  ──  TAB5 搜尋：逐筆子字串比對 vs. 倒排索引
+#
+# 用法：python benchmarks/bench_search.py [--sizes 1000 10000 50000]
+# 量測建索引時間、索引檔大小、單筆增量更新，以及各查詢的線性掃描與索引查詢時間。
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, record_texts  # noqa: E402
+
+QUERIES = ["permits", "神若許", "허락", "อนุญาต", "Heb 6:7", "oath permits", "God permits"]
+
+
+def make_records(n):
+    data = {}
+    for i in range(n):
+        ref = f"Heb 6:{i}"
+        data[ref] = {
+            "ref": ref, "mode": "A", "type": "Scripture",
+            "v1_content": [[ref, f"And this we will do if God permits. ({i})", "神若許我們、我們必如此行。", "", ""]],
+            "v2_content": [[ref, "神が許して下さるなら、わたしたちはこのようにします。", "", "", "하나님이 허락하시면", "",
+                            "ถ้าพระเจ้าทรงอนุญาต" if i % 10 == 0 else "พระเจ้าทรงรักเรา"]],
+            "w_sheet": [], "p_sheet": [], "grammar_list": [], "other": "",
+            "grammar": {"english": {"full": "And this we will do if God permits.",
+                                    "points": [{"label": "A", "rule": "if-clause", "example": "if God permits",
+                                                "trans": "神若許"}]}},
+            "vocabulary": [{"word": "permit", "meaning": "允許"}, {"word": "oath" if i % 100 == 0 else "hope",
+                                                                  "meaning": "起誓"}],
+            "saved_sheets": ["V1 Sheet", "V2 Sheet"], "date_added": "2026-01-01 00:00",
+        }
+    return data
+
+
+def linear_search(data, query):
+    """舊做法（擴充到所有欄位）：每次查詢掃過所有紀錄的文字"""
+    q = query.lower()
+    return [ref for ref, record in data.items()
+            if q in ref.lower() or any(q in text.lower() for _, text in record_texts(record))]
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            data = make_records(n)
+            path = os.path.join(tmp, f"index_{n}.db")
+            index = SearchIndex(path)
+            t0 = time.perf_counter()
+            index.rebuild(iter(data.items()), n)
+            t_build = time.perf_counter() - t0
+            ref = next(iter(data))
+            t_update = best_of(lambda: index.update(ref, data[ref]), args.repeat)
+            print(f"{n} records: build {t_build:.2f} s, update {t_update * 1000:.2f} ms, "
+                  f"index {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+            print(f"  {'query':<14} {'linear ms':>10} {'index ms':>10} {'hits':>7}")
+            for query in QUERIES:
+                t_linear = best_of(lambda: linear_search(data, query), args.repeat)
+                t_index = best_of(lambda: index.search(query), args.repeat)
+                print(f"  {query:<14} {t_linear * 1000:10.1f} {t_index * 1000:10.1f} {index.search(query)[1]:7d}")
+
+
+if __name__ == "__main__":
+    main()
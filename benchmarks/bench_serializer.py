@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# bench_serializer.py  ──  本地快照編碼：json indent=2 vs. 緊湊 JSON / orjson / 壓縮
+#
+# 用法：python benchmarks/bench_serializer.py [--sizes 1000 10000 50000]
+# 每種格式量測寫入（編碼 + 寫檔）、載入（讀檔 + 解碼）時間與檔案大小。
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializer  # noqa: E402
+
+
+def make_records(n):
+    data = {}
+    for i in range(n):
+        ref = f"Heb 6:{i}"
+        data[ref] = {
+            "ref": ref, "mode": "A", "type": "Scripture",
+            "v1_content": [[ref, "And this we will do if God permits.", "神若許我們、我們必如此行。", "", ""]],
+            "v2_content": [[ref, "神が許して下さるなら、わたしたちはこのようにします。", "", "", "하나님이 허락하시면", "", "ถ้าพระเจ้าทรงอนุญาต"]],
+            "w_sheet": [], "p_sheet": [], "grammar_list": [], "other": "",
+            "grammar": {"english": {"full": "And this we will do if God permits.",
+                                    "points": [{"label": "A", "rule": "if-clause", "example": "if God permits", "trans": "神若許"}]}},
+            "vocabulary": [{"word": "permit", "meaning": "允許"}, {"word": "oath", "meaning": "起誓"}],
+            "saved_sheets": ["V1 Sheet", "V2 Sheet"], "date_added": "2026-01-01 00:00",
+        }
+    return data
+
+
+def legacy_save(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def legacy_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def stdlib_save(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def serializer_save(compression):
+    def save(path, data):
+        with open(path, "wb") as f:
+            f.write(serializer.encode(data, compression))
+    return save
+
+
+def formats():
+    yield "json indent=2", legacy_save, legacy_load
+    yield "json compact", stdlib_save, legacy_load
+    label = "orjson" if serializer.orjson is not None else "serializer"
+    yield label, serializer_save(None), serializer.read_file
+    yield f"{label}+gzip", serializer_save("gzip"), serializer.read_file
+    if serializer.zstandard is not None:
+        yield f"{label}+zstd", serializer_save("zstd"), serializer.read_file
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'format':<16} {'save ms':>9} {'load ms':>9} {'size KiB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            data = make_records(n)
+            for label, save, load in formats():
+                path = os.path.join(tmp, "snapshot")
+                t_save = best_of(lambda: save(path, data), args.repeat)
+                t_load = best_of(lambda: load(path), args.repeat)
+                assert load(path) == data, f"{label} round trip differs"
+                print(f"{n:8d} {label:<16} {t_save * 1000:9.1f} {t_load * 1000:9.1f} "
+                      f"{os.path.getsize(path) / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
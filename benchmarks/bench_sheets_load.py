@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# bench_sheets_load.py  ──  冷啟動載入：逐表讀取 vs. 一次 values_batch_get
+#
+# 用法：python benchmarks/bench_sheets_load.py [--latency 0.08] [--refs 300]
+# 以本地替身（sheets_fake）模擬 Google Sheets，每次 HTTP 呼叫固定注入延遲。
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheets_fake import FakeSheetsClient  # noqa: E402
+from sheets_sync import SHEET_RANGES, batch_read_sheets, group_sheet_rows  # noqa: E402
+
+
+def make_client(data, latency):
+    """建立本地替身並灌入資料（灌資料不計入呼叫次數）"""
+    gc = FakeSheetsClient(latency=latency)
+    for title, rows in data.items():
+        gc.backend.add_sheet(title)
+        gc.backend.append(title, rows)
+    return gc
+
+
+def make_data(n_refs):
+    data = {
+        "V1_Sheet": [["檔名_批次", "Ref. 經文出處", "English（ESV經文）", "Chinese經文", "Syn/Ant", "Grammar"]],
+        "V2_Sheet": [["檔名_批次", "Ref.經文出處", "口語訳", "Grammar", "Note", "KRF", "Korean Syn/Ant", "THSV11 泰文重要片語"]],
+        "W_Sheet": [["檔名_批次", "No經卷範圍", "Word/Phrase+Chinese", "Synonym+中文對照", "Antonym+中文對照", "全句聖經中英對照例句"]],
+        "P_Sheet": [["檔名_批次", "Paragraph", "English Refinement", "中英夾雜講章"]],
+        "Grammar_List": [["檔名_批次", "No經卷範圍", "Original Sentence＋中文翻譯", "Grammar Rule", "Analysis & Example"]],
+    }
+    for i in range(n_refs):
+        a, b = f"A{i}", f"B{i}"
+        for v in range(3):
+            data["V1_Sheet"].append([a, f"Heb 6:{v}", "And this we will do", "神若許我們", "", ""])
+            data["V2_Sheet"].append([a, f"Heb 6:{v}", "口語訳", "", "", "KRF", "", ""])
+        data["W_Sheet"].append([b, "1", "grace 恩典", "", "", ""])
+        data["P_Sheet"].append([b, "1", "Refined", ""])
+        data["Grammar_List"].append([b, "1", "S", "Rule", ""])
+    return data
+
+
+def load_serial(sh):
+    """舊版路徑：每個工作表各做一次 worksheet() + get_all_values()"""
+    values = {}
+    for name, _, _ in SHEET_RANGES:
+        values[name] = sh.worksheet(name).get_all_values()
+    return group_sheet_rows(values, date_added="-")
+
+
+def load_batched(sh):
+    values, _ = batch_read_sheets(sh)
+    return group_sheet_rows(values, date_added="-")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.08, help="每次呼叫延遲（秒）")
+    parser.add_argument("--refs", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_data(args.refs)
+    results = {}
+    for label, loader in [("serial", load_serial), ("batched", load_batched)]:
+        best = None
+        for _ in range(args.repeat):
+            gc = make_client(data, args.latency)
+            sh = gc.open_by_key("bench")
+            gc.reset_stats()
+            t0 = time.perf_counter()
+            out = loader(sh)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = out
+        print(f"{label:8s} calls={gc.total_calls:2d}  cold load={best * 1000:8.1f} ms  records={len(out)}")
+
+    assert results["serial"] == results["batched"], "batched result differs from serial"
+    print("results identical ✔")
+
+
+if __name__ == "__main__":
+    main()
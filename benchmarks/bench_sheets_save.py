@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# bench_sheets_save.py  ──  單筆儲存：逐表 open + worksheet + append_rows vs. 一次 batch_update
+#
+# 用法：python benchmarks/bench_sheets_save.py [--latency 0.08] [--saves 5]
+# 以本地替身（sheets_fake）模擬 Google Sheets，每次 HTTP 呼叫固定注入延遲。
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheets_fake import FakeSheetsClient  # noqa: E402
+from sheets_sync import SHEET_HEADERS, batch_append_rows  # noqa: E402
+
+
+def make_client(latency):
+    gc = FakeSheetsClient(latency=latency)
+    for name, header in SHEET_HEADERS.items():
+        gc.backend.add_sheet(name)
+        gc.backend.append(name, [header])
+    return gc
+
+
+def make_record(i):
+    ref = f"B{i}"
+    return {
+        "W_Sheet": [[ref, "1", "grace 恩典", "", "", ""]] * 8,
+        "P_Sheet": [[ref, "1", "Refined", ""]] * 3,
+        "Grammar_List": [[ref, "1", "S", "Rule", ""]] * 5,
+    }
+
+
+def save_serial(gc, rows_by_sheet):
+    """舊版路徑：每個工作表各自 open_by_key + worksheet() + append_rows()"""
+    for name, rows in rows_by_sheet.items():
+        gc.open_by_key("bench").worksheet(name).append_rows(rows)
+
+
+def save_batched(sh, rows_by_sheet, sheet_ids):
+    """新版路徑：共用的 Spreadsheet handle + 一次 batch_update"""
+    batch_append_rows(sh, rows_by_sheet, sheet_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.08, help="每次呼叫延遲（秒）")
+    parser.add_argument("--saves", type=int, default=5)
+    args = parser.parse_args()
+
+    records = [make_record(i) for i in range(args.saves)]
+    results = {}
+    for label in ("serial", "batched"):
+        gc = make_client(args.latency)
+        sh = gc.open_by_key("bench") if label == "batched" else None
+        sheet_ids = {}
+        t0 = time.perf_counter()
+        for rows_by_sheet in records:
+            if label == "serial":
+                save_serial(gc, rows_by_sheet)
+            else:
+                save_batched(sh, rows_by_sheet, sheet_ids)
+        elapsed = time.perf_counter() - t0
+        results[label] = {name: gc.backend.rows(name) for name in SHEET_HEADERS}
+        print(f"{label:8s} calls/save={gc.total_calls / args.saves:4.1f}  "
+              f"ms/save={elapsed / args.saves * 1000:7.1f}  {dict(gc.calls)}")
+
+    assert results["serial"] == results["batched"], "batched sheet contents differ from serial"
+    print("sheet contents identical ✔")
+
+
+if __name__ == "__main__":
+    main()
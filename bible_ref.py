@@ -0,0 +1,263 @@
+# bible_ref.py  ──  聖經出處解析與排序索引（不依賴 Streamlit）
+#
+# 「Heb 6:3」「來6:3」「Hebrews 6:3」「希伯來書 6章3節」都解析成同一個鍵 (書卷序號, 章, 節)，
+# 鍵可直接比較大小，ReferenceIndex 以排序清單 + bisect 做 O(log n) 的單節與範圍查詢（如 Heb 6:1-12）。
+import bisect
+import re
+
+from record_index import RecordIndex
+
+# ===================================================================
+# 書卷名稱
+# ===================================================================
+# (標準縮寫, 英文全名, 中文全名, 中文縮寫, 其他英文縮寫)；序號即清單位置 + 1
+BOOKS = [
+    ("Gen", "Genesis", "創世記", "創", "gn"),
+    ("Exo", "Exodus", "出埃及記", "出", "ex exod"),
+    ("Lev", "Leviticus", "利未記", "利", "lv"),
+    ("Num", "Numbers", "民數記", "民", "nm nb"),
+    ("Deu", "Deuteronomy", "申命記", "申", "dt deut"),
+    ("Jos", "Joshua", "約書亞記", "書", "josh jsh"),
+    ("Jdg", "Judges", "士師記", "士", "judg jdgs"),
+    ("Rut", "Ruth", "路得記", "得", "rth"),
+    ("1Sa", "1 Samuel", "撒母耳記上", "撒上", "1sm"),
+    ("2Sa", "2 Samuel", "撒母耳記下", "撒下", "2sm"),
+    ("1Ki", "1 Kings", "列王紀上", "王上", "1kgs"),
+    ("2Ki", "2 Kings", "列王紀下", "王下", "2kgs"),
+    ("1Ch", "1 Chronicles", "歷代志上", "代上", "1chr"),
+    ("2Ch", "2 Chronicles", "歷代志下", "代下", "2chr"),
+    ("Ezr", "Ezra", "以斯拉記", "拉", ""),
+    ("Neh", "Nehemiah", "尼希米記", "尼", ""),
+    ("Est", "Esther", "以斯帖記", "斯", ""),
+    ("Job", "Job", "約伯記", "伯", "jb"),
+    ("Psa", "Psalms", "詩篇", "詩", "ps pss psalm"),
+    ("Pro", "Proverbs", "箴言", "箴", "prv pr"),
+    ("Ecc", "Ecclesiastes", "傳道書", "傳", "eccl qoh"),
+    ("Son", "Song of Songs", "雅歌", "歌", "song sos songofsolomon canticles"),
+    ("Isa", "Isaiah", "以賽亞書", "賽", ""),
+    ("Jer", "Jeremiah", "耶利米書", "耶", ""),
+    ("Lam", "Lamentations", "耶利米哀歌", "哀", ""),
+    ("Eze", "Ezekiel", "以西結書", "結", "ezk"),
+    ("Dan", "Daniel", "但以理書", "但", "dn"),
+    ("Hos", "Hosea", "何西阿書", "何", ""),
+    ("Joe", "Joel", "約珥書", "珥", "jl"),
+    ("Amo", "Amos", "阿摩司書", "摩", ""),
+    ("Oba", "Obadiah", "俄巴底亞書", "俄", "ob"),
+    ("Jon", "Jonah", "約拿書", "拿", "jnh"),
+    ("Mic", "Micah", "彌迦書", "彌", ""),
+    ("Nah", "Nahum", "那鴻書", "鴻", ""),
+    ("Hab", "Habakkuk", "哈巴谷書", "哈", ""),
+    ("Zep", "Zephaniah", "西番雅書", "番", ""),
+    ("Hag", "Haggai", "哈該書", "該", ""),
+    ("Zec", "Zechariah", "撒迦利亞書", "亞", ""),
+    ("Mal", "Malachi", "瑪拉基書", "瑪", ""),
+    ("Mat", "Matthew", "馬太福音", "太", "mt"),
+    ("Mar", "Mark", "馬可福音", "可", "mk mrk"),
+    ("Luk", "Luke", "路加福音", "路", "lk"),
+    ("Joh", "John", "約翰福音", "約", "jn jhn"),
+    ("Act", "Acts", "使徒行傳", "徒", ""),
+    ("Rom", "Romans", "羅馬書", "羅", "rm"),
+    ("1Co", "1 Corinthians", "哥林多前書", "林前", ""),
+    ("2Co", "2 Corinthians", "哥林多後書", "林後", ""),
+    ("Gal", "Galatians", "加拉太書", "加", ""),
+    ("Eph", "Ephesians", "以弗所書", "弗", ""),
+    ("Phi", "Philippians", "腓立比書", "腓", "php phil"),
+    ("Col", "Colossians", "歌羅西書", "西", ""),
+    ("1Th", "1 Thessalonians", "帖撒羅尼迦前書", "帖前", ""),
+    ("2Th", "2 Thessalonians", "帖撒羅尼迦後書", "帖後", ""),
+    ("1Ti", "1 Timothy", "提摩太前書", "提前", ""),
+    ("2Ti", "2 Timothy", "提摩太後書", "提後", ""),
+    ("Tit", "Titus", "提多書", "多", ""),
+    ("Phm", "Philemon", "腓利門書", "門", "phlm philem"),
+    ("Heb", "Hebrews", "希伯來書", "來", ""),
+    ("Jam", "James", "雅各書", "雅", "jas jm"),
+    ("1Pe", "1 Peter", "彼得前書", "彼前", "1pt"),
+    ("2Pe", "2 Peter", "彼得後書", "彼後", "2pt"),
+    ("1Jo", "1 John", "約翰一書", "約壹", "1jn 1jhn 約翰壹書"),
+    ("2Jo", "2 John", "約翰二書", "約貳", "2jn 2jhn 約翰貳書"),
+    ("3Jo", "3 John", "約翰三書", "約參", "3jn 3jhn 約翰參書"),
+    ("Jud", "Jude", "猶大書", "猶", "jude"),
+    ("Rev", "Revelation", "啟示錄", "啟", "rv re apocalypse"),
+]
+
+# 只有一章的書卷：「Jude 5」指第 1 章第 5 節
+SINGLE_CHAPTER = {"Oba", "Phm", "2Jo", "3Jo", "Jud"}
+
+# 書卷名稱中出現的簡體字 → 繁體
+_SIMPLIFIED = str.maketrans("创记数书师纪历诗传赛结约弥鸿该亚玛马罗后门来犹启贰叁录", "創記數書師紀歷詩傳賽結約彌鴻該亞瑪馬羅後門來猶啟貳參錄")
+_ORDINALS = {"i": "1", "ii": "2", "iii": "3", "first": "1", "second": "2", "third": "3"}
+_ORDINAL_RE = re.compile(r"^(iii|ii|i|first|second|third)\s+(?=[a-z])")
+
+
+def _book_key(name):
+    """書卷名稱比對用的形式：小寫、去空白與句點、簡轉繁、序數轉數字"""
+    name = name.strip().lower()
+    name = _ORDINAL_RE.sub(lambda m: _ORDINALS[m.group(1)], name)
+    return re.sub(r"[\s.]", "", name).translate(_SIMPLIFIED)
+
+
+def _build_aliases():
+    aliases = {}
+    for number, (abbr, english, chinese, chinese_abbr, extra) in enumerate(BOOKS, 1):
+        names = [abbr, english, chinese, chinese_abbr] + extra.split()
+        for suffix in ("福音", "書", "記"):     # 「希伯來」「馬太」等省略字尾的寫法
+            if chinese.endswith(suffix) and len(chinese) > len(suffix) + 1:
+                names.append(chinese[:-len(suffix)])
+        for name in names:
+            aliases.setdefault(_book_key(name), number)
+    # 英文全名的前綴（至少 2 個字母）只要不與其他書卷重疊也可以用，如 Hebr、Matt、Philipp
+    prefixes = {}
+    for number, (_, english, _, _, _) in enumerate(BOOKS, 1):
+        key = _book_key(english)
+        start = 3 if key[0].isdigit() else 2
+        for end in range(start, len(key)):
+            prefixes.setdefault(key[:end], set()).add(number)
+    for prefix, numbers in prefixes.items():
+        if len(numbers) == 1:
+            aliases.setdefault(prefix, next(iter(numbers)))
+    return aliases
+
+
+BOOK_ALIASES = _build_aliases()
+
+
+def book_number(name):
+    """書卷名稱或縮寫 → 序號（1–66），無法辨識時回傳 None"""
+    return BOOK_ALIASES.get(_book_key(name))
+
+
+# ===================================================================
+# 出處解析
+# ===================================================================
+MAX_VERSE = 999     # 只有章（如 Heb 6）時的範圍上限
+
+_REF_RE = re.compile(r"""^\s*
+    (?P<book>(?:[1-3]\s*)?[^\d\s:：][^\d:：]*?)\s*
+    (?P<ch>\d+)\s*(?:(?:[:：.]|章)\s*(?P<vs>\d+)[a-z]?\s*節?|章)?
+    (?:\s*[-–—~～至到]\s*(?:(?P<ch2>\d+)\s*(?:[:：.]|章)\s*)?(?P<ve>\d+)[a-z]?\s*節?)?
+    \s*$""", re.VERBOSE)
+_PAREN_RE = re.compile(r"\s*[(（\[【][^)）\]】]*[)）\]】]\s*$")      # 結尾的（和合本）(ESV) 等譯本標示
+
+
+def parse_reference(text):
+    """出處文字 → (起始鍵, 結束鍵)，鍵為 (書卷序號, 章, 節)；無法解析時回傳 None
+
+    「Heb 6:3」→ ((58, 6, 3), (58, 6, 3))；「來 6:1-12」→ ((58, 6, 1), (58, 6, 12))；
+    「Heb 6」→ 整章；「Heb 6:20-7:2」可跨章。
+    """
+    if not text:
+        return None
+    m = _REF_RE.match(_PAREN_RE.sub("", text))
+    if not m:
+        return None
+    book = book_number(m.group("book"))
+    if book is None:
+        return None
+    chapter = int(m.group("ch"))
+    verse = m.group("vs")
+    if verse is None and m.group("ve") is None and BOOKS[book - 1][0] in SINGLE_CHAPTER:
+        chapter, verse = 1, str(chapter)
+    if verse is None:
+        if m.group("ve") is not None:       # 「Heb 6-7」：章的範圍
+            return (book, chapter, 1), (book, int(m.group("ve")), MAX_VERSE)
+        return (book, chapter, 1), (book, chapter, MAX_VERSE)
+    start = (book, chapter, int(verse))
+    if m.group("ve") is None:
+        return start, start
+    end = (book, int(m.group("ch2") or chapter), int(m.group("ve")))
+    return (start, end) if end >= start else None
+
+
+def verse_key(text):
+    """單節出處 → 鍵；範圍或無法解析時回傳 None"""
+    parsed = parse_reference(text)
+    if parsed is None or parsed[0] != parsed[1]:
+        return None
+    return parsed[0]
+
+
+def format_reference(key):
+    """鍵 → 標準寫法「Heb 6:3」"""
+    book, chapter, verse = key
+    return f"{BOOKS[book - 1][0]} {chapter}:{verse}"
+
+
+# ===================================================================
+# 排序索引
+# ===================================================================
+def record_verse_keys(ref, rows):
+    """一筆紀錄的 (鍵, 列號)：V1 各列的出處；沒有可解析的列時退回紀錄 ref 本身（列號 None）"""
+    keys = []
+    for i, row in enumerate(rows):
+        key = verse_key(row[0]) if row else None
+        if key is not None:
+            keys.append((key, i))
+    if not keys:
+        key = verse_key(ref)
+        if key is not None:
+            keys.append((key, None))
+    return keys
+
+
+class ReferenceIndex(RecordIndex):
+    """(書卷, 章, 節) → (紀錄 ref, 列號) 的排序清單；同一節可出現在多筆紀錄
+
+    rows_fn(record) 取出紀錄的 V1 資料列。重建時先收集全部 entries，最後一次排序後整批換上。
+    """
+
+    def __init__(self, rows_fn):
+        super().__init__()
+        self._rows_fn = rows_fn
+        self._entries = []          # [(書卷, 章, 節, ref, 列號)]，已排序；沒有列號時存 -1
+        self._by_ref = {}           # ref → 該紀錄的 entries
+        self._fresh = None          # 重建中收集的 {ref: entries}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, ref, record):
+        return [key + (ref, -1 if row is None else row) for key, row in record_verse_keys(ref, self._rows_fn(record))]
+
+    def _drop(self, ref):
+        for entry in self._by_ref.pop(ref, ()):
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def _set(self, ref, entries):
+        self._drop(ref)
+        for entry in entries:
+            bisect.insort(self._entries, entry)
+        self._by_ref[ref] = entries
+
+    def _rebuild_start(self):
+        self._fresh = {}
+
+    def _rebuild_add(self, items):
+        self._fresh.update(items)
+
+    def _rebuild_end(self):
+        fresh, self._fresh = self._fresh, None
+        # 重建期間更新或刪除過的 ref 以目前內容為準（掃描到的可能是舊內容）
+        for ref in self._touched:
+            if ref in self._by_ref:
+                fresh[ref] = self._by_ref[ref]
+            else:
+                fresh.pop(ref, None)
+        self._by_ref = fresh
+        self._entries = sorted(entry for entries in fresh.values() for entry in entries)
+
+    def range(self, start, end):
+        """start ≤ 鍵 ≤ end 的 [(鍵, ref, 列號)]，依經文順序"""
+        with self._lock:
+            # 3 元素的鍵排在同鍵的所有 entry 之前
+            lo = bisect.bisect_left(self._entries, start)
+            hi = bisect.bisect_left(self._entries, end[:2] + (end[2] + 1,))
+            found = self._entries[lo:hi]
+        return [(entry[:3], entry[3], None if entry[4] < 0 else entry[4]) for entry in found]
+
+    def lookup(self, text):
+        """出處文字（單節或範圍）→ [(鍵, ref, 列號)]；無法解析時回傳空清單"""
+        parsed = parse_reference(text)
+        return self.range(*parsed) if parsed else []
+
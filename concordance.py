@@ -0,0 +1,129 @@
+# concordance.py  ──  單字索引：詞元 → 出現位置（不依賴 Streamlit）
+#
+# 單字散在三個地方：V1 的 Syn/Ant 欄、W_Sheet 的 Word/Phrase+Chinese 欄、
+# TAB1 貼上的 vocabulary / phrases。每個儲存格切成詞元（英文以 Porter 詞幹化、
+# 中日韓泰取整段文字），記下 (ref, 工作表, 列, 語言)，查「這個字還出現在哪裡」不必重讀所有紀錄。
+# 啟動時在背景建立，之後由 SentenceJournal 的 listener 逐筆更新。
+import re
+
+from record_index import RecordIndex
+from record_schema import table_rows
+from search_index import normalize, stem
+
+# (紀錄欄位, 欄位位置)；位置 None 表示 TAB1 的清單欄位（只取 word / phrase，不含釋義）
+SOURCES = [
+    ("v1_content", 3),          # Syn/Ant
+    ("w_sheet", 1),             # Word/Phrase+Chinese
+    ("vocabulary", None),
+    ("phrases", None),
+]
+SOURCE_ORDER = {field: i for i, (field, _) in enumerate(SOURCES)}
+
+# 不單獨成為詞元的英文虛詞（片語查詢時也略過）
+STOPWORDS = set("""
+a an the of to in on at by for from with and or but as is are was were be been am do does did
+sb sth someone something one's oneself n v adj adv prep conj phr
+""".split())
+
+_TERM_RE = re.compile(
+    r"(?P<ko>[가-힯ᄀ-ᇿ]+)|(?P<ja>[぀-ヿ][぀-ヿ㐀-䶿一-鿿]*)|(?P<zh>[㐀-䶿一-鿿豈-﫿]+)"
+    r"|(?P<th>[ก-๛]+)|(?P<en>[a-z][a-z'-]*)")
+
+TEXT_PREVIEW = 80       # 出現位置保留的原文長度
+
+
+def lemmas(text):
+    """文字 → [(語言, 詞元)]，依出現順序、不重複"""
+    found = {}
+    for m in _TERM_RE.finditer(normalize(text)):
+        lang = m.lastgroup
+        if lang == "en":
+            words = [word for word in re.split(r"['-]", m.group()) if word]
+            for word in words:
+                if len(word) > 1 and word not in STOPWORDS:
+                    found[("en", stem(word))] = None
+        elif len(m.group()) > 1 or lang == "zh":
+            found[(lang, m.group())] = None
+    return list(found)
+
+
+def _item_text(item):
+    """清單項目的單字／片語本身；釋義裡的字不算這個字的出處"""
+    if isinstance(item, dict):
+        return item.get("word") or item.get("phrase") or ""
+    return str(item)
+
+
+def record_occurrences(ref, record):
+    """一筆紀錄的 [((語言, 詞元), (ref, 欄位, 列), (原文, 語言))]
+
+    每格的語言取第一個詞元的語言（單字欄是「英文 + 中文釋義」，開頭即該格的單字）。
+    """
+    found = []
+    for field, column in SOURCES:
+        if column is None:
+            items = record.get(field) or (record.get("ai_analysis") or {}).get(field) or []
+            cells = [(i, _item_text(item)) for i, item in enumerate(items)]
+        else:
+            cells = [(i, row[column]) for i, row in enumerate(table_rows(record, field)) if len(row) > column]
+        for row, text in cells:
+            if not text or not text.strip():
+                continue
+            keys = lemmas(text)
+            if not keys:
+                continue
+            posting = (" ".join(text.split())[:TEXT_PREVIEW], keys[0][0])
+            for key in keys:
+                found.append((key, (ref, field, row), posting))
+    return found
+
+
+class Concordance(RecordIndex):
+    """(語言, 詞元) → {(ref, 欄位, 列): (原文, 該格的語言)}"""
+
+    def __init__(self):
+        super().__init__()
+        self._by_lemma = {}
+        self._by_ref = {}           # ref → 該紀錄貢獻的詞元
+
+    def __len__(self):
+        return len(self._by_lemma)
+
+    def _index(self, ref, record):
+        return record_occurrences(ref, record)
+
+    def _drop(self, ref):
+        for key in self._by_ref.pop(ref, ()):
+            places = self._by_lemma.get(key)
+            if places is None:
+                continue
+            for place in [place for place in places if place[0] == ref]:
+                del places[place]
+            if not places:
+                del self._by_lemma[key]
+
+    def _set(self, ref, occurrences):
+        self._drop(ref)
+        keys = set()
+        for key, place, posting in occurrences:
+            self._by_lemma.setdefault(key, {})[place] = posting
+            keys.add(key)
+        if keys:
+            self._by_ref[ref] = keys
+
+    def lookup(self, text, exclude_ref=None, limit=50):
+        """單字或片語的出現位置 [{'ref', 'field', 'row', 'lang', 'text'}]
+
+        片語的每個詞元都要出現在同一格；exclude_ref 通常是目前顯示的紀錄。
+        """
+        keys = lemmas(text)
+        if not keys:
+            return []
+        with self._lock:
+            postings = [self._by_lemma.get(key, {}) for key in keys]
+            postings.sort(key=len)
+            places = [place for place in postings[0] if all(place in other for other in postings[1:])]
+            hits = [(place, postings[0][place]) for place in places if place[0] != exclude_ref]
+        hits.sort(key=lambda hit: (hit[0][0], SOURCE_ORDER[hit[0][1]], hit[0][2]))
+        return [{"ref": ref, "field": field, "row": row, "lang": lang, "text": text}
+                for (ref, field, row), (text, lang) in hits[:limit]]
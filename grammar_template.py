@@ -0,0 +1,107 @@
+# grammar_template.py  ──  TAB1 多語言結構模板（不依賴 Streamlit）
+#
+# 模板唯讀（mappingproxy / tuple），所有紀錄共用一份：顯示時以 resolve_grammar() 補上缺少的語言，
+# 不寫入紀錄。舊版把模板副本存進每筆紀錄，strip_default_grammar() 把這些副本移除。
+from collections.abc import Mapping
+from types import MappingProxyType
+
+# ===================================================================
+# 模板
+# ===================================================================
+GRAMMAR_LANGS = ('english', 'thai', 'japanese', 'korean')
+
+
+def _freeze(value):
+    """dict → 唯讀 mappingproxy、list → tuple（遞迴）"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+DEFAULT_MULTILANG_DATA = _freeze({
+    "來6:3": {
+        "ref": "Heb 6:3",
+        "chinese": "神若許我們、我們必如此行。",
+        "english": "And this we will do if God permits.",
+        "japanese": "神が許して下さるなら、わたしたちはこのようにします。",
+        "korean": "하나님이 허락하시면 우리가 이것을 하리라",
+        "thai": "ถ้าพระเจ้าทรงอนุญาต เราก็จะได้เดินหน้าต่อไป",
+        "grammar": {
+            "english": {
+                "full": "And this we will do if God permits.",
+                "upper": {"title": "①", "content": "when + God + desired + to show...", "breakdown": "當 + 神 + 想要 + 顯明..."},
+                "lower": {"title": "②", "content": "he + guaranteed + it + with an oath", "breakdown": "祂 + 保證 + 這事 + 用 + 起誓"},
+                "points": [
+                    {"label": "A", "rule": "when-clause（時間副詞子句）", "pattern": "when + S + V 👉 當…時", "example": "when God speaks", "trans": "當神說話時"},
+                    {"label": "B", "rule": "to show（不定詞表目的）", "pattern": "verb + to + V 👉 為了…", "example": "desired to show", "trans": "想要顯明"},
+                    {"label": "C", "rule": "with an oath（方式介系詞）", "pattern": "with + N 👉 用…方式", "example": "with an oath", "trans": "用起誓"}
+                ]
+            },
+            "thai": {
+                "full": "ถ้าพระเจ้าทรงอนุญาต เราก็จะได้เดินหน้าต่อไป",
+                "upper": {"title": "①", "content": "ถ้า + พระเจ้า + ทรงอนุญาต", "breakdown": "if + God + permits"},
+                "lower": {"title": "②", "content": "เรา + ก็ + จะ + ได้ + เดินหน้า + ต่อไป", "breakdown": "we + then + will + be able to + move forward"},
+                "points": [
+                    {"label": "A", "rule": "Clause + จึง + Result", "pattern": "👉 因此，所以", "example": "เหนื่อยมาก จึงไปนอน", "trans": "很累，所以去睡覺"},
+                    {"label": "B", "rule": "N＋อัน＋描述詞", "pattern": "👉 which/that", "example": "พระประสงค์อันไม่เปลี่ยนแปลง", "trans": "不改變的旨意"},
+                    {"label": "C", "rule": "ทรง（Royal Verb Marker）", "pattern": "พระเจ้า + ทรง + V", "example": "พระเจ้าทรงรัก", "trans": "神愛"}
+                ]
+            },
+            "japanese": {
+                "full": "神が許して下さるなら、わたしたちはこのようにします。",
+                "upper": {"title": "①", "content": "約束の相続人たちに...望んで", "breakdown": "promise + heirs + to | desiring"},
+                "lower": {"title": "②", "content": "誓いによって保証された", "breakdown": "oath + by + guaranteed"},
+                "points": [
+                    {"label": "A", "rule": "N1のN2（名詞修飾）", "pattern": "", "example": "約束の相続人", "trans": "應許的繼承人"},
+                    {"label": "B", "rule": "こと（名詞化）", "pattern": "V + こと", "example": "変わらないこと", "trans": "不改變這件事"},
+                    {"label": "C", "rule": "N＋によって（方式）", "pattern": "", "example": "誓いによって", "trans": "藉著誓言"}
+                ]
+            },
+            "korean": {
+                "full": "하나님이 허락하시면 우리가 이것을 하리라",
+                "upper": {"title": "①", "content": "약속의 상속자들에게...나타내시려고", "breakdown": "應許的 + 繼承人 + 對 | 為了顯明"},
+                "lower": {"title": "②", "content": "맹세로 보증하셨느니라", "breakdown": "藉著 + 起誓 + 保證"},
+                "points": [
+                    {"label": "A", "rule": "Verb+려고（目的）", "pattern": "", "example": "나타내시려고", "trans": "為了顯明"},
+                    {"label": "B", "rule": "Verb+함（名詞化）", "pattern": "", "example": "변하지 아니함", "trans": "不改變這件事"},
+                    {"label": "C", "rule": "N＋로（方式）", "pattern": "N + 로", "example": "맹세로", "trans": "用誓言"}
+                ]
+            }
+        }
+    }
+})
+DEFAULT_GRAMMAR = DEFAULT_MULTILANG_DATA["來6:3"]['grammar']
+
+
+# ===================================================================
+# 顯示與清理
+# ===================================================================
+def resolve_grammar(grammar):
+    """顯示用的完整 grammar：缺少的語言指向共用模板（回傳新 dict，不修改紀錄）"""
+    grammar = grammar or {}
+    return {lang: grammar.get(lang) or DEFAULT_GRAMMAR[lang] for lang in GRAMMAR_LANGS}
+
+
+def _is_template_copy(value, template):
+    """value 是否為模板（JSON 來回後的 dict/list）的完整副本"""
+    if isinstance(template, Mapping):
+        return isinstance(value, dict) and value.keys() == template.keys() \
+            and all(_is_template_copy(value[k], template[k]) for k in template)
+    if isinstance(template, tuple):
+        return isinstance(value, list) and len(value) == len(template) \
+            and all(_is_template_copy(v, t) for v, t in zip(value, template))
+    return value == template
+
+
+def strip_default_grammar(record):
+    """移除紀錄 grammar 中與模板相同的語言；沒有副本時回傳原物件"""
+    grammar = record.get('grammar')
+    if not isinstance(grammar, dict):
+        return record
+    kept = {lang: g for lang, g in grammar.items()
+            if not (lang in DEFAULT_GRAMMAR and _is_template_copy(g, DEFAULT_GRAMMAR[lang]))}
+    if len(kept) == len(grammar):
+        return record
+    return dict(record, grammar=kept)
@@ -0,0 +1,929 @@
+# local_store.py  ──  本地資料層（跨 session 共用，不依賴 Streamlit）
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import serializer
+from record_schema import iter_json_items, normalize_record
+
+
+# ===================================================================
+# 共用 sentences 快照
+# ===================================================================
+class StaleWriteError(Exception):
+    """寫入依據的版本已被其他 session 改過，且無法自動合併"""
+
+    def __init__(self, ref, field=None):
+        super().__init__(f"{ref}（{field}）" if field else ref)
+        self.ref = ref
+        self.field = field
+
+
+# 兩邊都改時以後寫入者為準、不算衝突的欄位
+MERGE_LAST_WRITER_FIELDS = ("date_added",)
+
+
+def merge_record(ref, base, current, mine):
+    """三方合併：base 是讀取時的紀錄，current 是目前的紀錄，mine 是這次要寫入的紀錄
+
+    只有 mine 改過、或兩邊改成相同值的欄位才套用；同一欄位兩邊改得不同時丟出 StaleWriteError。
+    """
+    if base is None or current is None or mine is None:
+        raise StaleWriteError(ref)      # 新增／刪除與其他修改衝突
+    merged = dict(current)
+    for field in set(base) | set(mine):
+        if mine.get(field) == base.get(field):
+            continue
+        if field not in MERGE_LAST_WRITER_FIELDS and current.get(field) not in (base.get(field), mine.get(field)):
+            raise StaleWriteError(ref, field)
+        if field in mine:
+            merged[field] = mine[field]
+        else:
+            merged.pop(field, None)
+    return merged
+
+
+class SentenceStore:
+    """整個 process 共用一份 sentences：版本號 + TTL + 背景雲端同步
+
+    各 session 只保存 (資料參照, 版本號, 各紀錄 revision)；版本號變了才重新綁定，不複製資料。
+    所有寫入經由 write() 在 lock 內序列化，採 copy-on-write：已綁定的舊快照不會被改動，
+    每筆紀錄的 revision 用來檢查寫入是否依據過期的資料（compare-and-swap）。
+    sync_fn(base, skip_refs) -> (sentences, cursor, changed, note)：在背景執行緒執行的雲端同步
+    persist_fn(refs, cursor)：同步結果寫回本地；refs 是同步實際改動（新增、替換、刪除）的 ref，
+    persist_fn 應以寫入當下的最新快照寫這些 ref，不可用同步開始時的資料整批比對
+    history_fn([(ref, 舊紀錄, 新紀錄)])：write() 成功後呼叫（lock 外），用來記錄版本歷史；
+    它丟出的例外記在 history_error，不讓呼叫端以為寫入失敗（資料已經換上）
+    """
+
+    FAILED_RETRY_SECONDS = 60
+
+    def __init__(self, data, ttl, sync_fn, persist_fn, history_fn=None):
+        self._lock = threading.Lock()
+        self._sync_fn = sync_fn
+        self._persist_fn = persist_fn
+        self._history_fn = history_fn
+        self.data = data
+        self.version = 1
+        self.revisions = {}       # ref -> revision（沒有記錄視為 0）；與 data 一起 copy-on-write
+        self.ttl = ttl
+        self.status = "idle"      # idle / syncing / synced / failed
+        self.synced_at = None
+        self.note = ""
+        self.error = None
+        self.history_error = None
+        self._expires_at = 0.0    # time.monotonic()；0 表示需要同步
+        self._pushed_refs = set() # 本機剛上傳到雲端的 ref
+
+    def snapshot(self):
+        """回傳 (資料參照, 版本號, revisions)"""
+        with self._lock:
+            return self.data, self.version, self.revisions
+
+    def write(self, changes, expected=None, history=True):
+        """寫入 {ref: 紀錄或 None（刪除）}，回傳新的 (資料, 版本號, revisions)
+
+        expected：{ref: (讀取時的 revision, 讀取時的紀錄)}；revision 已變時嘗試三方合併，
+        無法合併丟出 StaleWriteError，整批都不寫入。history=False 時不記錄版本歷史（整批清理用）。
+        """
+        expected = expected or {}
+        with self._lock:
+            current = self.data
+            resolved = {}
+            for ref, record in changes.items():
+                if ref in expected:
+                    base_revision, base_record = expected[ref]
+                    if self.revisions.get(ref, 0) != base_revision:
+                        record = merge_record(ref, base_record, current.get(ref), record)
+                resolved[ref] = record
+            data = current.copy()
+            revisions = dict(self.revisions)
+            changed = []
+            for ref, record in resolved.items():
+                changed.append((ref, current.get(ref), record))
+                if record is None:
+                    data.pop(ref, None)
+                else:
+                    data[ref] = record
+                revisions[ref] = revisions.get(ref, 0) + 1
+            self.data = data
+            self.revisions = revisions
+            self.version += 1
+            result = self.data, self.version, self.revisions
+        if history and self._history_fn is not None:
+            try:
+                self._history_fn(changed)
+                self.history_error = None
+            except Exception as e:
+                self.history_error = f"{type(e).__name__}: {e}"
+        return result
+
+    def release_persisted(self, data, refs):
+        """日誌已以 data 寫入 refs 的分片：共用快照不再把這些紀錄留在本地改動（改由分片快取讀取）
+
+        只移除與寫出內容相同的物件；之後又被修改、尚未寫出的紀錄保留。
+        """
+        if not isinstance(data, LazySentences):
+            return
+        with self._lock:
+            current = self.data
+            for ref in refs:
+                record = data._overlay.get(ref)
+                data.release(ref, record)
+                if current is not data and isinstance(current, LazySentences):
+                    current.release(ref, record)
+
+    def invalidate(self, pushed_refs=()):
+        """雲端已寫入新資料：讓快照立即過期，下次存取時重新同步
+
+        pushed_refs 是本機剛上傳的 ref，本地已有內容，同步時不再重複併入
+        """
+        with self._lock:
+            self._pushed_refs.update(pushed_refs)
+            self._expires_at = 0.0
+
+    def refresh_if_stale(self):
+        """快照過期且沒有同步在跑時，啟動背景同步；回傳是否有啟動"""
+        with self._lock:
+            if self.status == "syncing" or time.monotonic() < self._expires_at:
+                return False
+            self.status = "syncing"
+            base = self.data.copy()
+            skip_refs, self._pushed_refs = self._pushed_refs, set()
+        threading.Thread(target=self._run_sync, args=(base, skip_refs), daemon=True).start()
+        return True
+
+    def _run_sync(self, base, skip_refs):
+        try:
+            result, cursor, changed, note = self._sync_fn(base, skip_refs)
+        except Exception as e:
+            with self._lock:
+                self._pushed_refs.update(skip_refs)
+                self.status = "failed"
+                self.error = str(e)
+                self._expires_at = time.monotonic() + min(self.ttl, self.FAILED_RETRY_SECONDS)
+            return
+
+        synced_refs = set()
+        with self._lock:
+            if result:
+                # 同步期間其他 session 新增/替換/刪除的紀錄以本地為準
+                current = self.data
+                merged = result.copy()
+                revisions = dict(self.revisions)
+                for ref in result:
+                    if record_replaced(base, result, ref):
+                        synced_refs.add(ref)
+                synced_refs.update(ref for ref in base if ref not in result)
+                local_refs = set()
+                lazy = isinstance(merged, LazySentences) and isinstance(current, LazySentences) \
+                    and merged._storage is current._storage
+                for ref in current:
+                    if record_replaced(base, current, ref):
+                        if lazy:
+                            merged.adopt(current, ref)      # 不讀分片，也不把已寫出的紀錄再留在本地改動
+                        else:
+                            merged[ref] = current[ref]
+                        local_refs.add(ref)
+                if lazy:
+                    # 同步期間已寫入分片、移出本地改動的紀錄，不要由 base 的副本再帶回來
+                    for ref in list(merged._overlay):
+                        if ref in current and ref not in synced_refs and ref not in local_refs:
+                            merged.adopt(current, ref)
+                for ref in base:
+                    if ref not in current:
+                        merged.pop(ref, None)
+                        local_refs.add(ref)
+                synced_refs -= local_refs       # 本地版本已由原本的寫入流程存檔
+                for ref in synced_refs:
+                    revisions[ref] = revisions.get(ref, 0) + 1
+                if synced_refs or local_refs:
+                    self.data = merged
+                    self.revisions = revisions
+                    self.version += 1
+            self.status = "synced"
+            self.synced_at = datetime.datetime.now()
+            self.note = note
+            self.error = None
+            self._expires_at = time.monotonic() + self.ttl
+
+        if result and (synced_refs or changed):
+            try:
+                self._persist_fn(synced_refs, cursor)
+            except Exception as e:
+                with self._lock:
+                    self.error = f"本地快取更新失敗：{e}"
+
+
+# ===================================================================
+# 延遲合併寫入（write-behind）
+# ===================================================================
+class WriteBehind:
+    """一次互動內的多次儲存先記在記憶體，腳本跑完或 delay 秒後一次寫出
+
+    add(名稱, flush_fn, items)：同名稱的 items 累積起來，flush 時以
+    flush_fn(全部 items) 呼叫一次（flush_fn 以最後一次 add 的為準）。
+    寫出失敗時 items 放回佇列（排在之後 add 的 items 前面），下次 flush 再試；
+    一個名稱失敗不影響其他名稱寫出，全部試完後才丟出第一個錯誤，錯誤訊息留在 error。
+    """
+
+    def __init__(self, delay=0.3):
+        self.delay = delay
+        self.error = None
+        self._pending = {}                    # 名稱 -> [flush_fn, items]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.RLock()  # 保證同一集合的寫出順序
+        self._timer = None
+
+    def add(self, name, flush_fn, items):
+        with self._lock:
+            entry = self._pending.setdefault(name, [flush_fn, []])
+            entry[0] = flush_fn
+            entry[1].extend(items)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_from_timer(self):
+        # 計時器執行緒沒有呼叫端可以接例外：錯誤留在 error，items 已放回佇列
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def flush(self, name=None):
+        """寫出 name（None 表示全部）的待寫資料"""
+        with self._flush_lock:
+            with self._lock:
+                if name is None:
+                    batch, self._pending = self._pending, {}
+                else:
+                    batch = {name: self._pending.pop(name)} if name in self._pending else {}
+                if not self._pending and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            errors = []
+            for key, (flush_fn, items) in batch.items():
+                try:
+                    flush_fn(items)
+                except Exception as e:
+                    errors.append((key, e))
+                    with self._lock:
+                        entry = self._pending.get(key)
+                        if entry is None:
+                            self._pending[key] = [flush_fn, items]
+                        else:
+                            entry[1][:0] = items
+            if errors:
+                self.error = "；".join(f"{key}：{e}" for key, e in errors)
+                raise errors[0][1]
+            if batch:
+                self.error = None
+
+
+# ===================================================================
+# 待辦 / 收藏 / 自訂金句 / AI 分析（SQLite，逐列讀寫）
+# ===================================================================
+class AppDatabase:
+    """取代 bible_data.json 的整檔讀改寫：每次寫入只動到變更的那一列
+
+    WAL 模式，讀取不會被寫入擋住；連線由整個 process 共用，寫入以 lock 序列化。
+    有 write_behind 時寫入先排隊，同一次互動的所有變更在一個 transaction 內寫出。
+    versions 記錄各資料表被寫入的次數，session 據此判斷手上的清單是否過期。
+    AI 分析紀錄依 analysis_keep（最多筆數）與 analysis_max_days（保留天數）自動清除，None 表示不限。
+    sentences 的版本歷史（反向差異）依 history_bytes_per_ref / history_bytes_total 從最舊的開始清除。
+    """
+
+    CUSTOM_VERSE_SLOTS = 7
+
+    def __init__(self, path, write_behind=None, analysis_keep=None, analysis_max_days=None,
+                 history_bytes_per_ref=None, history_bytes_total=None):
+        self._lock = threading.Lock()
+        self.write_behind = write_behind
+        self.analysis_keep = analysis_keep
+        self.analysis_max_days = analysis_max_days
+        self.history_bytes_per_ref = history_bytes_per_ref
+        self.history_bytes_total = history_bytes_total
+        self.versions = {"todos": 0, "favorites": 0, "custom_verses": 0, "analyses": 0, "history": 0}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS todos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL, title TEXT NOT NULL, time TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS todos_date ON todos (date);
+                CREATE TABLE IF NOT EXISTS favorites (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL UNIQUE
+                );
+                CREATE TABLE IF NOT EXISTS custom_verses (slot INTEGER PRIMARY KEY, text TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS analyses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    reference TEXT, timestamp TEXT, body TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS analyses_reference ON analyses (reference, timestamp);
+                CREATE INDEX IF NOT EXISTS analyses_timestamp ON analyses (timestamp);
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ref TEXT NOT NULL, timestamp TEXT NOT NULL, op TEXT NOT NULL,
+                    digest TEXT NOT NULL, body TEXT, size INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS history_ref ON history (ref, id);
+            """)
+        # id 由這裡配發，排隊中的待辦也能立即拿到 id
+        self._next_todo_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM todos").fetchone()[0]
+        self._next_history_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM history").fetchone()[0]
+
+    def _write(self, table, ops):
+        """ops：[(sql, 參數)]；有 write_behind 時排隊，否則立即寫入"""
+        with self._lock:
+            self.versions[table] += 1
+        if self.write_behind is not None:
+            self.write_behind.add("app_db", self._apply, ops)
+        else:
+            self._apply(ops)
+
+    def _apply(self, ops):
+        with self._lock, self.conn:
+            for sql, params in ops:
+                self.conn.execute(sql, params)
+
+    def _read(self, sql, params=()):
+        """讀取前先寫出排隊中的變更"""
+        if self.write_behind is not None:
+            self.write_behind.flush("app_db")
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # ---------- 設定與一次性作業標記 ----------
+    def get_meta(self, key):
+        rows = self._read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key, value):
+        self._apply([("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))])
+
+    # ---------- 舊資料搬移 ----------
+    def migrate_json(self, json_path):
+        """第一次啟動時匯入 bible_data.json（只做一次，原檔保留不動）"""
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return False
+            data = {}
+            if os.path.exists(json_path):
+                try:
+                    data = serializer.read_file(json_path)
+                except (OSError, ValueError):
+                    return False    # 檔案壞掉時不標記，留待修復後再匯入
+            with self.conn:
+                for date, items in (data.get("todos") or {}).items():
+                    self.conn.executemany(
+                        "INSERT INTO todos (date, title, time) VALUES (?, ?, ?)",
+                        [(date, item.get("title", ""), str(item.get("time", ""))) for item in items])
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO favorites (text) VALUES (?)",
+                    [(text,) for text in data.get("favorites") or []])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO custom_verses VALUES (?, ?)",
+                    list(enumerate(data.get("custom_verses") or [])))
+                self.conn.executemany(
+                    "INSERT INTO analyses (reference, timestamp, body) VALUES (?, ?, ?)",
+                    [(entry.get("reference", ""), entry.get("timestamp", ""), serializer.dumps(entry).decode("utf-8"))
+                     for entry in data.get("ai_analysis") or []])
+                self.conn.execute("INSERT INTO meta VALUES ('json_migrated', ?)", (json_path,))
+            return True
+
+    # ---------- 待辦事項 ----------
+    def load_todos(self):
+        """{日期: [{"id", "title", "time"}, ...]}，同日依建立順序"""
+        todos = {}
+        for todo_id, date, title, time_str in self._read("SELECT id, date, title, time FROM todos ORDER BY date, id"):
+            todos.setdefault(date, []).append({"id": todo_id, "title": title, "time": time_str})
+        return todos
+
+    def add_todo(self, date, title, time_str):
+        with self._lock:
+            todo_id = self._next_todo_id
+            self._next_todo_id += 1
+        self._write("todos", [("INSERT INTO todos (id, date, title, time) VALUES (?, ?, ?, ?)", (todo_id, date, title, time_str))])
+        return todo_id
+
+    def delete_todo(self, todo_id):
+        self._write("todos", [("DELETE FROM todos WHERE id = ?", (todo_id,))])
+
+    # ---------- 收藏 ----------
+    def load_favorites(self):
+        return [r[0] for r in self._read("SELECT text FROM favorites ORDER BY id")]
+
+    def add_favorite(self, text):
+        self._write("favorites", [("INSERT OR IGNORE INTO favorites (text) VALUES (?)", (text,))])
+
+    def remove_favorite(self, text):
+        self._write("favorites", [("DELETE FROM favorites WHERE text = ?", (text,))])
+
+    # ---------- 自訂金句 ----------
+    def load_custom_verses(self):
+        verses = [""] * self.CUSTOM_VERSE_SLOTS
+        for slot, text in self._read("SELECT slot, text FROM custom_verses"):
+            if 0 <= slot < len(verses):
+                verses[slot] = text
+        return verses
+
+    def save_custom_verses(self, verses, base=None):
+        """只寫入相對 base（session 讀到的內容）有改動的欄位，其他 session 改的欄位不會被蓋掉"""
+        changed = [(slot, text) for slot, text in enumerate(verses)
+                   if base is None or slot >= len(base) or base[slot] != text]
+        if changed:
+            self._write("custom_verses", [
+                ("INSERT INTO custom_verses VALUES (?, ?) "
+                 "ON CONFLICT (slot) DO UPDATE SET text = excluded.text WHERE text != excluded.text", params)
+                for params in changed])
+
+    # ---------- AI 分析 ----------
+    def _retention_ops(self):
+        """清除超過保留期限或筆數的分析紀錄，與新增放在同一個 transaction"""
+        ops = []
+        if self.analysis_max_days is not None:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=self.analysis_max_days)).isoformat()
+            ops.append(("DELETE FROM analyses WHERE timestamp < ?", (cutoff,)))
+        if self.analysis_keep is not None:
+            ops.append(("DELETE FROM analyses WHERE id NOT IN "
+                        "(SELECT id FROM analyses ORDER BY timestamp DESC, id DESC LIMIT ?)", (self.analysis_keep,)))
+        return ops
+
+    def add_analysis(self, entry):
+        self._write("analyses", [("INSERT INTO analyses (reference, timestamp, body) VALUES (?, ?, ?)",
+                                  (entry.get("reference", ""), entry.get("timestamp", ""), serializer.dumps(entry).decode("utf-8")))]
+                    + self._retention_ops())
+
+    def count_analyses(self, reference=None):
+        if reference is None:
+            return self._read("SELECT COUNT(*) FROM analyses")[0][0]
+        return self._read("SELECT COUNT(*) FROM analyses WHERE reference = ?", (reference,))[0][0]
+
+    def load_analyses(self, reference=None, limit=20, offset=0):
+        """分頁讀取分析紀錄（新的在前）；reference 指定時只取該經文，走 (reference, timestamp) 索引"""
+        if reference is None:
+            rows = self._read("SELECT id, body FROM analyses ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                              (limit, offset))
+        else:
+            rows = self._read("SELECT id, body FROM analyses WHERE reference = ? "
+                              "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?", (reference, limit, offset))
+        return [dict(serializer.loads(body), id=analysis_id) for analysis_id, body in rows]
+
+    def delete_analysis(self, analysis_id):
+        self._write("analyses", [("DELETE FROM analyses WHERE id = ?", (analysis_id,))])
+
+
+    # ---------- sentences 版本歷史 ----------
+    def _history_retention_ops(self, ref):
+        """從最舊的開始刪，直到該 ref／全部歷史的大小都在上限內"""
+        ops = []
+        if self.history_bytes_per_ref is not None:
+            ops.append(("DELETE FROM history WHERE id IN (SELECT id FROM ("
+                        "SELECT id, SUM(size) OVER (ORDER BY id DESC) AS kept FROM history WHERE ref = ?) "
+                        "WHERE kept > ?)", (ref, self.history_bytes_per_ref)))
+        if self.history_bytes_total is not None:
+            ops.append(("DELETE FROM history WHERE id IN (SELECT id FROM ("
+                        "SELECT id, SUM(size) OVER (ORDER BY id DESC) AS kept FROM history) "
+                        "WHERE kept > ?)", (self.history_bytes_total,)))
+        return ops
+
+    def add_history(self, ref, timestamp, op, digest, body, replace_id=None):
+        """記錄一筆版本變更並回傳 id；replace_id 指定時取代該筆（連續儲存合併成一筆）
+
+        op：create（之前不存在）/ update（body 為反向差異）/ delete（body 為刪除前的完整紀錄）
+        digest：變更後紀錄的雜湊，還原時用來確認差異接得上
+        """
+        body = serializer.dumps(body).decode("utf-8") if body is not None else None
+        size = len(body or "") + len(ref) + 48
+        history_id = replace_id
+        if history_id is None:
+            with self._lock:
+                history_id = self._next_history_id
+                self._next_history_id += 1
+        self._write("history", [(
+            "INSERT OR REPLACE INTO history (id, ref, timestamp, op, digest, body, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (history_id, ref, timestamp, op, digest, body, size))] + self._history_retention_ops(ref))
+        return history_id
+
+    @staticmethod
+    def _history_entry(row):
+        history_id, timestamp, op, digest, body = row
+        return {"id": history_id, "timestamp": timestamp, "op": op, "digest": digest,
+                "body": serializer.loads(body) if body is not None else None}
+
+    def load_history(self, ref, limit=None):
+        """該 ref 的版本歷史，新的在前：[{"id", "timestamp", "op", "digest", "body"}]"""
+        rows = self._read("SELECT id, timestamp, op, digest, body FROM history WHERE ref = ? ORDER BY id DESC LIMIT ?",
+                          (ref, -1 if limit is None else limit))
+        return [self._history_entry(row) for row in rows]
+
+    def deleted_refs(self):
+        """最後一筆歷史是刪除的 ref：[(ref, 刪除時間)]，新的在前"""
+        return self._read(
+            "SELECT h.ref, h.timestamp FROM history h "
+            "JOIN (SELECT ref, MAX(id) AS id FROM history GROUP BY ref) last ON h.id = last.id "
+            "WHERE h.op = 'delete' ORDER BY h.id DESC")
+
+
+# ===================================================================
+# sentences 本地持久化：快照 + 只追加的變更日誌
+# ===================================================================
+def atomic_write_text(path, text, durable=True):
+    """先寫暫存檔再 os.replace，寫到一半當機也不會留下半個檔案
+
+    durable=False 時不 fsync（內容另有日誌可重建，之後再統一 fsync）
+    """
+    atomic_write_bytes(path, text.encode("utf-8"), durable)
+
+
+def atomic_write_bytes(path, data, durable=True):
+    """atomic_write_text 的 bytes 版（serializer 編碼後的快照）"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def fsync_path(path):
+    """fsync 已寫好的檔案或目錄（不支援開啟目錄的平台略過）"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# 常駐記憶體的欄位；其餘（v1_content、prompt、original…）在分片檔，用到才讀
+META_FIELDS = ("ref", "type", "mode", "date_added", "saved_sheets")
+
+
+def record_meta(record):
+    return {key: record[key] for key in META_FIELDS if key in record}
+
+
+class LazySentences(MutableMapping):
+    """ref → 紀錄；manifest（META_FIELDS）常駐，完整內容第一次存取時才讀分片
+
+    copy() 只複製 manifest 與本地改動，不讀任何分片；
+    從磁碟讀入的內容放在 storage 的共用快取（有上限，久未使用的會被移出後重讀）。
+    本地改動（overlay）只保留到分片寫入為止（release），之後一樣經由快取讀取，
+    記憶體不隨編輯次數成長。每次設定紀錄都換上新的 manifest 物件，
+    所以紀錄是否被換過比對 manifest 物件（record_replaced），不能比對快取或本地改動。
+    """
+
+    def __init__(self, manifest, storage, overlay=None):
+        self._meta = manifest
+        self._storage = storage
+        self._overlay = overlay if overlay is not None else {}   # 本地設定過的紀錄
+
+    def __getitem__(self, ref):
+        record = self._overlay.get(ref)
+        if record is not None:
+            return record
+        if ref not in self._meta:
+            raise KeyError(ref)
+        return self._storage.read(ref, self._meta[ref])
+
+    def __setitem__(self, ref, record):
+        self._overlay[ref] = record
+        self._meta[ref] = record_meta(record)
+
+    def __delitem__(self, ref):
+        del self._meta[ref]
+        self._overlay.pop(ref, None)
+
+    def __contains__(self, ref):
+        return ref in self._meta
+
+    def __iter__(self):
+        return iter(self._meta)
+
+    def __len__(self):
+        return len(self._meta)
+
+    def meta(self, ref):
+        """不讀分片，只取 manifest 欄位"""
+        record = self._overlay.get(ref)
+        return record_meta(record) if record is not None else self._meta[ref]
+
+    def peek(self, ref):
+        """已在記憶體的紀錄；尚未載入時回傳 None（不觸發讀檔）"""
+        record = self._overlay.get(ref)
+        if record is None and ref in self._meta:
+            record = self._storage.cached(ref)
+        return record
+
+    def copy(self):
+        return LazySentences(dict(self._meta), self._storage, dict(self._overlay))
+
+    def release(self, ref, record):
+        """分片已寫入 record：移除本地改動，之後經由 storage 讀取（已換成更新的內容時保留）"""
+        if record is not None and self._overlay.get(ref) is record:
+            del self._overlay[ref]
+
+    def adopt(self, other, ref):
+        """ref 改用 other（同一份 storage）的內容，不讀分片"""
+        self._meta[ref] = other._meta[ref]
+        record = other._overlay.get(ref)
+        if record is None:
+            self._overlay.pop(ref, None)
+        else:
+            self._overlay[ref] = record
+
+    def scan(self):
+        """逐筆產生 (ref, 紀錄)；未載入的分片讀完即丟，不放進共用快取"""
+        for ref in list(self._meta):
+            record = self.peek(ref)
+            if record is None:
+                record = self._storage.read(ref, self._meta[ref], cache=False)
+            yield ref, record
+
+
+def sentence_meta(sentences, ref):
+    """取 ref 的 manifest 欄位（一般 dict 直接取紀錄）"""
+    if isinstance(sentences, LazySentences):
+        return sentences.meta(ref)
+    return record_meta(sentences[ref])
+
+
+def peek_record(sentences, ref):
+    """不觸發分片讀取的 get"""
+    if isinstance(sentences, LazySentences):
+        return sentences.peek(ref)
+    return sentences.get(ref)
+
+
+def record_replaced(old, new, ref):
+    """new 的 ref 相對 old 是否為新增或換過的紀錄
+
+    同一份 storage 的 LazySentences 比對 manifest 物件：分片快取可能在兩次 peek 之間被移出重讀，
+    本地改動寫入分片後也會移除，都不能拿來判斷。
+    """
+    if ref not in old:
+        return True
+    if isinstance(old, LazySentences) and isinstance(new, LazySentences) and old._storage is new._storage:
+        return old._meta.get(ref) is not new._meta.get(ref)
+    return peek_record(new, ref) is not peek_record(old, ref)
+
+
+def scan_records(sentences):
+    """整批掃描用：逐筆 (ref, 紀錄)，不把所有分片留在記憶體"""
+    if isinstance(sentences, LazySentences):
+        return sentences.scan()
+    return iter(list(sentences.items()))
+
+
+class ShardStorage:
+    """每筆紀錄一個分片檔：root/<sha1(ref)>.json；讀過的內容留在共用快取
+
+    快取最多 cache_size 筆（LRU），超過時移出最久沒讀的紀錄，整批掃描不會讓記憶體隨筆數成長。
+    寫入時不 fsync（日誌帶有完整紀錄，可重建），壓縮日誌前由 sync() 統一 fsync。
+    舊版（表格欄位為 TSV 字串）的分片在讀取時轉成資料列，下次儲存時寫回新格式。
+    """
+
+    def __init__(self, root, cache_size=2000):
+        self.root = root
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._unsynced = set()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ref):
+        return os.path.join(self.root, hashlib.sha1(ref.encode("utf-8")).hexdigest()[:20] + ".json")
+
+    def cached(self, ref):
+        with self._cache_lock:
+            return self._cache.get(ref)
+
+    def read(self, ref, meta=None, cache=True):
+        with self._cache_lock:
+            record = self._cache.get(ref)
+            if record is not None:
+                self._cache.move_to_end(ref)
+                return record
+        try:
+            record = normalize_record(serializer.read_file(self.path(ref)))
+        except (OSError, ValueError):
+            record = dict(meta or {"ref": ref})     # 分片遺失：至少保留 manifest 欄位
+        if cache:
+            with self._cache_lock:
+                record = self._cache.setdefault(ref, record)
+                self._cache.move_to_end(ref)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return record
+
+    def write(self, ref, record, cache=False):
+        """cache=True 時以 record 取代快取內容（剛儲存的紀錄通常馬上會再讀），否則只作廢舊內容"""
+        atomic_write_bytes(self.path(ref), serializer.dumps(record), durable=False)
+        self._unsynced.add(ref)
+        with self._cache_lock:
+            self._cache.pop(ref, None)
+            if cache:
+                self._cache[ref] = record
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def sync(self):
+        """fsync 所有尚未落盤的分片"""
+        unsynced, self._unsynced = self._unsynced, set()
+        for ref in unsynced:
+            fsync_path(self.path(ref))
+        fsync_path(self.root)
+
+    def delete(self, ref):
+        with self._cache_lock:
+            self._cache.pop(ref, None)
+        try:
+            os.remove(self.path(ref))
+        except FileNotFoundError:
+            pass
+
+
+class SentenceJournal:
+    """sentences 的本地儲存：manifest 快照 + 只追加的 manifest 日誌 + 每筆一個分片
+
+    root/manifest.json：{ref: META_FIELDS}；root/manifest.journal：每行一筆變更（含完整紀錄）；
+    root/shards/：完整紀錄。皆以 serializer 的緊湊編碼寫入（manifest 可選 compression 壓縮），
+    讀取時自動判斷格式。每次儲存寫變動紀錄的分片並追加日誌，只有日誌 fsync；
+    日誌累積到 compact_every 筆後在背景 fsync 分片、把 manifest 寫成新快照並清空日誌。
+    啟動時只讀 manifest 並重播日誌，紀錄內容用到才讀（LazySentences）。
+    legacy_snapshot / legacy_journal 是舊版單檔格式，第一次啟動時轉成分片。
+    listeners：每次寫入後以 (data, 變動的 ref) 呼叫（如搜尋索引），例外不影響儲存。
+    """
+
+    def __init__(self, root, legacy_snapshot=None, legacy_journal=None, compact_every=200, compression=None):
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.journal_path = os.path.join(root, "manifest.journal")
+        self.legacy_snapshot = legacy_snapshot
+        self.legacy_journal = legacy_journal
+        self.compact_every = compact_every
+        self.compression = compression      # manifest 快照的壓縮方式（serializer.COMPRESSIONS）
+        self.storage = ShardStorage(os.path.join(root, "shards"))
+        self.data = LazySentences({}, self.storage)
+        self.pending = 0          # 日誌中尚未併入快照的筆數
+        self._lock = threading.Lock()
+        self._compacting = False
+        self.listeners = []
+        self.listener_error = None
+
+    @staticmethod
+    def _replay(snapshot_path, journal_path, key, records=None, data=None):
+        """讀快照並重播日誌；截掉當機留下的殘缺尾行。回傳 (字典, 日誌筆數)
+
+        records 不為 None 時收集日誌中仍有效的完整紀錄 {ref: record}
+        data 不為 None 時以它取代快照，日誌直接套用在上面
+        """
+        if data is not None:
+            snapshot_path = None
+        else:
+            data = {}
+        if snapshot_path and os.path.exists(snapshot_path):
+            try:
+                with open(snapshot_path, "rb") as f:
+                    raw = f.read()
+                loaded = serializer.decode(raw) if raw.strip() else {}
+                if isinstance(loaded, dict):
+                    data = loaded
+            except serializer.CodecUnavailableError:
+                raise       # 快照完好只是缺解壓套件：當成空快照會在下次壓縮時蓋掉所有紀錄
+            except ValueError:
+                pass
+        pending = 0
+        if journal_path and os.path.exists(journal_path):
+            valid_bytes = 0
+            with open(journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = serializer.loads(line)
+                    except ValueError:
+                        break       # 最後一行寫到一半（當機），之後不會再有有效資料
+                    if not line.endswith(b"\n"):
+                        break
+                    if entry.get("op") == "put":
+                        data[entry["ref"]] = entry[key]
+                        if records is not None and "record" in entry:
+                            records[entry["ref"]] = entry["record"]
+                    elif entry.get("op") == "del":
+                        data.pop(entry["ref"], None)
+                        if records is not None:
+                            records.pop(entry["ref"], None)
+                    pending += 1
+                    valid_bytes += len(line)
+            if valid_bytes < os.path.getsize(journal_path):
+                # 截掉殘缺的尾行，之後追加的內容才會從新的一行開始
+                os.truncate(journal_path, valid_bytes)
+        return data, pending
+
+    def _migrate_legacy(self):
+        """舊版 sentences.json（+ 日誌）→ 分片 + manifest；舊檔保留不動
+
+        快照逐筆串流讀取並轉成資料列格式，記憶體只保留 manifest。
+        """
+        manifest = {}
+        try:
+            for ref, record in iter_json_items(self.legacy_snapshot):
+                if isinstance(record, dict):
+                    record = normalize_record(record)
+                    self.storage.write(ref, record)
+                    manifest[ref] = record_meta(record)
+        except ValueError:
+            pass        # 舊檔尾端損毀：保留已讀到的紀錄
+        streamed = set(manifest)
+        records = {}
+        self._replay(None, self.legacy_journal, "record", records, data=manifest)
+        for ref, record in records.items():
+            record = normalize_record(record)
+            self.storage.write(ref, record)
+            manifest[ref] = record_meta(record)
+        for ref in streamed - set(manifest):
+            self.storage.delete(ref)
+        self.storage.sync()
+        atomic_write_bytes(self.manifest_path, serializer.encode(manifest, self.compression))
+        return manifest
+
+    def load(self):
+        """讀取 manifest 並重播日誌，回傳 LazySentences"""
+        with self._lock:
+            if not os.path.exists(self.manifest_path) and not os.path.exists(self.journal_path) \
+                    and self.legacy_snapshot and os.path.exists(self.legacy_snapshot):
+                self._migrate_legacy()
+            records = {}
+            manifest, pending = self._replay(self.manifest_path, self.journal_path, "meta", records)
+            # 分片未 fsync 前當機可能遺失：以日誌中的完整紀錄重寫
+            for ref, record in records.items():
+                self.storage.write(ref, normalize_record(record))
+            self.data = LazySentences(manifest, self.storage)
+            self.pending = pending
+            return self.data
+
+    def write(self, data, refs=None):
+        """記錄 data 相對上次寫入的變更
+
+        refs：本次改動（新增、修改、刪除）的 ref；None 表示以物件識別比對找出
+        被替換、新增或刪除的紀錄（背景同步的結果都是新物件），未載入的紀錄視為未變。
+        """
+        with self._lock:
+            if refs is None:
+                previous = self.data
+                refs = [ref for ref in data if record_replaced(previous, data, ref)]
+                refs += [ref for ref in previous if ref not in data]
+            lines = []
+            refs = list(dict.fromkeys(refs))
+            for ref in refs:
+                if ref in data:
+                    record = data[ref]
+                    self.storage.write(ref, record, cache=True)
+                    lines.append(serializer.dumps(
+                        {"op": "put", "ref": ref, "meta": record_meta(record), "record": record}))
+                else:
+                    self.storage.delete(ref)
+                    lines.append(serializer.dumps({"op": "del", "ref": ref}))
+            if lines:
+                with open(self.journal_path, "ab") as f:
+                    f.write(b"\n".join(lines) + b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.data = data
+            self.pending += len(lines)
+            start = self.pending >= self.compact_every and not self._compacting
+            if start:
+                self._compacting = True
+        if start:
+            threading.Thread(target=self.compact, daemon=True).start()
+        for listener in self.listeners if lines else ():
+            try:
+                listener(data, refs)
+            except Exception as e:
+                self.listener_error = str(e)
+        return len(lines)
+
+    def compact(self):
+        """fsync 分片，把目前 manifest 寫成新快照（暫存檔 + 改名）後清空日誌"""
+        try:
+            with self._lock:
+                self.storage.sync()
+                manifest = {ref: sentence_meta(self.data, ref) for ref in self.data}
+                atomic_write_bytes(self.manifest_path, serializer.encode(manifest, self.compression))
+                atomic_write_bytes(self.journal_path, b"")
+                self.pending = 0
+        finally:
+            self._compacting = False
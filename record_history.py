@@ -0,0 +1,87 @@
+# record_history.py  ──  sentences 紀錄的版本差異（不依賴 Streamlit）
+#
+# 歷史以「反向差異」保存：目前紀錄永遠是完整版本，每筆歷史記錄如何從較新的版本退回前一版，
+# 所以刪掉最舊的歷史不會影響其他版本的還原，也不需要定期存完整快照。
+# 差異以欄位為單位；長文字（按行）與表格資料列（按列）只存變動的區段。
+import difflib
+import hashlib
+import json
+
+# 長度超過此值的文字／清單才做區段差異，較短的直接存舊值
+SEQUENCE_DIFF_MIN = 8
+
+
+def record_digest(record):
+    """紀錄內容雜湊（欄位順序無關），用來確認差異套用在正確的版本上"""
+    if record is None:
+        return ""
+    text = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _as_sequence(value):
+    """文字按行（保留換行）切開；資料列清單直接使用"""
+    if isinstance(value, str):
+        return value.splitlines(keepends=True)
+    return value
+
+
+def _sequence_ops(new, old):
+    """new → old 的區段替換 [[起, 迄, 取代內容], ...]（起迄為 new 的位置）"""
+    a = [tuple(item) if isinstance(item, list) else item for item in new]
+    b = [tuple(item) if isinstance(item, list) else item for item in old]
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag != "equal":
+            ops.append([i1, i2, old[j1:j2]])
+    return ops
+
+
+def make_delta(new, old):
+    """從 new 退回 old 所需的差異：{"set": {欄位: 舊值}, "del": [欄位], "seq": {欄位: 區段替換}}"""
+    delta = {}
+    for field, old_value in old.items():
+        new_value = new.get(field)
+        if field in new and new_value == old_value:
+            continue
+        if type(new_value) is type(old_value) and isinstance(old_value, (str, list)) \
+                and min(len(new_value), len(old_value)) >= SEQUENCE_DIFF_MIN:
+            ops = _sequence_ops(_as_sequence(new_value), _as_sequence(old_value))
+            if len(json.dumps(ops, ensure_ascii=False)) < len(json.dumps(old_value, ensure_ascii=False)):
+                delta.setdefault("seq", {})[field] = ops
+                continue
+        delta.setdefault("set", {})[field] = old_value
+    removed = [field for field in new if field not in old]
+    if removed:
+        delta["del"] = removed
+    return delta
+
+
+def apply_delta(record, delta):
+    """把 make_delta(record, old) 套用到 record，得到 old（不修改傳入的紀錄）"""
+    old = dict(record)
+    for field in delta.get("del", []):
+        old.pop(field, None)
+    for field, value in delta.get("set", {}).items():
+        old[field] = value
+    for field, ops in delta.get("seq", {}).items():
+        value = record[field]
+        items = list(_as_sequence(value))
+        for i1, i2, replacement in reversed(ops):
+            items[i1:i2] = replacement
+        old[field] = "".join(items) if isinstance(value, str) else items
+    return old
+
+
+def changed_fields(a, b):
+    """兩個版本間內容不同的欄位（依 b 的欄位順序，a 獨有的欄位放最後）"""
+    a, b = a or {}, b or {}
+    fields = list(b) + [field for field in a if field not in b]
+    return [field for field in fields if a.get(field) != b.get(field)]
+
+
+def unified_diff(old_text, new_text, old_label="舊版", new_label="目前"):
+    """給差異檢視用的 unified diff 文字"""
+    return "".join(difflib.unified_diff(
+        old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+        fromfile=old_label, tofile=new_label, lineterm="\n"))
@@ -0,0 +1,117 @@
+# record_index.py  ──  sentences 衍生索引的共用骨架（不依賴 Streamlit）
+#
+# 參照索引、經文表、單字索引、搜尋索引都是「每筆紀錄 → 一份索引內容」：
+# 寫入時由 SentenceJournal 的 listener 逐筆更新（apply），啟動時在背景整批重建。
+# RecordIndex 負責 lock、重建期間的 _touched 與進度；子類別只實作單筆的計算與存放。
+# rebuild_all() 讓多個索引共用同一次掃描，每筆紀錄的分片只讀一次。
+import contextlib
+import threading
+
+REBUILD_BATCH = 500
+
+
+class RecordIndex:
+    """可增量更新、可背景重建的索引
+
+    子類別實作：
+      _index(ref, record)：計算一筆紀錄的索引內容（lock 外執行，可以慢）
+      _set(ref, value)：存入（取代該 ref 原有的內容）；_drop(ref)：移除
+    需要整批換上的索引可覆寫 _rebuild_start / _rebuild_add / _rebuild_end（都在 lock 內呼叫）。
+    重建期間被 apply() 更新過的 ref 記在 _touched，重建不會用掃描到的舊內容蓋掉。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._touched = None
+        self.building = False
+        self.progress = (0, 0)      # 重建中：(已完成, 總數)
+
+    # ---------- 子類別實作 ----------
+    def _index(self, ref, record):
+        raise NotImplementedError
+
+    def _set(self, ref, value):
+        raise NotImplementedError
+
+    def _drop(self, ref):
+        raise NotImplementedError
+
+    def _transaction(self):
+        """寫入時包在 lock 內的 context（例如 SQLite transaction）"""
+        return contextlib.nullcontext()
+
+    def _rebuild_start(self):
+        pass
+
+    def _rebuild_add(self, items):
+        for ref, value in items:
+            self._set(ref, value)
+
+    def _rebuild_end(self):
+        pass
+
+    # ---------- 增量更新 ----------
+    def apply(self, data, refs):
+        """refs 中仍在 data 的重新索引，不在的移除（SentenceJournal 的 listener）"""
+        values = [(ref, self._index(ref, data[ref]) if ref in data else None) for ref in refs]
+        with self._lock, self._transaction():
+            for ref, value in values:
+                if ref in data:
+                    self._set(ref, value)
+                else:
+                    self._drop(ref)
+                if self._touched is not None:
+                    self._touched.add(ref)
+
+    # ---------- 整批重建 ----------
+    def start_rebuild(self, total=0):
+        with self._lock, self._transaction():
+            self.building = True
+            self.progress = (0, total)
+            self._touched = set()
+            self._rebuild_start()
+
+    def add_batch(self, batch):
+        """batch：[(ref, 紀錄)]；索引內容在 lock 外計算，存入時略過重建期間已更新的 ref"""
+        values = [(ref, self._index(ref, record)) for ref, record in batch]
+        with self._lock, self._transaction():
+            self._rebuild_add([(ref, value) for ref, value in values if ref not in self._touched])
+            done = self.progress[0] + len(batch)
+            self.progress = (done, max(self.progress[1], done))
+
+    def finish_rebuild(self, completed=True):
+        """completed 為 False 時（掃描中途失敗）不呼叫 _rebuild_end，只結束重建狀態"""
+        with self._lock, self._transaction():
+            try:
+                if completed:
+                    self._rebuild_end()
+            finally:
+                self.building = False
+                self._touched = None
+
+    def rebuild(self, records, total=0):
+        """records：可迭代的 (ref, 紀錄)"""
+        rebuild_all([self], records, total)
+
+
+def rebuild_all(indexes, records, total=0, visit=None):
+    """一次掃描 records 重建多個索引；visit(ref, 紀錄) 讓其他整批工作搭同一次掃描"""
+    for index in indexes:
+        index.start_rebuild(total)
+    completed = False
+    try:
+        batch = []
+        for ref, record in records:
+            if visit is not None:
+                visit(ref, record)
+            batch.append((ref, record))
+            if len(batch) >= REBUILD_BATCH:
+                for index in indexes:
+                    index.add_batch(batch)
+                batch = []
+        for index in indexes:
+            index.add_batch(batch)
+        completed = True
+    finally:
+        for index in indexes:
+            index.finish_rebuild(completed)
@@ -0,0 +1,136 @@
+# record_query.py  ──  sentences 紀錄的中繼資料查詢（pandas，不依賴 Streamlit）
+#
+# manifest 欄位（type / mode / date_added / saved_sheets）放進一個以 ref 為索引的 DataFrame，
+# 篩選、排序、取前 k 筆都用向量運算，各頁籤只取自己要顯示的那一段。
+# 寫入時由 SentenceJournal 的 listener 記下變動的 ref，下次查詢前才整批套用。
+import threading
+
+import pandas as pd
+
+# saved_sheets 以分隔字元頭尾包住後存成字串，篩選時用 str.contains（不必逐列呼叫 Python）
+_SHEET_SEP = "\x1f"
+
+
+def _meta_row(meta):
+    sheets = meta.get("saved_sheets") or []
+    return {
+        "type": meta.get("type", ""),
+        "mode": meta.get("mode", ""),
+        "date_added": meta.get("date_added", ""),
+        "saved_sheets": _SHEET_SEP + _SHEET_SEP.join(sheets) + _SHEET_SEP if sheets else "",
+    }
+
+
+class RecordFrame:
+    """ref → 中繼資料的欄式索引
+
+    meta_fn(data, ref) 取一筆紀錄的 manifest 欄位（不讀分片）。
+    seq 是加入順序（與 sentences 字典的順序相同，修改不改變順序），供「最近儲存」使用。
+    """
+
+    COLUMNS = ("type", "mode", "date_added", "saved_sheets")
+
+    def __init__(self, meta_fn):
+        self._meta_fn = meta_fn
+        self._lock = threading.Lock()
+        self._frame = self._to_frame([], [], [])
+        self._pending = {}          # ref → 新的 row（None 表示刪除），尚未併入 _frame
+        self._next_seq = 0
+
+    @staticmethod
+    def _to_frame(refs, rows, seqs):
+        frame = pd.DataFrame(rows, index=pd.Index(refs, name="ref"), columns=list(RecordFrame.COLUMNS))
+        frame["date"] = pd.to_datetime(frame["date_added"], errors="coerce")
+        frame["seq"] = pd.Series(seqs, index=frame.index, dtype="int64")
+        return frame
+
+    # ---------- 更新 ----------
+    def rebuild(self, data):
+        """由整份 manifest 重建（只讀中繼資料，不讀分片）"""
+        refs = list(data)
+        rows = [_meta_row(self._meta_fn(data, ref)) for ref in refs]
+        frame = self._to_frame(refs, rows, range(len(refs)))
+        with self._lock:
+            self._frame = frame         # 期間記下的變動留在 _pending，查詢時再套用
+            self._next_seq = len(refs)
+
+    def apply(self, data, refs):
+        """記下變動（SentenceJournal 的 listener）；實際併入延到下次查詢"""
+        with self._lock:
+            for ref in refs:
+                self._pending[ref] = _meta_row(self._meta_fn(data, ref)) if ref in data else None
+
+    def frame(self):
+        """目前的 DataFrame（唯讀使用）；有待套用的變動時整批併入新的 DataFrame，已交出的不會被改動"""
+        with self._lock:
+            if not self._pending:
+                return self._frame
+            pending, self._pending = self._pending, {}
+            frame = self._frame
+            removed = [ref for ref, row in pending.items() if row is None and ref in frame.index]
+            updated = [ref for ref, row in pending.items() if row is not None and ref in frame.index]
+            added = [ref for ref, row in pending.items() if row is not None and ref not in frame.index]
+            if removed:
+                frame = frame.drop(index=removed)
+            if updated:
+                # 其他執行緒可能正在讀舊的 DataFrame：在副本上改寫（保留 seq）後再換上
+                if frame is self._frame:
+                    frame = frame.copy()
+                changes = self._to_frame(updated, [pending[ref] for ref in updated], frame.loc[updated, "seq"])
+                frame.loc[updated, changes.columns] = changes
+            if added:
+                seqs = range(self._next_seq, self._next_seq + len(added))
+                self._next_seq += len(added)
+                frame = pd.concat([frame, self._to_frame(added, [pending[ref] for ref in added], seqs)])
+            self._frame = frame
+            return frame
+
+    # ---------- 查詢 ----------
+    def select(self, type=None, mode=None, since=None, until=None, sheet=None):
+        """依類型、模式、日期範圍（含端點，datetime 或可解析的字串）與 saved_sheets 篩選"""
+        frame = self.frame()
+        mask = pd.Series(True, index=frame.index)
+        if type is not None:
+            mask &= frame["type"] == type
+        if mode is not None:
+            mask &= frame["mode"] == mode
+        if since is not None:
+            mask &= frame["date"] >= pd.Timestamp(since)
+        if until is not None:
+            mask &= frame["date"] <= pd.Timestamp(until)
+        if sheet is not None:
+            mask &= frame["saved_sheets"].str.contains(_SHEET_SEP + sheet + _SHEET_SEP, regex=False)
+        return frame[mask]
+
+    def refs(self, sort="date", descending=True, limit=None, offset=0, **filters):
+        """篩選後依欄位排序的 ref 清單；sort 為 None 時依加入順序。日期相同或缺漏時依加入順序"""
+        frame = self.select(**filters)
+        by = ["seq"] if sort in (None, "seq") else [sort, "seq"]
+        end = None if limit is None else offset + limit
+        if end is not None and end < len(frame) and frame[by[0]].notna().sum() >= end:
+            # 只要前幾筆時用部分選取（O(n log k)），不排序整個 DataFrame
+            top = frame.nlargest(end, by) if descending else frame.nsmallest(end, by)
+            return top.index[offset:].tolist()
+        frame = frame.sort_values(by, ascending=not descending, na_position="last", kind="stable")
+        return frame.index[offset:end].tolist()
+
+    def newest(self, k, **filters):
+        """date_added 最新的 k 筆"""
+        return self.refs(sort="date", descending=True, limit=k, **filters)
+
+    def recent(self, k):
+        """最後加入的 k 筆（新的在前）"""
+        frame = self.frame()
+        return frame.nlargest(k, "seq").index.tolist()
+
+    def count(self, **filters):
+        return len(self.select(**filters))
+
+    def values(self, column):
+        """某欄出現過的值（排序後），給篩選選單用"""
+        return sorted(value for value in self.frame()[column].unique() if value)
+
+    def labels(self, refs, column):
+        """refs → 該欄的值，給選單的 format_func 用"""
+        values = self.frame()[column].reindex(refs).fillna("")
+        return dict(zip(refs, values.tolist()))
@@ -0,0 +1,216 @@
+# record_schema.py  ──  sentences 紀錄的表格欄位（不依賴 Streamlit）
+#
+# v1_content / v2_content / w_sheet / p_sheet / grammar_list 存成資料列清單 [[cell, ...], ...]，
+# 欄位名稱每種工作表只定義一份（TABLE_COLUMNS），不再在每筆紀錄裡重複標題列。
+# 舊版紀錄的這些欄位是含標題列的 TSV 字串，讀取時由 table_rows() 轉換，
+# 整檔轉換用 migrate_sentences_file()（逐筆串流，不把整個 JSON 讀進記憶體）。
+import csv
+import json
+import os
+import re
+from io import StringIO
+
+# ===================================================================
+# 欄位定義
+# ===================================================================
+# 紀錄欄位 → 欄位名稱（= 工作表標題列去掉第一欄 檔名_批次）
+TABLE_COLUMNS = {
+    "v1_content": ("Ref. 經文出處", "English（ESV經文）", "Chinese經文", "Syn/Ant", "Grammar"),
+    "v2_content": ("Ref.經文出處", "口語訳", "Grammar", "Note", "KRF", "Korean Syn/Ant", "THSV11 泰文重要片語"),
+    "w_sheet": ("No經卷範圍", "Word/Phrase+Chinese", "Synonym+中文對照", "Antonym+中文對照", "全句聖經中英對照例句"),
+    "p_sheet": ("Paragraph", "English Refinement", "中英夾雜講章"),
+    "grammar_list": ("No經卷範圍", "Original Sentence＋中文翻譯", "Grammar Rule", "Analysis & Example"),
+}
+
+# V1 列的欄位位置
+V1_REF, V1_ENGLISH, V1_CHINESE = 0, 1, 2
+
+
+# ===================================================================
+# 文字 ↔ 資料列
+# ===================================================================
+_BOLD_RE = re.compile(r"\*\*(.*?)\*\*")
+_MD_SEPARATOR_RE = re.compile(r"^\|?(\s*:?-{3,}:?\s*\|)+\s*:?-{0,}:?\s*$")
+
+
+def _header_key(cells):
+    """比對標題列用：去空白、不分大小寫"""
+    return [re.sub(r"\s+", "", cell).lower() for cell in cells]
+
+
+def _is_header(field, row):
+    """row 是否為該欄位的標題列（TABLE_COLUMNS，或工作表標題列含 檔名_批次）"""
+    key = _header_key(cell for cell in row if cell.strip())
+    columns = _header_key(TABLE_COLUMNS[field])
+    return key == columns or key == _header_key(["檔名_批次"]) + columns
+
+
+def _markdown_rows(lines):
+    """Markdown 表格 → 資料列：只讀以 | 開頭的行，分隔線（|---|）之前的一行是標題列"""
+    rows, header = [], None
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("|"):
+            continue
+        if _MD_SEPARATOR_RE.match(line):
+            if rows and header is None:
+                header = rows.pop()
+            continue
+        cells = [_BOLD_RE.sub(r"\1", cell.strip()) for cell in line.split("|")[1:-1]]
+        if any(cells):
+            rows.append(cells)
+    return rows
+
+
+def parse_content_to_rows(content, field):
+    """解析 TSV（rows_to_text 的輸出）或 Markdown 表格（貼上的 AI 結果）為二維列表
+
+    第一個非空白行以 | 開頭且沒有 tab 時視為 Markdown 表格，否則以 tab 分欄（csv 引號規則）。
+    只移除已知的標題列（TABLE_COLUMNS），資料內容不做猜測。
+    """
+    if not content or not content.strip():
+        return []
+
+    lines = content.strip().split("\n")
+    if lines[0].lstrip().startswith("|") and "\t" not in lines[0]:
+        rows = _markdown_rows(lines)
+    else:
+        rows = [row for row in csv.reader(StringIO(content.strip("\n")), delimiter="\t") if any(row)]
+
+    if rows and _is_header(field, rows[0]):
+        rows = rows[1:]
+
+    width = len(TABLE_COLUMNS[field])
+    return [row + [""] * (width - len(row)) if len(row) < width else row[:width] for row in rows]
+
+
+def text_to_rows(field, text):
+    """編輯區的文字（TSV 或 Markdown 表格，可含標題列）→ 補齊欄數的資料列"""
+    return parse_content_to_rows(text, field)
+
+
+def rows_to_text(field, rows, header=True):
+    """資料列 → TSV（給編輯區與複製用）；與 text_to_rows 可來回轉換"""
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter='\t', lineterminator='\n')
+    if header:
+        writer.writerow(TABLE_COLUMNS[field])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def table_rows(record, field):
+    """紀錄某個表格欄位的資料列；舊版 TSV 字串在這裡轉換"""
+    value = record.get(field)
+    if not value:
+        return []
+    if isinstance(value, str):
+        return text_to_rows(field, value)
+    return value
+
+
+def verse_rows(record):
+    """V1 各列的 {'ref', 'en', 'cn'}"""
+    verses = []
+    for row in table_rows(record, "v1_content"):
+        if len(row) > V1_CHINESE:
+            verses.append({'ref': row[V1_REF].strip(), 'en': row[V1_ENGLISH].strip(), 'cn': row[V1_CHINESE].strip()})
+    return verses
+
+
+def normalize_record(record):
+    """把舊版 TSV 欄位轉成資料列；已是新格式時回傳原物件"""
+    legacy = [field for field in TABLE_COLUMNS if isinstance(record.get(field), str)]
+    if not legacy:
+        return record
+    record = dict(record)
+    for field in legacy:
+        record[field] = table_rows(record, field)
+    return record
+
+
+# ===================================================================
+# 串流轉換舊檔
+# ===================================================================
+def iter_json_items(path, chunk_size=1 << 16):
+    """逐筆讀出頂層 JSON 物件的 (key, value)，記憶體只保留目前這一筆"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip(chars):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                if end == len(buffer) and not eof:
+                    fill()          # 數字等值可能被切在區塊邊界
+                    continue
+                pos = end
+                return value
+
+        fill()
+        skip(" \t\r\n")
+        if buffer[pos:pos + 1] != "{":
+            raise ValueError(f"{path} is not a JSON object")
+        pos += 1
+        while True:
+            skip(" \t\r\n,")
+            if pos >= len(buffer) or buffer[pos] == "}":
+                return
+            key = decode()
+            skip(" \t\r\n")
+            if buffer[pos:pos + 1] != ":":
+                raise ValueError(f"{path}: expected ':' after {key!r}")
+            pos += 1
+            skip(" \t\r\n")
+            yield key, decode()
+
+
+def migrate_sentences_file(src, dst):
+    """舊版 sentences.json → 資料列格式；逐筆讀寫，寫完才改名取代 dst。回傳筆數"""
+    tmp = f"{dst}.tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write("{")
+        for ref, record in iter_json_items(src):
+            if isinstance(record, dict):
+                record = normalize_record(record)
+            out.write(("," if count else "") + json.dumps(ref, ensure_ascii=False) + ":"
+                      + json.dumps(record, ensure_ascii=False))
+            count += 1
+        out.write("}")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, dst)
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        sys.exit("用法：python record_schema.py 舊版sentences.json 輸出.json")
+    print(f"已轉換 {migrate_sentences_file(sys.argv[1], sys.argv[2])} 筆")
@@ -0,0 +1,442 @@
+# search_index.py  ──  sentences 全文檢索的倒排索引（不依賴 Streamlit）
+#
+# 斷詞：中日韓文字取單字 + 相鄰兩字（bigram）；泰文先切成字元群（子音 + 附屬母音／聲調）
+# 再取單群 + 相鄰兩群；英文等拼音文字以 Porter 詞幹化。查詢用同一套斷詞，
+# 多個查詢詞時全部都要出現（AND），以 BM25 排序。索引存在獨立的 SQLite 檔，可隨時刪掉重建。
+import functools
+import heapq
+import math
+import re
+import sqlite3
+import unicodedata
+from collections import Counter
+
+from record_index import RecordIndex
+
+# 斷詞或索引格式改變時遞增；檔案中的版本不同時丟掉重建
+INDEX_VERSION = "2"
+
+# 不納入索引的紀錄欄位（分類、日期等，不是內容）
+SKIP_FIELDS = {"type", "mode", "date_added", "saved_sheets", "blank_template"}
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿ᄀ-ᇿ㄰-㆏가-힯"
+_THAI = "฀-๿"
+_TOKEN_RE = re.compile(rf"(?P<cjk>[{_CJK}]+)|(?P<thai>[{_THAI}]+)|(?P<word>[0-9a-zÀ-ɏ]+)")
+
+# 泰文：前置母音接在下一個子音前；附屬符號與後置母音接在前一個字元後
+_THAI_LEADING = set("เแโใไ")
+_THAI_TRAILING = set("ะัาำิีึืฺุูๅ็่้๊๋์ํ๎")
+
+
+def normalize(text):
+    """全形轉半形、大寫轉小寫；索引與查詢都先經過這一步"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+# ===================================================================
+# 斷詞
+# ===================================================================
+def thai_clusters(run):
+    """泰文字串 → 字元群（近似音節，不需要字典）"""
+    clusters = []
+    current = ""
+    for ch in run:
+        if ch in _THAI_TRAILING and current and current[-1] not in _THAI_LEADING:
+            current += ch
+        elif current and current[-1] in _THAI_LEADING and ch not in _THAI_LEADING:
+            current += ch
+        else:
+            if current:
+                clusters.append(current)
+            current = ch
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def _ngrams(units, query=False):
+    """單位序列 → 單字 + 相鄰兩字；查詢時只要兩字（一個單位時才用單字）"""
+    if len(units) == 1:
+        return list(units)
+    bigrams = [units[i] + units[i + 1] for i in range(len(units) - 1)]
+    return bigrams if query else list(units) + bigrams
+
+
+def tokenize(text, query=False):
+    """文字 → 索引詞清單（可重複，用來計算詞頻）"""
+    terms = []
+    for m in _TOKEN_RE.finditer(normalize(text)):
+        if m.group("cjk"):
+            terms.extend(_ngrams(m.group("cjk"), query))
+        elif m.group("thai"):
+            terms.extend(_ngrams(thai_clusters(m.group("thai")), query))
+        else:
+            terms.append(stem(m.group("word")))
+    return terms
+
+
+# ---------- Porter 詞幹化 ----------
+def _cons(word, i):
+    ch = word[i]
+    if ch in "aeiou":
+        return False
+    if ch == "y":
+        return i == 0 or not _cons(word, i - 1)
+    return True
+
+
+def _measure(stem_):
+    """Porter 的 m：[C](VC)^m[V] 中 VC 的個數"""
+    m, prev_vowel = 0, False
+    for i in range(len(stem_)):
+        vowel = not _cons(stem_, i)
+        if prev_vowel and not vowel:
+            m += 1
+        prev_vowel = vowel
+    return m
+
+
+def _has_vowel(stem_):
+    return any(not _cons(stem_, i) for i in range(len(stem_)))
+
+
+def _double_cons(word):
+    return len(word) >= 2 and word[-1] == word[-2] and _cons(word, len(word) - 1)
+
+
+def _cvc(word):
+    return len(word) >= 3 and _cons(word, len(word) - 3) and not _cons(word, len(word) - 2) \
+        and _cons(word, len(word) - 1) and word[-1] not in "wxy"
+
+
+_STEP2 = sorted([
+    ("ational", "ate"), ("tional", "tion"), ("enci", "ence"), ("anci", "ance"), ("izer", "ize"),
+    ("abli", "able"), ("alli", "al"), ("entli", "ent"), ("eli", "e"), ("ousli", "ous"),
+    ("ization", "ize"), ("ation", "ate"), ("ator", "ate"), ("alism", "al"), ("iveness", "ive"),
+    ("fulness", "ful"), ("ousness", "ous"), ("aliti", "al"), ("iviti", "ive"), ("biliti", "ble"),
+], key=lambda rule: -len(rule[0]))
+_STEP3 = sorted([
+    ("icate", "ic"), ("ative", ""), ("alize", "al"), ("iciti", "ic"), ("ical", "ic"), ("ful", ""), ("ness", ""),
+], key=lambda rule: -len(rule[0]))
+_STEP4 = sorted([
+    "al", "ance", "ence", "er", "ic", "able", "ible", "ant", "ement", "ment", "ent",
+    "ion", "ou", "ism", "ate", "iti", "ous", "ive", "ize",
+], key=len, reverse=True)
+
+
+def _replace(word, rules, min_measure):
+    for suffix, repl in rules:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)]
+            return base + repl if _measure(base) > min_measure else word
+    return word
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def stem(word):
+    """Porter（1980）詞幹化：permits / permitted / permitting → permit（有快取，重建時每個字只算一次）"""
+    if len(word) <= 2 or not word.isascii() or not word.isalpha():
+        return word
+
+    # 1a
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+
+    # 1b
+    if word.endswith("eed"):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ("ed", "ing"):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif _double_cons(word) and word[-1] not in "lsz":
+                    word = word[:-1]
+                elif _measure(word) == 1 and _cvc(word):
+                    word += "e"
+                break
+
+    # 1c
+    if word.endswith("y") and _has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+
+    word = _replace(word, _STEP2, 0)
+    word = _replace(word, _STEP3, 0)
+
+    # 4
+    for suffix in _STEP4:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)]
+            if _measure(base) > 1 and (suffix != "ion" or base.endswith(("s", "t"))):
+                word = base
+            break
+
+    # 5
+    if word.endswith("e"):
+        base = word[:-1]
+        if _measure(base) > 1 or (_measure(base) == 1 and not _cvc(base)):
+            word = base
+    if _measure(word) > 1 and _double_cons(word) and word.endswith("l"):
+        word = word[:-1]
+    return word
+
+
+# ===================================================================
+# 紀錄內容與摘要
+# ===================================================================
+def _flatten(value, out):
+    if isinstance(value, str):
+        if value:
+            out.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _flatten(item, out)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _flatten(item, out)
+
+
+def record_texts(record):
+    """紀錄中可搜尋的 (欄位, 文字)：所有內容欄位，巢狀的 grammar / 資料列也攤平"""
+    texts = []
+    for field, value in record.items():
+        if field in SKIP_FIELDS:
+            continue
+        parts = []
+        _flatten(value, parts)
+        if parts:
+            texts.append((field, "\n".join(parts)))
+    return texts
+
+
+def snippet(record, query, width=40):
+    """第一個命中處前後 width 字的摘要，命中字以 ** 標示；沒有命中時回傳 (None, "")"""
+    patterns = []
+    for m in _TOKEN_RE.finditer(normalize(query)):
+        if m.group("word"):
+            patterns.append(r"\b" + re.escape(stem(m.group("word"))) + r"\w*")
+        else:
+            patterns.append(re.escape(m.group(0)))
+    if not patterns:
+        return None, ""
+    matcher = re.compile("|".join(sorted(patterns, key=len, reverse=True)))
+    for field, text in record_texts(record):
+        folded = normalize(text)
+        if len(folded) != len(text):
+            text = folded        # NFKC 改變長度時位置對不上，直接顯示正規化後的文字
+        m = matcher.search(folded)
+        if m:
+            start, end = max(m.start() - width, 0), min(m.end() + width, len(text))
+            body = text[start:m.start()] + "**" + text[m.start():m.end()] + "**" + text[m.end():end]
+            body = " ".join(body.split())
+            return field, ("…" if start else "") + body + ("…" if end < len(text) else "")
+    return None, ""
+
+
+# ===================================================================
+# 索引
+# ===================================================================
+class SearchIndex(RecordIndex):
+    """倒排索引：postings(詞, 文件, impact) + docs(文件長度)，BM25 排序
+
+    impact 是 BM25 中與詞頻、文件長度有關的部分（乘上 IMPACT_SCALE 取整數），寫入時算好；
+    平均長度用上次重建時的值（增量更新不重算其他文件），重建時更新。
+    update()/remove() 逐筆增量更新；rebuild() 清空後分批重建，每批一個 transaction。
+    """
+
+    K1 = 1.2
+    B = 0.75
+    IMPACT_SCALE = 1000
+    SCAN_CHUNK = 500        # 查詢時每次讀入的 postings 筆數（也是 IN (...) 的參數個數）
+
+    def __init__(self, path):
+        super().__init__()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            if self._stored_version() != INDEX_VERSION:
+                # 格式不同（或上次重建沒做完）：整個丟掉，needs_rebuild() 會要求重建
+                self.conn.executescript("""
+                    DROP TABLE IF EXISTS meta;
+                    DROP TABLE IF EXISTS docs;
+                    DROP TABLE IF EXISTS postings;
+                """)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, ref TEXT NOT NULL UNIQUE, length INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL, doc INTEGER NOT NULL, impact INTEGER NOT NULL, PRIMARY KEY (term, doc)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);
+            """)
+            self._create_impact_index()
+        # 文件表常駐記憶體（id → (ref, 長度)），查詢時只讀 postings 的索引
+        self._docs = {doc: (ref, length) for doc, ref, length in self.conn.execute("SELECT id, ref, length FROM docs")}
+        self._ids = {ref: doc for doc, (ref, _) in self._docs.items()}
+        self._total_length = sum(length for _, length in self._docs.values())
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'avg_length'").fetchone()
+        self._avg_length = float(row[0]) if row else None      # impact 使用的平均文件長度
+
+    def _create_impact_index(self):
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_impact ON postings (term, impact DESC, doc)")
+
+    # ---------- 狀態 ----------
+    def _stored_version(self):
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.OperationalError:
+            return None         # 新檔案
+        return row[0] if row else None
+
+    def needs_rebuild(self):
+        with self._lock:
+            return self._stored_version() != INDEX_VERSION
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---------- 寫入 ----------
+    def _transaction(self):
+        return self.conn
+
+    def _index(self, ref, record):
+        """一筆文件的詞頻（斷詞在 lock 外做）"""
+        counts = Counter()
+        for _, text in record_texts(record):
+            counts.update(tokenize(text))
+        counts.update(tokenize(ref) * 2)        # ref 命中加權
+        return counts
+
+    def _postings(self, ref, counts):
+        """寫入 docs 並回傳這筆文件的 postings 列（呼叫端持有 lock、在 transaction 內）"""
+        length = sum(counts.values())
+        doc = self._ids.get(ref)
+        if doc is None:
+            doc = self.conn.execute("INSERT INTO docs (ref, length) VALUES (?, ?)", (ref, length)).lastrowid
+        else:
+            self.conn.execute("UPDATE docs SET length = ? WHERE id = ?", (length, doc))
+            self.conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+            self._total_length -= self._docs[doc][1]
+        self._docs[doc] = (ref, length)
+        self._ids[ref] = doc
+        self._total_length += length
+        avg = self._avg_length or self._total_length / len(self._docs)
+        norm = self.K1 * (1 - self.B + self.B * length / avg)
+        scale = self.IMPACT_SCALE * (self.K1 + 1)
+        return [(term, doc, round(scale * tf / (tf + norm))) for term, tf in counts.items()]
+
+    def _set(self, ref, counts):
+        self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", self._postings(ref, counts))
+
+    def _drop(self, ref):
+        doc = self._ids.pop(ref, None)
+        if doc is not None:
+            self.conn.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+            self.conn.execute("DELETE FROM docs WHERE id = ?", (doc,))
+            self._total_length -= self._docs.pop(doc)[1]
+
+    def _rebuild_start(self):
+        self.conn.execute("DELETE FROM meta")
+        self.conn.execute("DELETE FROM postings")
+        self.conn.execute("DELETE FROM docs")
+        # 依 impact 排序的索引在重建完後一次建立，比逐筆維護快（重建期間查詢改用排序）
+        self.conn.execute("DROP INDEX IF EXISTS postings_impact")
+        # 沿用舊索引的平均長度；第一次建立時由第一批文件估計
+        self._docs, self._ids, self._total_length = {}, {}, 0
+
+    def _rebuild_add(self, items):
+        if self._avg_length is None and items:
+            self._avg_length = sum(sum(counts.values()) for _, counts in items) / len(items) or 1.0
+        rows = []
+        for ref, counts in items:
+            rows.extend(self._postings(ref, counts))
+        rows.sort()         # 依主鍵順序插入，B-tree 只在尾端附近寫入
+        self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", rows)
+
+    def _rebuild_end(self):
+        self._create_impact_index()
+        if self._docs:
+            self._avg_length = self._total_length / len(self._docs)
+        self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                              [("avg_length", str(self._avg_length or 1.0)), ("version", INDEX_VERSION)])
+
+    def update(self, ref, record):
+        self.apply({ref: record}, [ref])
+
+    def remove(self, ref):
+        self.apply({}, [ref])
+
+    # ---------- 查詢 ----------
+    def search(self, query, limit=20, offset=0):
+        """回傳 ([(ref, 分數)], 符合筆數)；多個查詢詞時每個都要出現（AND），依 BM25 排序
+
+        依 impact 由大到小讀最少見的詞，其他詞只查讀到的文件；
+        還沒讀到的文件分數上限追不上第 offset + limit 名時就停，常見詞不必讀完整個 postings。
+        """
+        terms = list(dict.fromkeys(tokenize(query, query=True)))
+        k = offset + limit
+        if not terms or k <= 0:
+            return [], 0
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return [], 0
+            df = {term: self.conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                  for term in terms}
+            if not all(df.values()):
+                return [], 0
+            terms.sort(key=df.get)
+            idf = {term: self._idf(count, n_docs) for term, count in df.items()}
+            total = df[terms[0]] if len(terms) == 1 else self._count_all(terms)
+            top = self._top_k(terms, idf, k)
+            return [(self._docs[doc][0], score) for score, doc in top[offset:]], total
+
+    @classmethod
+    def _idf(cls, df, n_docs):
+        """BM25 的 idf，已除以 IMPACT_SCALE：分數 = Σ idf × impact"""
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5)) / cls.IMPACT_SCALE
+
+    def _count_all(self, terms):
+        """所有詞都出現的文件數：以最少見的詞為主，其他詞逐筆查主鍵"""
+        sql = "SELECT COUNT(*) FROM postings p0 WHERE p0.term = ?" + "".join(
+            f" AND EXISTS (SELECT 1 FROM postings p{i} WHERE p{i}.term = ? AND p{i}.doc = p0.doc)"
+            for i in range(1, len(terms)))
+        return self.conn.execute(sql, terms).fetchone()[0]
+
+    def _top_k(self, terms, idf, k):
+        """分數前 k 名 [(分數, 文件)]，同分時文件 id 小的在前（呼叫端持有 lock）"""
+        lead, others = terms[0], terms[1:]
+        rest = sum(idf[term] * self.conn.execute(
+            "SELECT impact FROM postings WHERE term = ? ORDER BY impact DESC LIMIT 1", (term,)).fetchone()[0]
+            for term in others)
+        heap = []       # 最小堆積 (分數, -文件)，保留目前的前 k 名
+        cursor = self.conn.execute("SELECT doc, impact FROM postings WHERE term = ? ORDER BY impact DESC, doc", (lead,))
+        while True:
+            chunk = cursor.fetchmany(self.SCAN_CHUNK)
+            if not chunk:
+                break
+            scores = {doc: idf[lead] * impact for doc, impact in chunk}
+            for term in others:
+                found = dict(self.conn.execute(
+                    f"SELECT doc, impact FROM postings WHERE term = ? AND doc IN ({','.join('?' * len(scores))})",
+                    [term, *scores]).fetchall())
+                scores = {doc: score + idf[term] * found[doc] for doc, score in scores.items() if doc in found}
+                if not scores:
+                    break
+            for doc, score in scores.items():
+                if len(heap) < k:
+                    heapq.heappush(heap, (score, -doc))
+                elif (score, -doc) > heap[0]:
+                    heapq.heapreplace(heap, (score, -doc))
+            # 之後讀到的文件，最少見的詞 impact 不會超過這一批的最後一筆
+            if len(heap) >= k and heap[0][0] >= idf[lead] * chunk[-1][1] + rest:
+                break
+        cursor.close()
+        return [(score, -neg_doc) for score, neg_doc in sorted(heap, key=lambda item: (-item[0], -item[1]))]
@@ -0,0 +1,80 @@
+# serializer.py  ──  本地資料檔的序列化（不依賴 Streamlit）
+#
+# 機器讀寫的快照用緊湊編碼：有 orjson 時用 orjson（UTF-8、無縮排），否則退回標準庫 json；
+# 可選 gzip 或 zstd 壓縮（沒裝 zstandard 時 zstd 退回 gzip）。載入時依檔頭自動判斷格式，舊的純 JSON 檔不需轉換。
+# 給人看的匯出另走 export_json()（縮排、不跳脫中文）。
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:     # 沒裝 orjson 仍可運作，只是比較慢
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:     # zstd 壓縮退回 gzip；讀 zstd 檔時丟出 CodecUnavailableError
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSIONS = (None, "gzip", "zstd")
+
+
+class CodecUnavailableError(ValueError):
+    """檔案的壓縮格式需要未安裝的套件（內容沒有損毀，裝上套件即可讀取）"""
+
+
+def dumps(obj):
+    """緊湊 JSON（bytes，不含換行，可直接當日誌的一行）"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass        # 非字串 key、超過 64 位元的整數等，交給標準庫
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """解析 JSON（bytes 或 str）"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass        # orjson 較嚴格（如超大整數），再試一次標準庫
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def encode(obj, compression=None):
+    """快照編碼：緊湊 JSON，可選 gzip / zstd 壓縮（沒裝 zstandard 時 zstd 改用 gzip）"""
+    data = dumps(obj)
+    if compression == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if compression in ("gzip", "zstd"):
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if compression is not None:
+        raise ValueError(f"unknown compression: {compression}")
+    return data
+
+
+def decode(data):
+    """依檔頭判斷是否壓縮後解析；純 JSON（含舊版縮排格式）直接解析"""
+    if data[:2] == GZIP_MAGIC:
+        data = gzip.decompress(data)
+    elif data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise CodecUnavailableError("file is zstd-compressed but the zstandard package is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return loads(data)
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def export_json(obj):
+    """給人看的匯出格式（縮排、中文不跳脫）"""
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
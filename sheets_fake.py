@@ -0,0 +1,310 @@
+# sheets_fake.py  ──  本地 Google Sheets 替身（離線測試與效能量測用）
+#
+# 提供 app 用到的 gspread Client / Spreadsheet / Worksheet 介面，
+# 資料存在記憶體或 SQLite 檔，可設定每次呼叫延遲、每分鐘配額與錯誤注入。
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import gspread
+    from gspread.exceptions import APIError, WorksheetNotFound
+except ImportError:  # 沒裝 gspread 也能跑 benchmark
+    gspread = None
+
+    class APIError(Exception):
+        def __init__(self, response):
+            super().__init__(response.json()["error"])
+            self.response = response
+
+    class WorksheetNotFound(Exception):
+        pass
+
+
+class _FakeResponse:
+    """模擬 requests.Response，讓 APIError 與 is_auth_error 能讀到狀態碼"""
+
+    def __init__(self, code, message):
+        self.status_code = code
+        self._error = {"code": code, "message": message, "status": {
+            401: "UNAUTHENTICATED", 429: "RESOURCE_EXHAUSTED"}.get(code, "INTERNAL")}
+        self.text = json.dumps({"error": self._error})
+
+    def json(self):
+        return {"error": self._error}
+
+
+def api_error(code, message):
+    """建立與真實 gspread 相同型別的 APIError"""
+    return APIError(_FakeResponse(code, message))
+
+
+# ===================================================================
+# 儲存後端
+# ===================================================================
+class MemoryBackend:
+    """資料存在記憶體：{工作表: [[cell, ...], ...]}"""
+
+    def __init__(self):
+        self.sheets = {}
+
+    def titles(self):
+        return list(self.sheets)
+
+    def add_sheet(self, title):
+        self.sheets.setdefault(title, [])
+
+    def rows(self, title):
+        return self.sheets[title]
+
+    def append(self, title, rows):
+        self.sheets[title].extend([list(r) for r in rows])
+
+
+class SQLiteBackend:
+    """資料存在 SQLite 檔（可跨 process 保留）"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sheets (title TEXT PRIMARY KEY, position INTEGER);
+            CREATE TABLE IF NOT EXISTS cells (title TEXT, idx INTEGER, row TEXT, PRIMARY KEY (title, idx));
+        """)
+
+    def titles(self):
+        with self._lock:
+            return [r[0] for r in self.conn.execute("SELECT title FROM sheets ORDER BY position")]
+
+    def add_sheet(self, title):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO sheets VALUES (?, (SELECT COUNT(*) FROM sheets))", (title,))
+
+    def rows(self, title):
+        with self._lock:
+            cur = self.conn.execute("SELECT row FROM cells WHERE title = ? ORDER BY idx", (title,))
+            return [json.loads(r[0]) for r in cur]
+
+    def append(self, title, rows):
+        with self._lock, self.conn:
+            start = self.conn.execute(
+                "SELECT COUNT(*) FROM cells WHERE title = ?", (title,)).fetchone()[0]
+            self.conn.executemany(
+                "INSERT INTO cells VALUES (?, ?, ?)",
+                [(title, start + i, json.dumps(list(r), ensure_ascii=False)) for i, r in enumerate(rows)])
+
+
+# ===================================================================
+# A1 範圍解析
+# ===================================================================
+_A1_RE = re.compile(r"^(?:'?(?P<title>.+?)'?!)?(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parse_a1(a1):
+    """'V1_Sheet'!A5:F → (工作表, 起始列, 結束列或 None, 起始欄, 結束欄)；列與欄皆從 1 起算"""
+    m = _A1_RE.match(a1)
+    if not m:
+        raise api_error(400, f"Unable to parse range: {a1}")
+    c1 = _col_index(m.group("c1"))
+    c2 = _col_index(m.group("c2")) if m.group("c2") else c1
+    r1 = int(m.group("r1") or 1)
+    r2 = int(m.group("r2")) if m.group("r2") else (r1 if m.group("c2") is None and m.group("r1") else None)
+    return m.group("title"), r1, r2, c1, c2
+
+
+def _trim(row):
+    """values API 不回傳列尾空白儲存格"""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+# ===================================================================
+# gspread 介面替身
+# ===================================================================
+class FakeSheetsClient:
+    """取代 gspread.Client
+
+    latency：每次 HTTP 呼叫的延遲（秒）
+    quota_per_minute：每分鐘可呼叫次數，超過時回 429（None 表示不限制）
+    fail_rate：每次呼叫隨機失敗（500）的機率
+    path：SQLite 檔路徑；None 表示存在記憶體
+    """
+
+    def __init__(self, path=None, latency=0.0, quota_per_minute=None, fail_rate=0.0, seed=None):
+        self.backend = SQLiteBackend(path) if path else MemoryBackend()
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.fail_rate = fail_rate
+        self.calls = {}
+        self._recent = []
+        self._scripted = []
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+
+    # ---------- 統計與錯誤注入 ----------
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset_stats(self):
+        self.calls.clear()
+
+    def fail_next(self, count=1, code=500, message="Injected failure"):
+        """接下來 count 次呼叫依序失敗（例如 code=401 模擬 token 失效）"""
+        self._scripted.extend([(code, message)] * count)
+
+    def _call(self, op):
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+            now = time.monotonic()
+            if self.quota_per_minute is not None:
+                self._recent = [t for t in self._recent if now - t < 60]
+                if len(self._recent) >= self.quota_per_minute:
+                    raise api_error(429, "Quota exceeded for quota metric 'Write requests' per minute")
+                self._recent.append(now)
+            if self._scripted:
+                code, message = self._scripted.pop(0)
+                raise api_error(code, message)
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                raise api_error(500, "Injected random failure")
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ---------- gspread.Client ----------
+    def open_by_key(self, key):
+        self._call("open_by_key")
+        return FakeSpreadsheet(self, key)
+
+
+class FakeSpreadsheet:
+    """取代 gspread.Spreadsheet"""
+
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self.title = f"Fake {key}"
+
+    def _backend(self):
+        return self.client.backend
+
+    def _require(self, title):
+        if title not in self._backend().titles():
+            raise api_error(400, f"Unable to parse range: '{title}'")
+
+    def _read(self, a1):
+        title, r1, r2, c1, c2 = parse_a1(a1)
+        self._require(title)
+        rows = self._backend().rows(title)
+        rows = rows[r1 - 1:r2] if r2 else rows[r1 - 1:]
+        values = [_trim(row[c1 - 1:c2]) for row in rows]
+        while values and not values[-1]:
+            values.pop()
+        out = {"range": a1, "majorDimension": "ROWS"}
+        if values:
+            out["values"] = values
+        return out
+
+    def worksheet(self, title):
+        self.client._call("fetch_sheet_metadata")
+        titles = self._backend().titles()
+        if title not in titles:
+            raise WorksheetNotFound(title)
+        return FakeWorksheet(self, title, titles.index(title))
+
+    def worksheets(self):
+        self.client._call("fetch_sheet_metadata")
+        return [FakeWorksheet(self, t, i) for i, t in enumerate(self._backend().titles())]
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        self.client._call("batch_update")
+        self._backend().add_sheet(title)
+        return FakeWorksheet(self, title, self._backend().titles().index(title))
+
+    def fetch_sheet_metadata(self, params=None):
+        self.client._call("fetch_sheet_metadata")
+        return {"sheets": [
+            {"properties": {"sheetId": i, "title": t,
+                            "gridProperties": {"rowCount": max(len(self._backend().rows(t)), 1000)}}}
+            for i, t in enumerate(self._backend().titles())]}
+
+    def values_get(self, range, params=None):
+        self.client._call("values_get")
+        return self._read(range)
+
+    def values_batch_get(self, ranges, params=None):
+        self.client._call("values_batch_get")
+        return {"spreadsheetId": self.id, "valueRanges": [self._read(r) for r in ranges]}
+
+    def values_append(self, range, params, body):
+        self.client._call("values_append")
+        title = parse_a1(range)[0]
+        self._require(title)
+        start = len(self._backend().rows(title)) + 1
+        self._backend().append(title, body.get("values", []))
+        end = len(self._backend().rows(title))
+        return {"spreadsheetId": self.id, "updates": {"updatedRange": f"'{title}'!A{start}:A{end}",
+                                                      "updatedRows": end - start + 1}}
+
+    def batch_update(self, body):
+        """支援 appendCells（一次請求寫入多個工作表）"""
+        self.client._call("batch_update")
+        titles = self._backend().titles()
+        replies = []
+        for request in body.get("requests", []):
+            if "appendCells" not in request:
+                raise api_error(400, f"Fake batch_update does not support {list(request)}")
+            spec = request["appendCells"]
+            if not 0 <= spec["sheetId"] < len(titles):
+                raise api_error(400, f"No grid with id: {spec['sheetId']}")
+            rows = [[cell.get("userEnteredValue", {}).get("stringValue", "") for cell in row.get("values", [])]
+                    for row in spec.get("rows", [])]
+            self._backend().append(titles[spec["sheetId"]], rows)
+            replies.append({})
+        return {"spreadsheetId": self.id, "replies": replies}
+
+
+class FakeWorksheet:
+    """取代 gspread.Worksheet"""
+
+    def __init__(self, spreadsheet, title, sheet_id):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+
+    @property
+    def row_count(self):
+        return max(len(self.spreadsheet._backend().rows(self.title)), 1000)
+
+    def get_all_values(self):
+        self.spreadsheet.client._call("values_get")
+        rows = self.spreadsheet._backend().rows(self.title)
+        width = max((len(r) for r in rows), default=0)
+        return [list(r) + [""] * (width - len(r)) for r in rows]
+
+    def col_values(self, col):
+        self.spreadsheet.client._call("values_get")
+        values = [r[col - 1] if len(r) >= col else "" for r in self.spreadsheet._backend().rows(self.title)]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def append_row(self, values, value_input_option="RAW"):
+        return self.append_rows([values], value_input_option)
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self.spreadsheet.client._call("values_append")
+        self.spreadsheet._backend().append(self.title, values)
+        return {"updates": {"updatedRows": len(values)}}
@@ -0,0 +1,522 @@
+# sheets_sync.py  ──  Google Sheets 讀寫的純資料邏輯（不依賴 Streamlit，可離線測試）
+import datetime
+import hashlib
+import random
+import threading
+import time
+
+from record_schema import table_rows
+
+# ===================================================================
+# 工作表與欄位範圍
+# ===================================================================
+# (工作表名稱, 讀取範圍, 欄數)；順序即為分組時的處理順序
+SHEET_RANGES = [
+    ("V1_Sheet", "A:F", 6),
+    ("V2_Sheet", "A:H", 8),
+    ("W_Sheet", "A:F", 6),
+    ("P_Sheet", "A:D", 4),
+    ("Grammar_List", "A:E", 5),
+]
+
+
+def _a1_range(sheet_name, cols):
+    """組出 A1 表示法範圍，例如 'V1_Sheet'!A:F"""
+    return f"'{sheet_name}'!{cols}"
+
+
+def _pad_rows(rows, width):
+    """values API 會省略列尾空白儲存格，補齊成固定欄數（與 get_all_values 相同）"""
+    return [row + [''] * (width - len(row)) if len(row) < width else row for row in rows]
+
+
+# ===================================================================
+# 批次讀取
+# ===================================================================
+def _batch_get(sh, ranges):
+    """ranges: {工作表: A1 範圍}；一次 values_batch_get，回傳 ({名稱: rows}, [不存在的工作表])"""
+    names = list(ranges)
+    try:
+        response = sh.values_batch_get([ranges[name] for name in names])
+    except Exception:
+        # 任一工作表不存在時整批會失敗：查一次工作表清單後只讀存在的
+        titles = {ws.title for ws in sh.worksheets()}
+        existing = [name for name in names if name in titles]
+        if len(existing) == len(names):
+            raise
+        names = existing
+        response = sh.values_batch_get([ranges[name] for name in names]) if names else {}
+
+    widths = {name: width for name, _, width in SHEET_RANGES}
+    values = {}
+    for name, value_range in zip(names, response.get("valueRanges", [])):
+        values[name] = _pad_rows(value_range.get("values", []), widths[name])
+    missing = [name for name in ranges if name not in values]
+    return values, missing
+
+
+def batch_read_sheets(sh):
+    """一次 values_batch_get 讀取五個工作表，回傳 ({名稱: rows}, [不存在的工作表])"""
+    return _batch_get(sh, {name: _a1_range(name, cols) for name, cols, _ in SHEET_RANGES})
+
+
+# ===================================================================
+# 分組：工作表列 → sentences 字典
+# ===================================================================
+def _new_record(ref, mode, date_added):
+    """由工作表建立的新紀錄（模式 A：V1 開頭；模式 B：W 開頭）"""
+    if mode == "A":
+        return {
+            "ref": ref,
+            "mode": "A",
+            "type": "Scripture",
+            "v1_content": [],
+            "v2_content": [],
+            "w_sheet": [],
+            "p_sheet": [],
+            "grammar_list": [],
+            "other": "",
+            "saved_sheets": ["V1 Sheet"],
+            "date_added": date_added
+        }
+    return {
+        "ref": ref,
+        "mode": "B",
+        "type": "Document",
+        "v1_content": [],
+        "v2_content": [],
+        "w_sheet": [],
+        "p_sheet": [],
+        "grammar_list": [],
+        "other": "",
+        "saved_sheets": ["W Sheet"],
+        "date_added": date_added
+    }
+
+
+# (工作表, 欄位, 欄數, 建立紀錄的模式 或 None, 只併入此模式的紀錄 或 None, saved_sheets 標籤)
+_SHEET_FIELDS = [
+    ("V1_Sheet", "v1_content", 6, "A", None, None),
+    ("V2_Sheet", "v2_content", 8, None, None, "V2 Sheet"),
+    ("W_Sheet", "w_sheet", 6, "B", None, None),
+    ("P_Sheet", "p_sheet", 4, None, "B", "P Sheet"),
+    ("Grammar_List", "grammar_list", 5, None, "B", "Grammar List"),
+]
+
+
+def merge_sheet_rows(all_data, rows_by_sheet, date_added=None):
+    """將各工作表的資料列（不含標題列）依 檔名_批次 併入 all_data（就地修改）
+
+    每筆紀錄的各欄位先收集成列清單，最後各接到原有資料列之後一次，總成本與列數成線性。
+    已有紀錄的資料列清單不就地修改（換成新清單），呼叫端手上的舊紀錄不受影響。
+    """
+    if date_added is None:
+        date_added = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    pending = {}        # (ref, 欄位) -> [行]
+    new_labels = {}     # ref -> {saved_sheets 標籤: None}（保持加入順序）
+
+    for sheet, field, width, creates, requires, label in _SHEET_FIELDS:
+        for row in rows_by_sheet.get(sheet, []):
+            if len(row) < width:
+                continue
+            group_ref = row[0].strip()
+            record = all_data.get(group_ref)
+
+            if record is None:
+                if not creates:
+                    continue
+                record = all_data[group_ref] = _new_record(group_ref, creates, date_added)
+            elif requires and record["mode"] != requires:
+                continue
+
+            lines = pending.get((group_ref, field))
+            if lines is None:
+                lines = pending[(group_ref, field)] = []
+            lines.append(row[1:width])
+            if label:
+                new_labels.setdefault(group_ref, {})[label] = None
+
+    for (ref, field), lines in pending.items():
+        all_data[ref][field] = table_rows(all_data[ref], field) + lines
+    for ref, labels in new_labels.items():
+        saved = all_data[ref]["saved_sheets"]
+        saved.extend(label for label in labels if label not in saved)
+
+    return all_data
+
+
+def group_sheet_rows(values, date_added=None):
+    """將各工作表的列（含標題列）依 檔名_批次 分組成 sentences 字典"""
+    return merge_sheet_rows({}, {name: rows[1:] for name, rows in values.items()}, date_added)
+
+
+# ===================================================================
+# 增量同步（sync cursor）
+# ===================================================================
+# cursor 格式：{工作表: {"rows": 已同步列數（含標題列）, "tail": 最後一列的雜湊},
+#              "refs": [上次同步時雲端有的 ref]}
+# refs 用來分辨「雲端刪掉的紀錄」與「只存在本地、還沒上傳的紀錄」：整份重讀時只刪前者
+CURSOR_REFS = "refs"
+
+
+def row_hash(row):
+    """列內容雜湊，用來確認 cursor 指向的列沒被改動"""
+    return hashlib.sha1("\t".join(row).encode("utf-8")).hexdigest()
+
+
+def build_cursor(values, refs=()):
+    """由完整讀取結果建立 cursor；refs 是雲端現有的 ref"""
+    cursor = {
+        name: {"rows": len(rows), "tail": row_hash(rows[-1]) if rows else ""}
+        for name, rows in values.items()
+    }
+    cursor[CURSOR_REFS] = sorted(refs)
+    return cursor
+
+
+def _tail_range(sheet_name, cols, start_row):
+    """從第 start_row 列讀到底，例如 'V1_Sheet'!A12:F"""
+    first, last = cols.split(":")
+    return f"'{sheet_name}'!{first}{start_row}:{last}"
+
+
+def read_sheet_deltas(sh, cursor):
+    """一次批次讀取每個工作表從 cursor 最後一列開始的資料
+    
+    回傳 ({名稱: 新增資料列}, 新 cursor)；cursor 不再吻合（列被刪改）時回傳 (None, None)
+    """
+    ranges = {}
+    for name, cols, _ in SHEET_RANGES:
+        synced = cursor.get(name, {}).get("rows", 0)
+        ranges[name] = _tail_range(name, cols, max(synced, 1))
+    values, _ = _batch_get(sh, ranges)
+
+    new_rows, new_cursor = {}, {}
+    for name, _, _ in SHEET_RANGES:
+        rows = values.get(name, [])
+        state = cursor.get(name, {"rows": 0, "tail": ""})
+        if state["rows"] == 0:
+            # 上次不存在或是空表：全部都是新列（第一列為標題）
+            fresh = rows[1:]
+        else:
+            if not rows or row_hash(rows[0]) != state["tail"]:
+                return None, None
+            fresh = rows[1:]
+        total = state["rows"] + len(rows) - (1 if state["rows"] else 0)
+        new_rows[name] = fresh
+        new_cursor[name] = {"rows": total, "tail": row_hash(rows[-1]) if rows else state["tail"]}
+    return new_rows, new_cursor
+
+
+def _sheet_fields(record):
+    """紀錄中由工作表產生的部分（整份重讀時用來判斷本地紀錄是否需要更新）"""
+    fields = [field for _, field, _, _, _, _ in _SHEET_FIELDS]
+    return ([table_rows(record, field) for field in fields],
+            record.get("mode"), sorted(record.get("saved_sheets") or []))
+
+
+def merge_sheet_record(local, sheet):
+    """以工作表內容更新本地紀錄：工作表欄位換成雲端的，本地才有的欄位（文法、單字等）保留
+
+    saved_sheets 取聯集；模式以本地為準（本地沒有時才用工作表的）。回傳新 dict，不修改 local
+    """
+    record = dict(local)
+    for _, field, _, _, _, _ in _SHEET_FIELDS:
+        record[field] = table_rows(sheet, field)
+    record.setdefault("mode", sheet["mode"])
+    saved = list(local.get("saved_sheets") or [])
+    record["saved_sheets"] = saved + [label for label in sheet["saved_sheets"] if label not in saved]
+    for key, value in sheet.items():
+        record.setdefault(key, value)
+    return record
+
+
+def sync_sheets(sh, sentences, cursor, skip_refs=()):
+    """以 cursor 增量同步 Sheets 到 sentences；cursor 失效時才整份重讀
+    
+    skip_refs：本機剛上傳過的 ref，本地紀錄已有內容，增量時略過這些列
+    回傳 (新 sentences, 新 cursor, 模式 "delta"/"full", 讀到的列數, 變動的 ref)；
+    新 sentences 是 sentences.copy()（LazySentences 只複製 manifest），只有變動的 ref 換成新紀錄；
+    不修改傳入的 sentences
+
+    整份重讀時，本地有而雲端沒有的紀錄只在「上次同步時雲端還有」（cursor 的 refs）才刪除；
+    只存在本地、尚未上傳的紀錄保留給「同步全部未上傳」。
+    """
+    synced_refs = set((cursor or {}).get(CURSOR_REFS, ()))
+    if sentences and cursor:
+        new_rows, new_cursor = read_sheet_deltas(sh, cursor)
+        if new_rows is not None:
+            # 計數含略過的列：cursor 已前進，仍需寫回
+            fetched = sum(len(rows) for rows in new_rows.values())
+            if skip_refs:
+                new_rows = {
+                    name: [row for row in rows if row[0].strip() not in skip_refs]
+                    for name, rows in new_rows.items()
+                }
+            row_refs = [row[0].strip() for rows in new_rows.values() for row in rows]
+            merged = sentences.copy()   # LazySentences 只複製 manifest
+            # 會被追加內容的紀錄先複製，避免改到呼叫端手上的物件
+            touched = set()
+            for rows in new_rows.values():
+                for row in rows:
+                    ref = row[0].strip()
+                    if ref in merged and ref not in touched:
+                        record = dict(merged[ref])
+                        record["saved_sheets"] = list(record.get("saved_sheets", []))
+                        merged[ref] = record
+                    touched.add(ref)
+            merge_sheet_rows(merged, new_rows)
+            changed = [ref for ref in dict.fromkeys(row[0].strip() for rows in new_rows.values() for row in rows)
+                       if ref in merged]
+            new_cursor[CURSOR_REFS] = sorted(synced_refs.union(ref for ref in row_refs if ref in merged))
+            return merged, new_cursor, "delta", fetched, changed
+
+    values, _ = batch_read_sheets(sh)
+    fresh = group_sheet_rows(values)
+    # 只更新工作表內容不同的紀錄，其餘沿用本地（不把整份資料換成新字典）
+    merged = sentences.copy()
+    changed = [ref for ref in synced_refs if ref in merged and ref not in fresh]
+    for ref in changed:
+        del merged[ref]
+    for ref, record in fresh.items():
+        if ref not in merged:
+            merged[ref] = record
+            changed.append(ref)
+            continue
+        local = merged[ref]
+        updated = merge_sheet_record(local, record)
+        if _sheet_fields(updated) != _sheet_fields(local):
+            merged[ref] = updated
+            changed.append(ref)
+    fetched = sum(max(len(rows) - 1, 0) for rows in values.values())
+    return merged, build_cursor(values, fresh), "full", fetched, changed
+
+
+# ===================================================================
+# 批次寫入（一筆紀錄的所有工作表一次 batch_update）
+# ===================================================================
+SHEET_HEADERS = {
+    "V1_Sheet": ["檔名_批次", "Ref. 經文出處", "English（ESV經文）", "Chinese經文", "Syn/Ant", "Grammar"],
+    "V2_Sheet": ["檔名_批次", "Ref.經文出處", "口語訳", "Grammar", "Note", "KRF", "Korean Syn/Ant", "THSV11 泰文重要片語"],
+    "W_Sheet": ["檔名_批次", "No經卷範圍", "Word/Phrase+Chinese", "Synonym+中文對照", "Antonym+中文對照", "全句聖經中英對照例句"],
+    "P_Sheet": ["檔名_批次", "Paragraph", "English Refinement", "中英夾雜講章"],
+    "Grammar_List": ["檔名_批次", "No經卷範圍", "Original Sentence＋中文翻譯", "Grammar Rule", "Analysis & Example"],
+}
+
+# 模式 → [(工作表, sentences 欄位)]
+SAVE_FIELDS = {
+    "A": [("V1_Sheet", "v1_content"), ("V2_Sheet", "v2_content")],
+    "B": [("W_Sheet", "w_sheet"), ("P_Sheet", "p_sheet"), ("Grammar_List", "grammar_list")],
+}
+
+
+def build_sheet_rows(record):
+    """將一筆紀錄依模式轉成 {工作表: 資料列}，每列第一欄為 檔名_批次"""
+    ref = record.get("ref", "N/A")
+    rows_by_sheet = {}
+    for sheet_name, field in SAVE_FIELDS.get(record.get("mode", "A"), SAVE_FIELDS["A"]):
+        rows = table_rows(record, field)
+        if rows:
+            rows_by_sheet[sheet_name] = [[ref] + list(row) for row in rows]
+    return rows_by_sheet
+
+
+def _append_cells(sheet_id, rows):
+    """appendCells 請求；以字串原樣寫入（同 append_rows 的 RAW）"""
+    return {"appendCells": {
+        "sheetId": sheet_id,
+        "rows": [{"values": [{"userEnteredValue": {"stringValue": str(cell)}} for cell in row]} for row in rows],
+        "fields": "userEnteredValue",
+    }}
+
+
+def load_sheet_ids(sh):
+    """一次讀取試算表中繼資料，回傳 {工作表名稱: sheetId}"""
+    meta = sh.fetch_sheet_metadata()
+    return {s["properties"]["title"]: s["properties"]["sheetId"] for s in meta.get("sheets", [])}
+
+
+def batch_append_rows(sh, rows_by_sheet, sheet_ids):
+    """將 {工作表: 資料列} 以單一 batch_update 追加到各工作表
+
+    sheet_ids 是 {名稱: sheetId} 快取（就地更新）：缺少的名稱先重讀中繼資料，
+    工作表仍不存在時才建立，標題列併在同一次寫入。回傳 {工作表: 寫入列數}
+    """
+    rows_by_sheet = {name: rows for name, rows in rows_by_sheet.items() if rows}
+    if not rows_by_sheet:
+        return {}
+
+    if any(name not in sheet_ids for name in rows_by_sheet):
+        sheet_ids.clear()
+        sheet_ids.update(load_sheet_ids(sh))
+
+    requests = []
+    for name, rows in rows_by_sheet.items():
+        if name not in sheet_ids:
+            ws = sh.add_worksheet(name, rows=1000, cols=len(SHEET_HEADERS[name]))
+            sheet_ids[name] = ws.id
+            rows = [SHEET_HEADERS[name]] + rows
+        requests.append(_append_cells(sheet_ids[name], rows))
+
+    sh.batch_update({"requests": requests})
+    return {name: len(rows) for name, rows in rows_by_sheet.items()}
+
+
+# ===================================================================
+# 重複檢查用的 ref 索引（只讀 A 欄）
+# ===================================================================
+class RefIndex:
+    """工作表 A 欄（檔名_批次）的 ref 集合
+
+    第一次整欄讀取；之後只從上次最後一列讀到底（通常 0～幾列），
+    最後一列對不上或超過 max_age 才整欄重讀。本機寫入後直接更新集合。
+    """
+
+    def __init__(self, sheet_name, max_age=600):
+        self.sheet_name = sheet_name
+        self.max_age = max_age
+        self.refs = set()
+        self.rows = 0           # 已索引列數（含標題列）；0 表示需要整欄讀取
+        self._last = ""         # 第 rows 列的 A 欄內容
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read_column(self, sh, start_row):
+        try:
+            response = sh.values_get(f"'{self.sheet_name}'!A{start_row}:A")
+        except Exception:
+            if self.sheet_name in {ws.title for ws in sh.worksheets()}:
+                raise
+            return None     # 工作表不存在
+        return [row[0].strip() if row else "" for row in response.get("values", [])]
+
+    def _rebuild(self, sh):
+        column = self._read_column(sh, 1) or []
+        self.refs = {ref for ref in column[1:] if ref}
+        self.rows = len(column)
+        self._last = column[-1] if column else ""
+        self._built_at = time.monotonic()
+
+    def refresh(self, sh):
+        """與雲端對齊：一次讀取新增的列，必要時整欄重讀"""
+        with self._lock:
+            if self.rows == 0 or time.monotonic() - self._built_at > self.max_age:
+                self._rebuild(sh)
+                return
+            tail = self._read_column(sh, self.rows)
+            if not tail or tail[0] != self._last:
+                # 列被刪除或改動：整欄重讀
+                self._rebuild(sh)
+                return
+            self.refs.update(ref for ref in tail[1:] if ref)
+            self.rows += len(tail) - 1
+            self._last = tail[-1]
+
+    def __contains__(self, ref):
+        return ref in self.refs
+
+    def record_append(self, rows):
+        """本機成功追加 rows（第一欄為 ref）後更新索引，不需再讀雲端"""
+        if not rows:
+            return
+        with self._lock:
+            if self.rows == 0:
+                return      # 工作表可能是剛建立的（多一列標題），下次整欄讀取
+            self.refs.update(row[0].strip() for row in rows)
+            self.rows += len(rows)
+            self._last = rows[-1][0].strip()
+
+    def invalidate(self):
+        with self._lock:
+            self.rows = 0
+
+
+# ===================================================================
+# 大量同步：配額節流 + 多筆紀錄合併寫入
+# ===================================================================
+class RateLimiter:
+    """滑動視窗節流：任意 60 秒內最多 per_minute 次請求（跨 session 共用，acquire 以 lock 保護）"""
+
+    def __init__(self, per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.per_minute = per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._sent = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._sent = [t for t in self._sent if now - t < 60]
+                if len(self._sent) < self.per_minute:
+                    self._sent.append(now)
+                    return
+                wait = 60 - (now - self._sent[0])
+            self._sleep(wait)       # 等待時不持有 lock，其他執行緒仍可檢查
+
+
+def is_quota_error(e):
+    """429：超過每分鐘配額"""
+    return getattr(getattr(e, "response", None), "status_code", None) == 429
+
+
+def unsynced_record_rows(records, indexes, to_payload, mode_of):
+    """找出雲端還沒有的紀錄，回傳 [(ref, {工作表: 列})]（chunk_record_rows 的輸入）
+
+    indexes：{"A": V1_Sheet 的 RefIndex, "B": W_Sheet 的 RefIndex}（已 refresh）
+    mode_of(ref) 先用 manifest 欄位比對索引，已上傳的紀錄不必讀取內容；
+    to_payload(紀錄) 轉成工作表格式
+    """
+    pending = []
+    for ref in records:
+        if ref in indexes.get(mode_of(ref), indexes["A"]):
+            continue
+        payload = to_payload(records[ref])
+        mode = payload.get("mode", "A") if payload.get("mode") in indexes else "A"
+        if payload.get("ref", ref) in indexes[mode]:
+            continue
+        rows_by_sheet = build_sheet_rows(payload)
+        if rows_by_sheet:
+            pending.append((payload.get("ref", ref), rows_by_sheet))
+    return pending
+
+
+def chunk_record_rows(records, max_rows):
+    """[(ref, {工作表: 列})] → [(refs, 合併後的 {工作表: 列})]，每批總列數不超過 max_rows
+
+    單筆紀錄不拆開（一筆超過上限時自成一批），確保同一 ref 的列在同一次請求寫入。
+    """
+    batches, refs, merged, size = [], [], {}, 0
+    for ref, rows_by_sheet in records:
+        count = sum(len(rows) for rows in rows_by_sheet.values())
+        if refs and size + count > max_rows:
+            batches.append((refs, merged))
+            refs, merged, size = [], {}, 0
+        refs.append(ref)
+        for name, rows in rows_by_sheet.items():
+            merged.setdefault(name, []).extend(rows)
+        size += count
+    if refs:
+        batches.append((refs, merged))
+    return batches
+
+
+def bulk_append(sh, batches, sheet_ids, limiter, on_batch=None, max_retries=6, sleep=time.sleep):
+    """依序寫入 chunk_record_rows 的批次；每次請求前節流，遇 429 指數退避後重試
+
+    on_batch(完成批數, 總批數, refs, rows_by_sheet) 在每批寫入成功後呼叫。
+    """
+    for done, (refs, rows_by_sheet) in enumerate(batches, 1):
+        for attempt in range(max_retries + 1):
+            limiter.acquire()
+            try:
+                batch_append_rows(sh, rows_by_sheet, sheet_ids)
+                break
+            except Exception as e:
+                if not is_quota_error(e) or attempt == max_retries:
+                    raise
+                sleep(min(2 ** attempt, 32) + random.random())
+        if on_batch:
+            on_batch(done, len(batches), refs, rows_by_sheet)
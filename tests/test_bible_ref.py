@@ -0,0 +1,69 @@
+# test_bible_ref.py  ──  出處解析與 ReferenceIndex
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import record_index  # noqa: E402
+from bible_ref import MAX_VERSE, ReferenceIndex, format_reference, parse_reference  # noqa: E402
+from record_schema import table_rows  # noqa: E402
+
+
+def make_record(*verses):
+    return {"v1_content": [[verse, "", "", "", ""] for verse in verses]}
+
+
+def test_parse_reference_variants():
+    heb_6_3 = ((58, 6, 3), (58, 6, 3))
+    for text in ["Heb 6:3", "來6:3", "Hebrews 6:3", "希伯來書 6章3節", "hebr. 6：3", "Heb 6:3 (ESV)", "来6:3"]:
+        assert parse_reference(text) == heb_6_3, text
+    assert parse_reference("來 6:1-12") == ((58, 6, 1), (58, 6, 12))
+    assert parse_reference("Heb 6") == ((58, 6, 1), (58, 6, MAX_VERSE))
+    assert parse_reference("Heb 6:20-7:2") == ((58, 6, 20), (58, 7, 2))
+    assert parse_reference("Jude 5") == ((65, 1, 5), (65, 1, 5))
+    assert parse_reference("1 John 4:8") == parse_reference("約壹 4:8") == ((62, 4, 8), (62, 4, 8))
+    assert parse_reference("Heb 6:7-3") is None
+    assert parse_reference("Hezekiah 1:1") is None
+    assert parse_reference("") is None
+    assert format_reference((45, 5, 8)) == "Rom 5:8"
+
+
+def test_range_lookup_in_canonical_order():
+    index = ReferenceIndex(lambda record: table_rows(record, "v1_content"))
+    data = {
+        "a": make_record("Heb 6:12", "Heb 6:1"),
+        "b": make_record("Heb 7:1"),
+        "c": make_record("Rom 5:8"),
+        "Heb 6:5": make_record("not a verse"),     # 沒有可解析的列：用 ref 本身
+    }
+    index.rebuild(data.items(), len(data))
+
+    found = index.lookup("Heb 6:1-12")
+    assert [(format_reference(key), ref, row) for key, ref, row in found] == [
+        ("Heb 6:1", "a", 1), ("Heb 6:5", "Heb 6:5", None), ("Heb 6:12", "a", 0)]
+    assert [ref for _, ref, _ in index.lookup("Heb 6-7")] == ["a", "Heb 6:5", "a", "b"]
+    assert index.lookup("Rom 5:9") == []
+    assert index.lookup("nonsense") == []
+
+    index.apply({}, ["c"])
+    assert index.lookup("Rom 5") == []
+
+
+def test_delete_during_rebuild_after_scan_visited_the_ref(monkeypatch):
+    monkeypatch.setattr(record_index, "REBUILD_BATCH", 1)      # 每筆自成一批：A 先存入重建結果
+    index = ReferenceIndex(lambda record: table_rows(record, "v1_content"))
+    data = {"A": make_record("Heb 6:3"), "B": make_record("Rom 5:8"), "C": make_record("Gen 1:1")}
+
+    def records():
+        for ref, record in data.items():
+            if ref == "C":
+                index.apply({}, ["A"])      # A 已被掃描過，之後才刪除
+            yield ref, record
+
+    index.rebuild(records(), len(data))
+    assert "A" not in index._by_ref
+    assert all(entry[3] != "A" for entry in index._entries)
+    assert index.lookup("Heb 6:3") == []
+    assert [ref for _, ref, _ in index.lookup("Rom 5:8")] == ["B"]
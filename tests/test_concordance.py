@@ -0,0 +1,26 @@
+# test_concordance.py  ──  單字索引的出處與語言
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concordance import Concordance  # noqa: E402
+
+
+def test_lookup_indexes_only_the_term_and_keeps_each_posting_language():
+    data = {
+        "A": {"ref": "A", "vocabulary": [{"word": "grace", "meaning": "undeserved favour 恩典"}]},
+        "B": {"ref": "B", "vocabulary": [{"word": "favour", "meaning": "恩寵"}]},
+        "C": {"ref": "C", "w_sheet": [["1", "恩典 grace", "", "", ""]]},
+    }
+    concordance = Concordance()
+    concordance.rebuild(iter(data.items()))
+
+    # 釋義裡的 favour 不算 A 的出處
+    assert [hit["ref"] for hit in concordance.lookup("favour")] == ["B"]
+    hits = concordance.lookup("grace")
+    assert [(hit["ref"], hit["lang"]) for hit in hits] == [("A", "en"), ("C", "zh")]
+    assert concordance.lookup("恩典") == [
+        {"ref": "C", "field": "w_sheet", "row": 0, "lang": "zh", "text": "恩典 grace"}]
@@ -0,0 +1,41 @@
+# test_grammar_template.py  ──  grammar 模板副本的清理與顯示補齊
+#
+# 用法：python -m pytest tests
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar_template import DEFAULT_GRAMMAR, GRAMMAR_LANGS, resolve_grammar, strip_default_grammar  # noqa: E402
+
+
+def template_copy(lang):
+    """舊版存進紀錄的副本：JSON 來回後是一般 dict/list"""
+    return json.loads(json.dumps({k: v for k, v in DEFAULT_GRAMMAR[lang].items()},
+                                 default=lambda value: dict(value)))
+
+
+def test_frozen_template_copies_are_stripped_and_custom_grammar_is_kept():
+    custom = template_copy("english")
+    custom["full"] = "And this we will do, if God permits."
+    record = {"ref": "Heb 6:3", "grammar": {"english": custom, "thai": template_copy("thai"),
+                                            "japanese": template_copy("japanese"), "korean": template_copy("korean")}}
+
+    stripped = strip_default_grammar(record)
+    assert stripped["grammar"] == {"english": custom}
+    assert len(record["grammar"]) == 4      # 不修改原紀錄
+
+    # 已清理過或沒有 grammar 的紀錄原樣回傳
+    assert strip_default_grammar(stripped) is stripped
+    plain = {"ref": "Rom 5:8"}
+    assert strip_default_grammar(plain) is plain
+
+
+def test_resolve_grammar_fills_missing_languages_from_the_template():
+    custom = {"full": "custom"}
+    view = resolve_grammar({"english": custom})
+    assert list(view) == list(GRAMMAR_LANGS)
+    assert view["english"] is custom
+    assert view["thai"] is DEFAULT_GRAMMAR["thai"]
+    assert resolve_grammar(None) == {lang: DEFAULT_GRAMMAR[lang] for lang in GRAMMAR_LANGS}
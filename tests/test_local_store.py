@@ -0,0 +1,303 @@
+# test_local_store.py  ──  local_store 的並行與失敗情境
+#
+# 用法：python -m pytest tests
+import datetime
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_store import (  # noqa: E402
+    AppDatabase, SentenceJournal, SentenceStore, StaleWriteError, WriteBehind, merge_record, record_replaced
+)
+
+
+# ===================================================================
+# WriteBehind
+# ===================================================================
+def test_write_behind_failed_key_does_not_drop_other_keys():
+    flushed = {}
+
+    def failing(items):
+        raise OSError("disk full")
+
+    write_behind = WriteBehind(delay=60)
+    write_behind.add("sentences", failing, ["Heb 6:3"])
+    write_behind.add("app_db", lambda items: flushed.setdefault("app_db", list(items)), [("todo", 1)])
+
+    with pytest.raises(OSError):
+        write_behind.flush()
+
+    assert flushed == {"app_db": [("todo", 1)]}
+    assert "sentences" in write_behind.error
+
+    # 失敗的 items 排在之後 add 的前面，下次 flush 一起寫出
+    write_behind.add("sentences", lambda items: flushed.setdefault("sentences", list(items)), ["Rom 5:8"])
+    write_behind.flush()
+    assert flushed["sentences"] == ["Heb 6:3", "Rom 5:8"]
+    assert write_behind.error is None
+
+
+def test_write_behind_timer_failure_keeps_items():
+    write_behind = WriteBehind(delay=60)
+    write_behind.add("sentences", lambda items: 1 / 0, ["Heb 6:3"])
+    write_behind._flush_from_timer()        # 計時器執行緒的入口不可把例外丟出去
+
+    flushed = []
+    write_behind.add("sentences", flushed.extend, [])
+    write_behind.flush()
+    assert flushed == ["Heb 6:3"]
+
+
+# ===================================================================
+# SentenceStore 背景同步
+# ===================================================================
+def test_save_during_sync_is_not_rolled_back_or_deleted(tmp_path):
+    journal = SentenceJournal(str(tmp_path))
+    journal.write({"Heb 6:3": {"ref": "Heb 6:3", "en": "old"}})
+    data = journal.load()
+    write_behind = WriteBehind(delay=60)
+    persisted = []
+
+    def sync_fn(base, skip_refs):
+        # 同步期間另一個 session 新增一筆、修改一筆
+        store.write({"Rom 5:8": {"ref": "Rom 5:8", "en": "new"}})
+        store.write({"Heb 6:3": {"ref": "Heb 6:3", "en": "local"}})
+        journal.write(store.snapshot()[0], ["Rom 5:8", "Heb 6:3"])
+        result = base.copy()
+        result["Heb 6:3"] = {"ref": "Heb 6:3", "en": "cloud"}
+        result["Gen 1:1"] = {"ref": "Gen 1:1", "en": "cloud"}
+        return result, "cursor", True, ""
+
+    def persist_fn(refs, cursor):
+        persisted.append(set(refs))
+        write_behind.add("sentences", lambda queued: journal.write(store.snapshot()[0], queued), list(refs))
+        write_behind.flush("sentences")
+
+    store = SentenceStore(data, ttl=600, sync_fn=sync_fn, persist_fn=persist_fn)
+    store._run_sync(data.copy(), set())
+
+    assert persisted == [{"Gen 1:1"}]
+    reloaded = SentenceJournal(str(tmp_path)).load()
+    assert sorted(reloaded) == ["Gen 1:1", "Heb 6:3", "Rom 5:8"]
+    assert reloaded["Heb 6:3"]["en"] == "local"
+    assert store.snapshot()[0]["Gen 1:1"]["en"] == "cloud"
+
+
+def test_persisted_records_leave_the_overlay(tmp_path):
+    journal = SentenceJournal(str(tmp_path))
+    journal.storage.cache_size = 3
+    journal.write({f"r{i}": {"ref": f"r{i}", "other": "old"} for i in range(10)})
+    store = SentenceStore(journal.load(), ttl=600, sync_fn=None, persist_fn=None)
+
+    def persist(refs):
+        data = store.snapshot()[0]
+        journal.write(data, refs)
+        store.release_persisted(data, refs)
+
+    before = store.snapshot()[0]
+    for i in range(10):
+        store.write({f"r{i}": {"ref": f"r{i}", "other": f"new {i}"}})
+        persist([f"r{i}"])
+    data = store.snapshot()[0]
+    assert data._overlay == {}      # 記憶體只剩有上限的分片快取
+    assert len(journal.storage._cache) <= 3
+    assert [data[f"r{i}"]["other"] for i in range(10)] == [f"new {i}" for i in range(10)]
+    assert record_replaced(before, data, "r0") and not record_replaced(data, data.copy(), "r0")
+
+    # 以較舊的快照寫出時，之後又改過、還沒寫出的內容要留著
+    store.write({"r0": {"ref": "r0", "other": "first"}})
+    older = store.snapshot()[0]
+    store.write({"r0": {"ref": "r0", "other": "second"}})
+    journal.write(older, ["r0"])
+    store.release_persisted(older, ["r0"])
+    assert store.snapshot()[0]._overlay["r0"]["other"] == "second"
+
+
+def test_sync_does_not_bring_back_released_records(tmp_path):
+    journal = SentenceJournal(str(tmp_path))
+    journal.write({"Heb 6:3": {"ref": "Heb 6:3", "other": "old"}})
+    store = SentenceStore(journal.load(), ttl=600, sync_fn=None, persist_fn=lambda refs, cursor: None)
+    store.write({"Heb 6:3": {"ref": "Heb 6:3", "other": "local"}})
+    base = store.snapshot()[0].copy()       # 同步開始時的快照還帶著本地改動
+
+    def sync_fn(base, skip_refs):
+        data = store.snapshot()[0]
+        journal.write(data, ["Heb 6:3"])
+        store.release_persisted(data, ["Heb 6:3"])
+        result = base.copy()
+        result["Gen 1:1"] = {"ref": "Gen 1:1", "other": "cloud"}
+        return result, "cursor", True, ""
+
+    store._sync_fn = sync_fn
+    store._run_sync(base, set())
+    data = store.snapshot()[0]
+    assert sorted(data._overlay) == ["Gen 1:1"]
+    assert data["Heb 6:3"]["other"] == "local"
+
+
+# ===================================================================
+# SentenceStore 寫入：compare-and-swap 與三方合併
+# ===================================================================
+def make_store(records):
+    return SentenceStore(dict(records), ttl=600, sync_fn=None, persist_fn=None)
+
+
+def test_stale_write_on_the_same_field_raises_and_writes_nothing():
+    base = {"ref": "Heb 6:3", "other": "", "v1_content": []}
+    store = make_store({"Heb 6:3": base})
+    _, _, revisions = store.snapshot()
+    expected = {"Heb 6:3": (revisions.get("Heb 6:3", 0), base)}
+
+    store.write({"Heb 6:3": dict(base, other="session A")}, expected)
+    with pytest.raises(StaleWriteError) as excinfo:
+        store.write({"Heb 6:3": dict(base, other="session B"), "Rom 5:8": {"ref": "Rom 5:8"}}, expected)
+    assert excinfo.value.ref == "Heb 6:3"
+    data = store.snapshot()[0]
+    assert data["Heb 6:3"]["other"] == "session A"
+    assert "Rom 5:8" not in data        # 整批都不寫入
+
+
+def test_stale_write_on_disjoint_fields_merges():
+    base = {"ref": "Heb 6:3", "other": "", "v1_content": [["Heb 6:3", "old", "", "", ""]]}
+    store = make_store({"Heb 6:3": base})
+    expected = {"Heb 6:3": (store.snapshot()[2].get("Heb 6:3", 0), base)}
+
+    store.write({"Heb 6:3": dict(base, other="note")}, expected)
+    new_rows = [["Heb 6:3", "new", "", "", ""]]
+    data, _, _ = store.write({"Heb 6:3": dict(base, v1_content=new_rows)}, expected)
+    assert data["Heb 6:3"] == dict(base, other="note", v1_content=new_rows)
+
+    # 兩邊改成相同的值不算衝突
+    assert merge_record("Heb 6:3", base, dict(base, other="x"), dict(base, other="x"))["other"] == "x"
+
+
+def test_delete_against_an_edit_is_stale_both_ways():
+    base = {"ref": "Heb 6:3", "other": ""}
+    store = make_store({"Heb 6:3": base})
+    expected = {"Heb 6:3": (store.snapshot()[2].get("Heb 6:3", 0), base)}
+
+    store.write({"Heb 6:3": dict(base, other="edited")}, expected)
+    with pytest.raises(StaleWriteError):
+        store.write({"Heb 6:3": None}, expected)        # 刪除依據的是修改前的版本
+    assert store.snapshot()[0]["Heb 6:3"]["other"] == "edited"
+
+    store = make_store({"Heb 6:3": base})
+    store.write({"Heb 6:3": None}, expected)
+    with pytest.raises(StaleWriteError):
+        store.write({"Heb 6:3": dict(base, other="edited")}, expected)     # 修改已被刪除的紀錄
+    assert "Heb 6:3" not in store.snapshot()[0]
+
+
+# ===================================================================
+# AppDatabase：bible_data.json 搬移、待辦、收藏、自訂金句
+# ===================================================================
+def test_migrate_json_imports_once(tmp_path):
+    path = tmp_path / "bible_data.json"
+    path.write_text(json.dumps({
+        "todos": {"2026-10-18": [{"title": "讀經", "time": "08:00"}, {"title": "禱告", "time": 9}]},
+        "favorites": ["Heb 6:3", "Rom 5:8", "Heb 6:3"],
+        "custom_verses": ["第一句", "第二句"],
+        "ai_analysis": [{"reference": "Heb 6:3", "timestamp": "2026-10-01T08:00", "result": "..."}],
+    }, ensure_ascii=False), encoding="utf-8")
+    db = AppDatabase(str(tmp_path / "app.db"))
+
+    assert db.migrate_json(str(path)) is True
+    assert db.load_todos() == {"2026-10-18": [{"id": 1, "title": "讀經", "time": "08:00"},
+                                              {"id": 2, "title": "禱告", "time": "9"}]}
+    assert db.load_favorites() == ["Heb 6:3", "Rom 5:8"]
+    assert db.load_custom_verses()[:3] == ["第一句", "第二句", ""]
+    assert db.load_analyses()[0]["result"] == "..."
+
+    # 第二次不再匯入；原檔保留
+    assert db.migrate_json(str(path)) is False
+    assert len(db.load_favorites()) == 2 and path.exists()
+
+
+def test_migrate_json_retries_after_a_broken_file(tmp_path):
+    path = tmp_path / "bible_data.json"
+    path.write_text("{broken", encoding="utf-8")
+    db = AppDatabase(str(tmp_path / "app.db"))
+    assert db.migrate_json(str(path)) is False
+    path.write_text(json.dumps({"favorites": ["Heb 6:3"]}), encoding="utf-8")
+    assert db.migrate_json(str(path)) is True
+    assert db.load_favorites() == ["Heb 6:3"]
+
+
+def test_todos_favorites_and_custom_verses_through_write_behind(tmp_path):
+    db = AppDatabase(str(tmp_path / "app.db"), write_behind=WriteBehind(delay=60))
+    first = db.add_todo("2026-10-18", "讀經", "08:00")
+    db.add_todo("2026-10-18", "禱告", "09:00")
+    db.delete_todo(first)
+    db.add_favorite("Heb 6:3")
+    db.add_favorite("Heb 6:3")
+    db.remove_favorite("Rom 5:8")
+    assert [todo["title"] for todo in db.load_todos()["2026-10-18"]] == ["禱告"]      # 讀取前先寫出排隊中的變更
+    assert db.load_favorites() == ["Heb 6:3"]
+
+    # 自訂金句只寫入相對 base 改過的欄位，不蓋掉其他 session 的修改
+    base = db.load_custom_verses()
+    db.save_custom_verses(["其他 session"] + base[1:], base)
+    mine = list(base)
+    mine[2] = "我的"
+    db.save_custom_verses(mine, base)
+    assert db.load_custom_verses()[:3] == ["其他 session", "", "我的"]
+
+
+# ===================================================================
+# AppDatabase：AI 解析紀錄
+# ===================================================================
+def test_analysis_pages_newest_first_and_delete(tmp_path):
+    db = AppDatabase(str(tmp_path / "app.db"), write_behind=WriteBehind(delay=60))
+    for i in range(5):
+        db.add_analysis({"reference": "Heb 6:3" if i % 2 else "Rom 5:8", "timestamp": f"2026-10-0{i + 1}T08:00"})
+
+    first = db.load_analyses(limit=2)
+    assert [entry["timestamp"][:10] for entry in first] == ["2026-10-05", "2026-10-04"]
+    assert db.count_analyses("Heb 6:3") == 2
+
+    db.delete_analysis(first[0]["id"])
+    assert db.count_analyses() == 4
+    assert [entry["timestamp"][:10] for entry in db.load_analyses(limit=2, offset=2)] == ["2026-10-02", "2026-10-01"]
+
+
+def test_analysis_retention_caps_count_and_age(tmp_path):
+    db = AppDatabase(str(tmp_path / "app.db"), analysis_keep=3, analysis_max_days=30)
+    old = (datetime.datetime.now() - datetime.timedelta(days=31)).isoformat()
+    db.add_analysis({"reference": "Heb 6:3", "timestamp": old})
+    recent = [(datetime.datetime.now() - datetime.timedelta(days=i)).isoformat() for i in range(4, 0, -1)]
+    for timestamp in recent:
+        db.add_analysis({"reference": "Heb 6:3", "timestamp": timestamp})
+
+    # 過期的那筆先被清掉，其餘只留最新的 3 筆
+    assert db.count_analyses() == 3
+    assert [entry["timestamp"] for entry in db.load_analyses()] == recent[::-1][:3]
+
+
+def test_analysis_page_boundaries(tmp_path):
+    db = AppDatabase(str(tmp_path / "app.db"))
+    for i in range(25):
+        db.add_analysis({"reference": "Heb 6:3" if i % 5 else "Rom 5:8", "timestamp": f"2026-10-18T08:{i:02d}"})
+
+    pages = [db.load_analyses(limit=10, offset=offset) for offset in (0, 10, 20, 30)]
+    assert [len(page) for page in pages] == [10, 10, 5, 0]
+    minutes = [int(entry["timestamp"][-2:]) for page in pages for entry in page]
+    assert minutes == list(range(24, -1, -1))       # 不重複、不遺漏，新的在前
+
+    assert db.count_analyses("Rom 5:8") == 5
+    last_page = db.load_analyses("Rom 5:8", limit=2, offset=4)
+    assert [entry["timestamp"] for entry in last_page] == ["2026-10-18T08:00"]
+    assert db.load_analyses("Rom 5:8", limit=2, offset=5) == []
+
+
+def test_history_failure_does_not_fail_the_write():
+    def history_fn(changes):
+        raise KeyError("body")
+
+    store = SentenceStore({}, ttl=600, sync_fn=None, persist_fn=None, history_fn=history_fn)
+    data, version, _ = store.write({"Heb 6:3": {"ref": "Heb 6:3"}})
+    assert "Heb 6:3" in data and version == 2
+    assert "KeyError" in store.history_error
@@ -0,0 +1,64 @@
+# test_record_history.py  ──  反向差異還原與版本歷史的大小上限
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_store import AppDatabase  # noqa: E402
+from record_history import apply_delta, make_delta, record_digest  # noqa: E402
+
+
+def make_versions():
+    """同一筆紀錄的連續版本：改長文字中的一行、增刪資料列、新增與刪除欄位"""
+    rows = [[f"Heb 6:{i}", f"verse {i}", "", "", ""] for i in range(1, 11)]
+    notes = "".join(f"line {i}\n" for i in range(12))
+    v0 = {"ref": "Heb 6", "other": notes, "v1_content": rows}
+    v1 = dict(v0, other=notes.replace("line 5\n", "line five\n"))
+    v2 = dict(v1, v1_content=rows[:3] + [["Heb 6:3a", "inserted", "", "", ""]] + rows[3:9])
+    v3 = dict(v2, grammar={"english": {"full": "And this"}})
+    v4 = {key: value for key, value in v3.items() if key != "other"}
+    return [v0, v1, v2, v3, v4]
+
+
+def test_reverse_deltas_rebuild_every_older_version(tmp_path):
+    versions = make_versions()
+    db = AppDatabase(str(tmp_path / "app.db"))
+    for old, new in zip(versions, versions[1:]):
+        db.add_history("Heb 6", "2026-10-18T08:00:00", "update", record_digest(new), make_delta(new, old))
+
+    # 由最新版往回套用，每一步都要接得上雜湊並得到完整的舊版
+    record = versions[-1]
+    restored = []
+    for entry in db.load_history("Heb 6"):
+        assert entry["digest"] == record_digest(record)
+        record = apply_delta(record, entry["body"])
+        restored.append(record)
+    assert restored == versions[-2::-1]
+
+    # 長文字與資料列只存變動的區段
+    delta = make_delta(versions[1], versions[0])
+    assert "seq" in delta and "other" in delta["seq"]
+    assert apply_delta(versions[1], delta) == versions[0]
+
+
+def test_history_is_evicted_oldest_first_at_the_size_limit(tmp_path):
+    db = AppDatabase(str(tmp_path / "app.db"), history_bytes_per_ref=1000, history_bytes_total=1500)
+    body = {"set": {"other": "x" * 200}}
+    ids = [db.add_history("Heb 6:3", f"2026-10-18T08:00:{i:02d}", "update", "d", body) for i in range(10)]
+
+    kept = [entry["id"] for entry in db.load_history("Heb 6:3")]
+    assert kept == ids[::-1][:len(kept)]        # 留下的是最新的幾筆
+    sizes = db._read("SELECT SUM(size) FROM history WHERE ref = ?", ("Heb 6:3",))[0][0]
+    assert 0 < sizes <= 1000
+    assert len(kept) < len(ids)
+
+    # 全部的上限：另一筆紀錄寫入後，最舊的（不論 ref）先被刪除
+    for i in range(5):
+        db.add_history("Rom 5:8", f"2026-10-18T09:00:{i:02d}", "update", "d", body)
+    total = db._read("SELECT SUM(size) FROM history")[0][0]
+    assert total <= 1500
+    assert len(db.load_history("Rom 5:8")) == len(kept)      # 新寫入的 ref 只受單筆上限
+    assert [entry["id"] for entry in db.load_history("Heb 6:3")] == kept[:len(db.load_history("Heb 6:3"))]
+    assert len(db.load_history("Heb 6:3")) < len(kept)
@@ -0,0 +1,48 @@
+# test_record_index.py  ──  衍生索引的共用重建流程
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bible_ref import ReferenceIndex, parse_reference  # noqa: E402
+from concordance import Concordance  # noqa: E402
+from record_index import rebuild_all  # noqa: E402
+from record_schema import table_rows  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from verse_table import VerseTable  # noqa: E402
+
+
+def make_record(ref, verse, english, syn_ant=""):
+    return {"ref": ref, "v1_content": [[verse, english, "中文", syn_ant, ""]]}
+
+
+def test_one_scan_feeds_every_index_and_keeps_live_updates(tmp_path):
+    data = {f"r{i}": make_record(f"r{i}", f"Heb 6:{i + 1}", f"hope number {i}", "steadfast") for i in range(5)}
+    reads = []
+
+    def records():
+        for ref, record in data.items():
+            reads.append(ref)
+            if ref == "r2":
+                # 掃描途中 r0 被改寫：重建不可用掃描到的舊內容蓋掉
+                live = dict(data, r0=make_record("r0", "Rom 5:8", "grace abounds"))
+                for index in indexes:
+                    index.apply(live, ["r0"])
+            yield ref, record
+
+    reference = ReferenceIndex(lambda record: table_rows(record, "v1_content"))
+    indexes = [reference, VerseTable(), Concordance(), SearchIndex(str(tmp_path / "search.sqlite3"))]
+    rebuild_all(indexes, records(), len(data))
+
+    assert reads == list(data)
+    assert not any(index.building for index in indexes)
+    assert [ref for _, ref, _ in reference.lookup("Heb 6:1-5")] == ["r1", "r2", "r3", "r4"]
+    assert [ref for _, ref, _ in reference.range(*parse_reference("Rom 5:8"))] == ["r0"]
+    assert indexes[1].get("r0", {})[0]["en"] == "grace abounds"
+    assert len(indexes[2].lookup("steadfast")) == 4
+    search = indexes[3]
+    assert not search.needs_rebuild()
+    assert [ref for ref, _ in search.search("grace")[0]] == ["r0"]
+    assert search.search("hope")[1] == 4
@@ -0,0 +1,25 @@
+# test_record_query.py  ──  RecordFrame 的增量併入
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_query import RecordFrame  # noqa: E402
+
+
+def test_update_does_not_mutate_a_frame_already_handed_out():
+    data = {ref: {"ref": ref, "type": "Scripture", "date_added": "2026-01-01 00:00"} for ref in ("A", "B")}
+    records = RecordFrame(lambda data, ref: data[ref])
+    records.rebuild(data)
+    before = records.frame()
+
+    data["A"] = dict(data["A"], type="Document")
+    records.apply(data, ["A"])
+    after = records.frame()
+
+    assert before.loc["A", "type"] == "Scripture"
+    assert after.loc["A", "type"] == "Document"
+    assert after.loc["A", "seq"] == 0
+    assert records.refs(sort=None, type="Document") == ["A"]
@@ -0,0 +1,53 @@
+# test_record_schema.py  ──  編輯區文字 ↔ 資料列
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_schema import TABLE_COLUMNS, rows_to_text, table_rows, text_to_rows  # noqa: E402
+
+# 含 |、tab、換行、引號、**、以及像標題的字（Not / Noah / Reference）的資料列
+TRICKY_ROWS = {
+    "v1_content": [
+        ["Heb 6:3", "Not by works | but by grace", "神若許", "", ""],
+        ["Reference 1", "Noah\tfound favor", "挪亞\n蒙恩", 'say "amen"', "**bold** stays"],
+    ],
+    "w_sheet": [["No", "Word", "English", "Chinese", "Paragraph"]],
+    "p_sheet": [["", "", "only the last cell"]],
+}
+
+
+@pytest.mark.parametrize("field", sorted(TRICKY_ROWS))
+def test_rows_round_trip_through_text(field):
+    rows = TRICKY_ROWS[field]
+    assert text_to_rows(field, rows_to_text(field, rows)) == rows
+    assert text_to_rows(field, rows_to_text(field, rows, header=False)) == rows
+
+
+def test_only_the_known_header_is_dropped():
+    header = "\t".join(TABLE_COLUMNS["v1_content"])
+    assert text_to_rows("v1_content", header + "\nHeb 6:3\tAnd this\t神\t\t") == [["Heb 6:3", "And this", "神", "", ""]]
+    sheet_header = "檔名_批次\t" + header
+    assert text_to_rows("v1_content", sheet_header + "\nHeb 6:3") == [["Heb 6:3", "", "", "", ""]]
+    # 第一列不是標題：保留
+    assert text_to_rows("v1_content", "Ref 1\tEnglish words") == [["Ref 1", "English words", "", "", ""]]
+
+
+def test_markdown_table_from_ai_output():
+    text = "\n".join([
+        "| Ref. | English | 中文 | Syn/Ant | Grammar |",
+        "|:---|---|---|---|---:|",
+        "| Heb 6:3 | **And** this | 神若許 | | |",
+        "",
+        "說明文字不是表格的一部分",
+    ])
+    assert text_to_rows("v1_content", text) == [["Heb 6:3", "And this", "神若許", "", ""]]
+
+
+def test_legacy_tsv_string_field():
+    record = {"v1_content": rows_to_text("v1_content", TRICKY_ROWS["v1_content"])}
+    assert table_rows(record, "v1_content") == TRICKY_ROWS["v1_content"]
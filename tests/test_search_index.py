@@ -0,0 +1,70 @@
+# test_search_index.py  ──  搜尋索引的 AND 語意與提早結束的前 k 名
+#
+# 用法：python -m pytest tests
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, tokenize  # noqa: E402
+
+WORDS = ["grace", "hope", "faith", "love", "oath", "swear", "promise", "anchor", "soul", "rest"]
+
+
+def make_record(words):
+    return {"v1_content": [["Heb 6:7", " ".join(words), "", "", ""]]}
+
+
+def brute_force(index, query):
+    """讀出全部 postings 逐筆計分，當作對照"""
+    terms = set(tokenize(query, query=True))
+    n_docs = len(index)
+    rows = index.conn.execute("SELECT term, doc, impact FROM postings").fetchall()
+    df = {term: sum(1 for row in rows if row[0] == term) for term in terms}
+    idf = {term: index._idf(count, n_docs) for term, count in df.items()}
+    scores, matched = {}, {}
+    for term, doc, impact in rows:
+        if term in terms:
+            scores[doc] = scores.get(doc, 0) + idf[term] * impact
+            matched[doc] = matched.get(doc, 0) + 1
+    ranked = sorted((-score, doc) for doc, score in scores.items() if matched[doc] == len(terms))
+    return [(index._docs[doc][0], -score) for score, doc in ranked]
+
+
+def test_multi_term_is_and_and_top_k_matches_brute_force(tmp_path):
+    rng = random.Random(7)
+    index = SearchIndex(str(tmp_path / "search.sqlite3"))
+    data = {f"r{i}": make_record(rng.choices(WORDS, k=rng.randint(1, 12))) for i in range(1500)}
+    index.rebuild(data.items(), len(data))
+    index.SCAN_CHUNK = 50       # 小批讀取，確保會在讀完 postings 前提早結束
+
+    for query in ["grace", "grace hope", "oath swear promise", "anchor soul rest love"]:
+        expected = brute_force(index, query)
+        hits, total = index.search(query, limit=10, offset=5)
+        assert total == len(expected)
+        assert [ref for ref, _ in hits] == [ref for ref, _ in expected[5:15]]
+        assert all(abs(score - want) < 1e-9 for (_, score), (_, want) in zip(hits, expected[5:15]))
+
+    index.update("only", make_record(["grace"]))
+    assert "only" not in [ref for ref, _ in index.search("grace hope", limit=2000)[0]]
+    assert index.search("grace zzz") == ([], 0)
+
+
+def test_old_format_is_dropped_and_rebuilt(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        INSERT INTO meta VALUES ('tokenizer', '1');
+        CREATE TABLE postings (term TEXT, doc INTEGER, tf INTEGER);
+    """)
+    conn.commit()
+    conn.close()
+
+    index = SearchIndex(path)
+    assert index.needs_rebuild() and len(index) == 0
+    index.rebuild([("r0", make_record(["grace"]))], 1)
+    assert not index.needs_rebuild()
+    assert index.search("grace")[1] == 1
@@ -0,0 +1,31 @@
+# test_serializer.py  ──  壓縮格式與缺少選用套件時的行為
+#
+# 用法：python -m pytest tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializer  # noqa: E402
+from local_store import SentenceJournal  # noqa: E402
+
+
+def test_zstd_falls_back_to_gzip_without_zstandard(monkeypatch):
+    monkeypatch.setattr(serializer, "zstandard", None)
+    data = serializer.encode({"Heb 6:3": {"ref": "Heb 6:3"}}, "zstd")
+    assert data[:2] == serializer.GZIP_MAGIC
+    assert serializer.decode(data) == {"Heb 6:3": {"ref": "Heb 6:3"}}
+
+
+def test_unreadable_zstd_manifest_fails_load_instead_of_emptying_it(tmp_path, monkeypatch):
+    journal = SentenceJournal(str(tmp_path))
+    journal.write({"Heb 6:3": {"ref": "Heb 6:3"}})
+    with open(journal.manifest_path, "wb") as f:
+        f.write(serializer.ZSTD_MAGIC + b"\x00" * 8)
+    monkeypatch.setattr(serializer, "zstandard", None)
+
+    with pytest.raises(serializer.CodecUnavailableError) as info:
+        SentenceJournal(str(tmp_path)).load()
+    assert isinstance(info.value, ValueError)
@@ -0,0 +1,169 @@
+# test_sheets_sync.py  ──  sheets_sync 對 sentences 的同步
+#
+# 用法：python -m pytest tests
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_store import LazySentences, SentenceJournal  # noqa: E402
+from sheets_fake import FakeSheetsClient  # noqa: E402
+from sheets_sync import (  # noqa: E402
+    SHEET_HEADERS, RateLimiter, RefIndex, batch_append_rows, build_sheet_rows, bulk_append, chunk_record_rows,
+    sync_sheets, unsynced_record_rows
+)
+
+
+def test_full_sync_keeps_lazy_mapping_and_reports_changed_refs(tmp_path):
+    gc = FakeSheetsClient()
+    gc.backend.add_sheet("V1_Sheet")
+    gc.backend.append("V1_Sheet", [SHEET_HEADERS["V1_Sheet"],
+                                   ["Heb 6:3", "Heb 6:3", "And this we will do", "神若許", "", ""],
+                                   ["Rom 5:8", "Rom 5:8", "But God shows", "惟有基督", "", ""]])
+    sh = gc.open_by_key("test")
+    journal = SentenceJournal(str(tmp_path))
+    first, _, mode, _, changed = sync_sheets(sh, journal.load(), {})
+    assert mode == "full" and sorted(changed) == ["Heb 6:3", "Rom 5:8"]
+    journal.write(first, changed)
+
+    # 只有 Rom 5:8 在雲端被改過：cursor 失效後整份重讀
+    gc.backend.rows("V1_Sheet")[2][2] = "But God commends"
+    local = journal.load()
+    merged, _, mode, _, changed = sync_sheets(sh, local, {})
+    assert mode == "full"
+    assert isinstance(merged, LazySentences)
+    assert changed == ["Rom 5:8"]
+    assert merged["Rom 5:8"]["v1_content"][0][1] == "But God commends"
+    assert local["Rom 5:8"]["v1_content"][0][1] == "But God shows"
+
+
+def test_full_rescan_keeps_local_only_records_and_local_fields(tmp_path):
+    gc = FakeSheetsClient()
+    gc.backend.add_sheet("V1_Sheet")
+    gc.backend.append("V1_Sheet", [SHEET_HEADERS["V1_Sheet"],
+                                   ["Heb 6:3", "Heb 6:3", "And this we will do", "神若許", "", ""],
+                                   ["Rom 5:8", "Rom 5:8", "But God shows", "惟有基督", "", ""]])
+    sh = gc.open_by_key("test")
+    journal = SentenceJournal(str(tmp_path))
+    first, cursor, _, _, changed = sync_sheets(sh, journal.load(), {})
+    journal.write(first, changed)
+
+    # 本地新增一筆還沒上傳的紀錄，並替雲端來的紀錄加上本地才有的欄位
+    local_only = {"ref": "Local 1:1", "mode": "A", "v1_content": [["Gen 1:1", "In the beginning", "", "", ""]]}
+    enriched = dict(first["Heb 6:3"], grammar={"english": {"full": "And this we will do"}})
+    journal.write({**journal.load(), "Local 1:1": local_only, "Heb 6:3": enriched}, ["Local 1:1", "Heb 6:3"])
+
+    # 雲端改了 Heb 6:3、刪了 Rom 5:8：cursor 失效後整份重讀
+    gc.backend.rows("V1_Sheet")[1][2] = "And this we will do, if God permits"
+    del gc.backend.rows("V1_Sheet")[2]
+    local = journal.load()
+    merged, new_cursor, mode, _, changed = sync_sheets(sh, local, dict(cursor, V1_Sheet={"rows": 9, "tail": ""}))
+    assert mode == "full"
+    assert sorted(changed) == ["Heb 6:3", "Rom 5:8"]
+    assert sorted(merged) == ["Heb 6:3", "Local 1:1"]
+    assert merged["Local 1:1"] == local_only
+    assert merged["Heb 6:3"]["v1_content"][0][1] == "And this we will do, if God permits"
+    assert merged["Heb 6:3"]["grammar"] == enriched["grammar"]
+    assert new_cursor["refs"] == ["Heb 6:3"]
+
+
+def test_bulk_push_uploads_local_only_record_after_full_sync(tmp_path):
+    gc = FakeSheetsClient()
+    gc.backend.add_sheet("V1_Sheet")
+    gc.backend.append("V1_Sheet", [SHEET_HEADERS["V1_Sheet"],
+                                   ["Heb 6:3", "Heb 6:3", "And this we will do", "神若許", "", ""]])
+    sh = gc.open_by_key("test")
+    journal = SentenceJournal(str(tmp_path))
+    local_only = {"ref": "Local 1:1", "mode": "A", "v1_content": [["Gen 1:1", "In the beginning", "起初", "", ""]]}
+    journal.write({"Local 1:1": local_only})
+
+    merged, _, mode, _, _ = sync_sheets(sh, journal.load(), {})
+    assert mode == "full" and "Local 1:1" in merged
+
+    indexes = {"A": RefIndex("V1_Sheet"), "B": RefIndex("W_Sheet")}
+    for index in indexes.values():
+        index.refresh(sh)
+    pending = unsynced_record_rows(merged, indexes, lambda record: record, lambda ref: merged[ref].get("mode"))
+    assert [ref for ref, _ in pending] == ["Local 1:1"]
+
+    pushed = []
+    bulk_append(sh, chunk_record_rows(pending, 100), {}, RateLimiter(per_minute=60),
+                on_batch=lambda done, total, refs, rows: pushed.extend(refs))
+    assert pushed == ["Local 1:1"]
+    assert gc.backend.rows("V1_Sheet")[-1] == ["Local 1:1", "Gen 1:1", "In the beginning", "起初", "", ""]
+
+
+def test_one_record_is_written_in_a_single_batch_update():
+    gc = FakeSheetsClient()
+    for name in ("V1_Sheet", "V2_Sheet"):
+        gc.backend.add_sheet(name)
+        gc.backend.append(name, [SHEET_HEADERS[name]])
+    sh = gc.open_by_key("test")
+    record = {"ref": "Heb 6", "mode": "A",
+              "v1_content": [["Heb 6:3", "And this we will do", "神若許", "", ""],
+                             ["Heb 6:4", "For it is impossible", "論到", "", ""]],
+              "v2_content": [["Heb 6:3", "神が許して", "", "", "", "", ""]]}
+
+    sheet_ids = {}
+    gc.reset_stats()
+    assert batch_append_rows(sh, build_sheet_rows(record), sheet_ids) == {"V1_Sheet": 2, "V2_Sheet": 1}
+    assert gc.calls == {"fetch_sheet_metadata": 1, "batch_update": 1}
+    assert [row[:2] for row in gc.backend.rows("V1_Sheet")[1:]] == [["Heb 6", "Heb 6:3"], ["Heb 6", "Heb 6:4"]]
+    assert gc.backend.rows("V2_Sheet")[1][:2] == ["Heb 6", "Heb 6:3"]
+
+    # sheetId 已快取：下一筆只要一次 batch_update
+    gc.reset_stats()
+    batch_append_rows(sh, build_sheet_rows(dict(record, ref="Heb 7")), sheet_ids)
+    assert gc.calls == {"batch_update": 1}
+
+
+def test_ref_index_picks_up_rows_appended_by_another_writer():
+    gc = FakeSheetsClient()
+    gc.backend.add_sheet("V1_Sheet")
+    gc.backend.append("V1_Sheet", [SHEET_HEADERS["V1_Sheet"], ["Heb 6:3", "Heb 6:3", "", "", "", ""]])
+    sh = gc.open_by_key("test")
+    index = RefIndex("V1_Sheet")
+    index.refresh(sh)
+    assert "Heb 6:3" in index and index.rows == 2
+
+    # 另一個使用者追加兩列：只讀上次最後一列之後的部分
+    gc.backend.append("V1_Sheet", [["Rom 5:8", "Rom 5:8", "", "", "", ""], ["Gen 1:1", "Gen 1:1", "", "", "", ""]])
+    gc.reset_stats()
+    index.refresh(sh)
+    assert gc.calls == {"values_get": 1}
+    assert {"Heb 6:3", "Rom 5:8", "Gen 1:1"} <= index.refs and index.rows == 4
+
+    # 本機寫入後直接更新，不必再讀雲端
+    gc.backend.append("V1_Sheet", [["Jude 5", "Jude 5", "", "", "", ""]])
+    index.record_append([["Jude 5", "Jude 5", "", "", "", ""]])
+    assert "Jude 5" in index and index.rows == 5
+
+    # 最後一列被改掉：整欄重讀
+    gc.backend.rows("V1_Sheet")[-1][0] = "Jude 6"
+    index.refresh(sh)
+    assert "Jude 6" in index and "Jude 5" not in index and index.rows == 5
+
+
+def test_shard_cache_is_bounded(tmp_path):
+    journal = SentenceJournal(str(tmp_path))
+    journal.storage.cache_size = 3
+    journal.write({f"r{i}": {"ref": f"r{i}", "other": str(i)} for i in range(10)})
+    data = journal.load()
+    assert [data[f"r{i}"]["other"] for i in range(10)] == [str(i) for i in range(10)]
+    assert len(journal.storage._cache) == 3
+    assert data.peek("r9") is not None and data.peek("r0") is None
+
+
+def test_rate_limiter_counts_every_request_across_threads():
+    def sleep(seconds):
+        raise AssertionError("視窗內還有額度，不應等待")
+
+    limiter = RateLimiter(per_minute=400, clock=lambda: 0.0, sleep=sleep)
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 沒有 lock 時並行重建 _sent 會遺失紀錄，之後的節流就少算了
+    assert len(limiter._sent) == 400
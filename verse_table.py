@@ -0,0 +1,73 @@
+# verse_table.py  ──  V1 經文的實體化表格（不依賴 Streamlit）
+#
+# 每筆紀錄的 V1 資料列只解析一次成 verse：
+# {'ref', 'en', 'cn', 'syn_ant', 'grammar', 'record', 'row'}，所有頁籤共用同一份。
+# 啟動時在背景整批建立，之後由 SentenceJournal 的 listener 逐筆更新；
+# 尚未建好的紀錄在第一次查詢時補上，所以每次重跑的成本只與顯示的筆數有關。
+from types import MappingProxyType
+
+from record_index import RecordIndex
+from record_schema import V1_CHINESE, V1_ENGLISH, V1_REF, table_rows
+
+V1_SYN_ANT, V1_GRAMMAR = 3, 4
+
+
+def record_verses(ref, record):
+    """紀錄 → verse 清單（唯讀）；沒有出處的列以紀錄 ref 代替"""
+    verses = []
+    for i, row in enumerate(table_rows(record, "v1_content")):
+        if len(row) <= V1_CHINESE:
+            continue
+        cells = [cell.strip() for cell in row] + [""] * (V1_GRAMMAR + 1 - len(row))
+        verses.append(MappingProxyType({
+            "ref": cells[V1_REF] or ref, "en": cells[V1_ENGLISH], "cn": cells[V1_CHINESE],
+            "syn_ant": cells[V1_SYN_ANT], "grammar": cells[V1_GRAMMAR], "record": ref, "row": i,
+        }))
+    return tuple(verses)
+
+
+class VerseTable(RecordIndex):
+    """紀錄 ref → 該紀錄的 verse；查詢時依呼叫端給的 ref 順序取，不掃整個資料庫"""
+
+    def __init__(self):
+        super().__init__()
+        self._verses = {}
+
+    def __len__(self):
+        return sum(len(verses) for verses in list(self._verses.values()))
+
+    def _index(self, ref, record):
+        return record_verses(ref, record)
+
+    def _set(self, ref, verses):
+        self._verses[ref] = verses
+
+    def _drop(self, ref):
+        self._verses.pop(ref, None)
+
+    def get(self, ref, data):
+        """一筆紀錄的 verse；表中還沒有時從 data 解析並存入"""
+        verses = self._verses.get(ref)
+        if verses is None:
+            record = data.get(ref)
+            if record is None:
+                return ()
+            verses = record_verses(ref, record)
+            with self._lock:
+                verses = self._verses.setdefault(ref, verses)
+        return verses
+
+    def for_records(self, refs, data):
+        """多筆紀錄的 verse，依 refs 順序攤平"""
+        return [verse for ref in refs for verse in self.get(ref, data)]
+
+    def head(self, refs, data, n, complete=True):
+        """依 refs 順序取前 n 節；complete 時只取中英文都有的"""
+        found = []
+        for ref in refs:
+            for verse in self.get(ref, data):
+                if not complete or (verse["en"] and verse["cn"]):
+                    found.append(verse)
+                    if len(found) >= n:
+                        return found
+        return found